@@ -0,0 +1,98 @@
+"""
+Benchmark of tree evaluation with and without a buffer arena.
+
+Evaluates random trees on large prediction tensors, once with `Tree.evaluation`, which allocates a new tensor for
+every operator node and keeps it on the tree, and once with `giraffe.arena.BufferArena`, which reduces into
+reused buffers. The fitness is a cheap sum, so the times are dominated by evaluation and allocation. Besides the
+time, the peak of memory allocated during evaluation of all trees is traced, once the arena is warmed up.
+With `--multiclass`, predictions are normalized after every operator as for multiclass tasks, which returns
+a new tensor instead of the arena buffer.
+
+Usage (from the repository root):
+    uv run python benchmarks/arena_evaluation.py [--samples 1000000] [--classes 4] [--trees 50] [--multiclass]
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+from loguru import logger
+
+from giraffe.arena import BufferArena
+from giraffe.functions import set_multiclass_postprocessing
+from giraffe.mutation import append_new_node_mutation
+from giraffe.node import MaxNode, MeanNode, MinNode, ValueNode, WeightedMeanNode
+from giraffe.tree import Tree
+
+
+def build_trees(n_samples: int, n_classes: int, n_trees: int, rng: np.random.Generator):
+    tensors = [rng.random((n_samples, n_classes), dtype=np.float32) for _ in range(16)]
+    trees = [Tree.create_tree_from_root(ValueNode(None, tensors[i % len(tensors)], i % len(tensors))) for i in range(n_trees)]
+    for _ in range(8):
+        trees = [append_new_node_mutation(tree, tensors, allowed_ops=(MeanNode, WeightedMeanNode, MaxNode, MinNode), rng=rng) for tree in trees]
+    return trees
+
+
+def time_default(trees) -> float:
+    start = time.perf_counter()
+    for tree in trees:
+        tree._clean_evals()
+        float(tree.evaluation.sum())
+        tree._clean_evals()
+    return time.perf_counter() - start
+
+
+def time_arena(trees, arena: BufferArena) -> float:
+    start = time.perf_counter()
+    for tree in trees:
+        with arena.evaluate(tree) as evaluation:
+            float(evaluation.sum())
+    return time.perf_counter() - start
+
+
+def peak_allocation(function, *args) -> int:
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=1_000_000)
+    parser.add_argument("--classes", type=int, default=4)
+    parser.add_argument("--trees", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--multiclass", action="store_true")
+    args = parser.parse_args()
+    logger.remove()
+    if args.multiclass:
+        set_multiclass_postprocessing()
+
+    trees = build_trees(args.samples, args.classes, args.trees, np.random.default_rng(0))
+    arena = BufferArena()
+    for tree in trees:  # both paths must compute the same tensors, in the same dtype
+        expected = tree.evaluation
+        tree._clean_evals()
+        with arena.evaluate(tree) as evaluation:
+            assert evaluation.dtype == expected.dtype, (evaluation.dtype, expected.dtype)
+            np.testing.assert_allclose(evaluation, expected, rtol=1e-5)
+    default = min(time_default(trees) for _ in range(args.repeats))
+    arena_time = min(time_arena(trees, arena) for _ in range(args.repeats))
+    allocations = arena.allocations
+    default_peak = peak_allocation(time_default, trees)
+    arena_peak = peak_allocation(time_arena, trees, arena)
+
+    nodes = sum(len(tree.nodes["op_nodes"]) for tree in trees)
+    print(f"{args.trees} trees with {nodes} operator nodes on ({args.samples}, {args.classes}) float32 predictions")
+    print(f"Tree.evaluation: {default * 1e3:.1f} ms, peak allocation {default_peak / 2**20:.1f} MiB")
+    print(f"buffer arena:    {arena_time * 1e3:.1f} ms, peak allocation {arena_peak / 2**20:.1f} MiB", end=" ")
+    print(f"(arena of {allocations} buffers, {arena.nbytes / 2**20:.1f} MiB)")
+    print(f"speedup:         {default / arena_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Microbenchmark of backend dispatch overhead per operator node.
+
+Evaluates a chain of MeanNodes on tiny tensors, where the cost is dominated by Python overhead rather than
+by the operations themselves, once with the bound ops table (`giraffe.globals.BACKEND`) and once with the
+previous dispatch through `Backend.__getattr__` on every operation.
+
+Usage (from the repository root):
+    uv run python benchmarks/backend_dispatch.py [--nodes 200] [--repeats 200]
+"""
+
+import argparse
+import time
+
+import numpy as np
+from loguru import logger
+
+import giraffe.node
+from giraffe.backend.backend import Backend
+from giraffe.globals import BACKEND
+from giraffe.node import MeanNode, ValueNode
+from giraffe.tree import Tree
+
+
+class GetattrDispatch:
+    """Dispatch as done before ops tables: resolve the current backend and the operation on every call."""
+
+    def __getattr__(self, name):
+        return getattr(Backend._current_backend, name)
+
+
+def build_tree(n_nodes: int) -> Tree:
+    root = ValueNode(None, np.random.rand(4), "root")
+    node = root
+    for i in range(n_nodes):
+        op = MeanNode(None)
+        node.add_child(op)
+        op.add_child(ValueNode(None, np.random.rand(4), f"model_{i}"))
+        node = ValueNode(None, np.random.rand(4), f"model_{i}_next")
+        op.add_child(node)
+    return Tree.create_tree_from_root(root)
+
+
+def time_per_node(tree: Tree, n_nodes: int, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        tree._clean_evals()
+        start = time.perf_counter()
+        _ = tree.evaluation
+        best = min(best, time.perf_counter() - start)
+    return best / n_nodes
+
+
+def time_per_call(backend, repeats: int = 200_000) -> float:
+    x = np.zeros(4)
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            backend.shape(x)
+        best = min(best, time.perf_counter() - start)
+    return best / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+    logger.remove()
+
+    tree = build_tree(args.nodes)
+    bound = time_per_node(tree, args.nodes, args.repeats)
+    giraffe.node.B = GetattrDispatch()  # type: ignore[assignment]
+    try:
+        dynamic = time_per_node(tree, args.nodes, args.repeats)
+    finally:
+        giraffe.node.B = BACKEND
+
+    print(f"__getattr__ dispatch: {time_per_call(GetattrDispatch()) * 1e9:.0f} ns per B.shape call")
+    print(f"bound ops table:      {time_per_call(BACKEND) * 1e9:.0f} ns per B.shape call")
+    print(f"__getattr__ dispatch: {dynamic * 1e6:.2f} us per operator node")
+    print(f"bound ops table:      {bound * 1e6:.2f} us per operator node")
+    print(f"speedup:              {dynamic / bound:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark of eager and deferred formatting of debug and trace messages at INFO level.
+
+Loguru drops messages below the level of its handlers only after the call, so an f-string argument is always
+formatted. Hot paths of `giraffe.node`, `giraffe.tree`, `giraffe.mutation` and `giraffe.crossover` therefore pass
+their arguments to loguru, which formats them only for accepted messages, and compute costly ones (tensor shapes)
+lazily with `logger.opt(lazy=True)`. The benchmark times representative messages of these paths in both forms:
+node reprs, weights of a Weighted Mean node and tensor shapes, with an INFO handler installed.
+
+Usage (from the repository root):
+    uv run python benchmarks/hot_path_logging.py [--repeats 100000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+from loguru import logger
+
+from giraffe.globals import BACKEND as B
+from giraffe.node import MeanNode, ValueNode, WeightedMeanNode
+
+
+def eager(node, weighted, tensor):
+    logger.debug(f"Adding child node to {node}")
+    logger.debug(f"Child added, new weights: {weighted._weights}")
+    logger.trace(f"Child added. Node now has {len(node.children)} children")
+    logger.trace(f"Post-operation tensor shape: {B.shape(tensor)}")
+
+
+def deferred(node, weighted, tensor):
+    logger.debug("Adding child node to {}", node)
+    logger.debug("Child added, new weights: {}", weighted._weights)
+    logger.trace("Child added. Node now has {} children", len(node.children))
+    logger.opt(lazy=True).trace("Post-operation tensor shape: {}", lambda: B.shape(tensor))
+
+
+def best_time(function, args, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            function(*args)
+        best = min(best, (time.perf_counter() - start) / repeats)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=100_000)
+    args = parser.parse_args()
+    logger.remove()
+    logger.add(lambda message: None, level="INFO")  # INFO messages are still handled, just not printed
+
+    rng = np.random.default_rng(0)
+    node = ValueNode([MeanNode(None)], rng.random(4), "model_0.npy")
+    weighted = WeightedMeanNode(None, [0.2, 0.3, 0.5])
+    tensor = rng.random((4, 3))
+
+    eager_time = best_time(eager, (node, weighted, tensor), args.repeats)
+    deferred_time = best_time(deferred, (node, weighted, tensor), args.repeats)
+
+    print(f"eager f-strings:    {eager_time * 1e6:.2f} us per 4 messages")
+    print(f"deferred arguments: {deferred_time * 1e6:.2f} us per 4 messages")
+    print(f"speedup:            {eager_time / deferred_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
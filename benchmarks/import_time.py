@@ -0,0 +1,52 @@
+"""
+Benchmark of the time to import GIRAFFE in a fresh interpreter.
+
+Short-lived scoring jobs pay the import on every run, so `import giraffe` must not load PyTorch, torchmetrics,
+matplotlib or graphviz; they are imported by the functions that need them. The script reports the best time
+of several fresh interpreters, minus the startup of an empty interpreter, and exits with status 1 if it
+exceeds the budget or if one of these modules got imported.
+
+Usage (from the repository root):
+    uv run python benchmarks/import_time.py [--budget 0.5] [--repeats 5]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+HEAVY_MODULES = ("torch", "torchmetrics", "matplotlib", "graphviz", "sklearn")
+
+
+def best_time(code: str, repeats: int, env: dict) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True, env=env, stderr=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=0.5, help="maximum import time in seconds")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=str(Path(__file__).parents[1]), GIRAFFE_LOG_LEVEL="ERROR")
+    startup = best_time("pass", args.repeats, env)
+    import_time = best_time("import giraffe", args.repeats, env) - startup
+    check = f"import sys, giraffe; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    loaded = subprocess.run([sys.executable, "-c", check], check=True, env=env, capture_output=True, text=True).stdout.strip()
+
+    print(f"interpreter startup: {startup * 1e3:.0f} ms")
+    print(f"import giraffe:      {import_time * 1e3:.0f} ms (budget {args.budget * 1e3:.0f} ms)")
+    print(f"heavy modules:       {loaded or 'none'}")
+    if import_time > args.budget or loaded:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
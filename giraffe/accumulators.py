@@ -0,0 +1,277 @@
+from typing import Callable, Literal, Self, Tuple, Union
+
+import numpy as np
+import numpy.typing as npt
+
+from giraffe.globals import BACKEND as B
+from giraffe.lib_types import Tensor
+from giraffe.quantization import LEVELS
+from giraffe.streaming import accumulate_in_chunks
+from giraffe.tree import Tree
+
+
+class Accumulator:
+    """
+    Streaming fitness metric.
+
+    Accumulators receive predictions and ground truth chunk by chunk through `update`, so that a metric
+    can be computed without materializing full predictions. Accumulators of the same kind built on different
+    chunks or shards of samples can be combined with `merge`, which makes the result independent of how
+    samples were split.
+    """
+
+    def update(self, pred: Tensor, gt: Tensor, sample_weight: Union[np.ndarray, None] = None) -> Self:
+        """
+        Add a chunk of samples.
+
+        Args:
+            pred: Predictions for the chunk, samples along the first axis
+            gt: Ground truth labels for the chunk
+            sample_weight: Optional weights of the samples, e.g. numbers of occurrences of deduplicated samples
+
+        Returns:
+            The accumulator itself
+        """
+        raise NotImplementedError()
+
+    def merge(self, other: Self) -> Self:
+        """
+        Add statistics of another accumulator of the same kind.
+
+        Args:
+            other: Accumulator to merge, it is not modified
+
+        Returns:
+            The accumulator itself
+        """
+        raise NotImplementedError()
+
+    def compute(self) -> float:
+        """
+        Compute the metric from all samples seen so far.
+        """
+        raise NotImplementedError()
+
+
+class AccuracyAccumulator(Accumulator):
+    """
+    Exact streaming accuracy.
+
+    Binary predictions are thresholded, multiclass predictions of shape (N, C) are compared with labels by argmax.
+    Quantized predictions (see `giraffe.quantization`) are compared with the quantized threshold.
+    """
+
+    def __init__(self, task: Literal["binary", "multiclass"] = "binary", threshold: float = 0.5, quantized: bool = False):
+        self.task = task
+        self.threshold = threshold
+        self.quantized = quantized
+        self.correct: Union[int, float] = 0
+        self.total: Union[int, float] = 0
+
+    def update(self, pred: Tensor, gt: Tensor, sample_weight: Union[np.ndarray, None] = None) -> Self:
+        pred_array, gt_array = B.to_numpy(pred), B.to_numpy(gt).reshape(-1)
+        if self.task == "multiclass":
+            predicted = pred_array.argmax(axis=1)
+        else:
+            predicted = pred_array.reshape(-1) >= (self.threshold * LEVELS if self.quantized else self.threshold)
+        if sample_weight is None:
+            self.correct += int(np.count_nonzero(predicted == gt_array))
+            self.total += len(gt_array)
+        else:
+            self.correct += float(np.dot(predicted == gt_array, sample_weight))
+            self.total += float(np.sum(sample_weight))
+        return self
+
+    def merge(self, other: Self) -> Self:
+        self.correct += other.correct
+        self.total += other.total
+        return self
+
+    def compute(self) -> float:
+        return self.correct / self.total if self.total else 0.0
+
+
+class HistogramAccumulator(Accumulator):
+    """
+    Base of ranking metrics computed from per-bin counts of positive and negative samples.
+
+    Scores, expected in [0, 1], are split into `n_bins` equal-width bins and only the number of positive and
+    negative samples in each bin is kept, so memory does not depend on the number of samples and updates are
+    a single `np.bincount`. Samples in the same bin are treated as tied. The metric is therefore exact when every
+    bin holds a single distinct score, e.g. for scores quantized to multiples of 1 / (n_bins - 1), and otherwise
+    within `error_bound` of the exact value. With `quantized` set, uint8 scores are quantized probabilities
+    (see `giraffe.quantization`) and are binned without conversion to float, every quantization level gets
+    its own bin when `n_bins` >= 256.
+
+    For multiclass tasks, predictions of shape (N, C) are scored one-vs-rest per class and the metric is macro-averaged
+    over classes that have both positive and negative samples.
+
+    Attributes:
+        n_bins: Number of score bins
+        quantized: Whether scores are quantized probabilities
+        counts: Array of shape (n_classes, n_bins, 2) with numbers (or total weights) of negative and positive samples per bin
+    """
+
+    def __init__(
+        self,
+        n_bins: int = 2**10,
+        task: Literal["binary", "multiclass"] = "binary",
+        num_classes: Union[int, None] = None,
+        quantized: bool = False,
+    ):
+        """
+        Args:
+            n_bins: Number of score bins
+            task: 'binary' or 'multiclass'
+            num_classes: Number of classes for multiclass tasks. If None, it is taken from the first predictions.
+            quantized: Whether scores are quantized probabilities, uint8 levels of 1 / 255
+        """
+        self.n_bins = n_bins
+        self.quantized = quantized
+        self.task = task
+        self.num_classes = 1 if task == "binary" else num_classes
+        self.counts: Union[npt.NDArray[np.float64], None] = None if self.num_classes is None else self._empty_counts(self.num_classes)
+
+    def _empty_counts(self, num_classes: int) -> npt.NDArray[np.float64]:
+        return np.zeros((num_classes, self.n_bins, 2), dtype=np.float64)
+
+    def _bins(self, scores: np.ndarray) -> np.ndarray:
+        if self.quantized:  # counting sort of quantized scores, bins of q / 255 computed in integers
+            return np.minimum(scores.astype(np.intp) * self.n_bins // LEVELS, self.n_bins - 1)
+        if not np.issubdtype(scores.dtype, np.floating) or scores.dtype == np.float16:
+            # scores * n_bins overflows integer dtypes, and float16 for n_bins > 2**15
+            scores = scores.astype(np.float32)
+        return np.clip((scores * self.n_bins).astype(np.intp), 0, self.n_bins - 1)
+
+    def update(self, pred: Tensor, gt: Tensor, sample_weight: Union[np.ndarray, None] = None) -> Self:
+        pred_array, gt_array = B.to_numpy(pred), B.to_numpy(gt).reshape(-1).astype(np.intp)
+        if self.task == "multiclass":
+            pred_array = pred_array.reshape(len(gt_array), -1)
+            num_classes = pred_array.shape[1]
+            labels = gt_array[:, None] == np.arange(num_classes)
+        else:
+            pred_array = pred_array.reshape(-1, 1)
+            num_classes = 1
+            labels = gt_array[:, None].astype(bool)
+        if self.counts is None:
+            self.num_classes = num_classes
+            self.counts = self._empty_counts(num_classes)
+
+        index = (np.arange(num_classes) * self.n_bins + self._bins(pred_array)) * 2 + labels
+        weights = None if sample_weight is None else np.repeat(np.asarray(sample_weight, dtype=np.float64), num_classes)
+        self.counts += np.bincount(index.ravel(), weights=weights, minlength=self.counts.size).reshape(self.counts.shape)
+        return self
+
+    def merge(self, other: Self) -> Self:
+        if other.n_bins != self.n_bins:
+            raise ValueError(f"Cannot merge accumulators with {self.n_bins} and {other.n_bins} bins")
+        if other.counts is not None:
+            self.counts = other.counts.copy() if self.counts is None else self.counts + other.counts
+        return self
+
+    def compute(self) -> float:
+        return self.compute_with_bound()[0]
+
+    def error_bound(self) -> float:
+        """
+        Maximum absolute difference between `compute()` and the metric computed on unbinned scores.
+        """
+        return self.compute_with_bound()[1]
+
+    def compute_with_bound(self) -> Tuple[float, float]:
+        """
+        Compute the metric together with its error bound.
+
+        Returns:
+            Tuple of the metric and the maximum absolute difference from the metric computed on unbinned scores
+        """
+        if self.counts is None:
+            return 0.0, 0.0
+        values, bounds = [], []
+        for class_counts in self.counts:
+            negatives, positives = class_counts[:, 0], class_counts[:, 1]
+            if self.task == "multiclass" and (positives.sum() == 0 or negatives.sum() == 0):
+                continue
+            value, bound = self._metric(negatives, positives)
+            values.append(value)
+            bounds.append(bound)
+        if not values:
+            return 0.0, 0.0
+        return float(np.mean(values)), float(np.mean(bounds))
+
+    def _metric(self, negatives: np.ndarray, positives: np.ndarray) -> Tuple[float, float]:
+        raise NotImplementedError()
+
+
+class AUROCAccumulator(HistogramAccumulator):
+    """
+    Streaming area under the ROC curve computed from score histograms, see `HistogramAccumulator`.
+    """
+
+    def _metric(self, negatives: np.ndarray, positives: np.ndarray) -> Tuple[float, float]:
+        n_positive, n_negative = positives.sum(), negatives.sum()
+        if n_positive == 0 or n_negative == 0:
+            return 0.0, 0.0
+        negatives_below = np.cumsum(negatives) - negatives
+        pairs = float(n_positive) * float(n_negative)
+        tied = float(np.dot(positives, negatives))
+        auroc = (float(np.dot(positives, negatives_below)) + 0.5 * tied) / pairs
+        # ordering of a positive and a negative sample in the same bin is unknown
+        return auroc, 0.5 * tied / pairs
+
+
+class AveragePrecisionAccumulator(HistogramAccumulator):
+    """
+    Streaming average precision computed from score histograms, see `HistogramAccumulator`.
+
+    Tied samples form a single threshold, the same way as in scikit-learn and torchmetrics. The error bound
+    is the larger distance to average precision with positives ranked first or last within their bin.
+    """
+
+    def _metric(self, negatives: np.ndarray, positives: np.ndarray) -> Tuple[float, float]:
+        n_positive = positives.sum()
+        if n_positive == 0:
+            return 0.0, 0.0
+        negatives, positives = negatives[::-1], positives[::-1]  # descending scores
+        true_positives, false_positives = np.cumsum(positives), np.cumsum(negatives)
+        occupied = positives > 0
+        precision = true_positives[occupied] / (true_positives[occupied] + false_positives[occupied])
+        average_precision = float(np.dot(positives[occupied], precision)) / n_positive
+
+        # positives ranked first (upper) or last (lower) within their bin, the i-th positive of a bin contributes
+        # precision (tp + i) / (tp + fp + i), summed over i in closed form: p - fp * (digamma(tp + fp + p + 1) - digamma(tp + fp + 1))
+        preceding_true, preceding_false = true_positives - positives, false_positives - negatives
+        upper = self._sum_of_precisions(positives, preceding_true, preceding_false) / n_positive
+        lower = self._sum_of_precisions(positives, preceding_true, preceding_false + negatives) / n_positive
+        return average_precision, max(upper - average_precision, average_precision - lower)
+
+    @staticmethod
+    def _sum_of_precisions(positives: np.ndarray, preceding_true: np.ndarray, preceding_false: np.ndarray) -> float:
+        from scipy.special import digamma  # scipy is installed with scikit-learn
+
+        ranked_before = preceding_true + preceding_false
+        return float(np.sum(positives - preceding_false * (digamma(ranked_before + positives + 1) - digamma(ranked_before + 1))))
+
+
+def streaming_fitness(accumulator_factory: Callable[[], Accumulator], chunk_size: Union[int, None] = None) -> Callable[[Tree, Tensor], float]:
+    """
+    Create a fitness function that computes a metric with an accumulator.
+
+    Args:
+        accumulator_factory: Callable returning a new, empty accumulator, e.g. `AUROCAccumulator`
+        chunk_size: If set, trees are evaluated in chunks of this many samples, see `giraffe.streaming`,
+            and the full evaluation is never materialized. Otherwise the tree is evaluated as usual.
+
+    Returns:
+        Fitness function usable as `Giraffe.fitness_function`
+    """
+
+    def fitness(tree: Tree, gt: Tensor) -> float:
+        accumulator = accumulator_factory()
+        if chunk_size is None or tree.root.evaluation is not None:
+            accumulator.update(tree.evaluation, gt)
+        else:
+            accumulate_in_chunks(tree, gt, accumulator, chunk_size)
+        return accumulator.compute()
+
+    return fitness
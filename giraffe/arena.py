@@ -0,0 +1,235 @@
+"""
+Evaluation of trees into a reusable pool of preallocated buffers.
+
+`Tree.evaluation` caches the result of every operator node on its value node, and every reduction allocates a new
+tensor. With many samples, allocating and first touching these tensors dominates evaluation time. A `BufferArena`
+instead keeps a per-thread pool of (N, C) buffers: operator nodes reduce with `out=` into a buffer taken from the
+pool, buffers of inputs go back to the pool as soon as their node is computed, and the buffer holding the result
+of the tree is returned after the fitness function consumed it. The pool is sized before evaluation from the
+largest number of buffers the tree keeps alive at once, so a warmed-up arena evaluates trees without allocating.
+
+An `ArenaPool` hands one arena to each concurrent evaluation, so worker threads reuse the arenas of the previous
+batch, even when a new pool of threads is started for every generation:
+
+    >>> pool = ArenaPool()
+    >>> with pool.borrow() as arena, arena.evaluate(tree) as evaluation:
+    ...     fitness = fitness_function(tree, gt)
+    >>> pool.clear()  # free the buffers once training is over
+"""
+
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple, cast
+
+from loguru import logger
+
+from giraffe.globals import BACKEND as B
+from giraffe.lib_types import Tensor
+from giraffe.node import OperatorNode, ValueNode, WeightedMeanNode
+from giraffe.tree import Tree
+
+
+def _holds_buffer(node: ValueNode) -> bool:
+    # value nodes without operators evaluate to their predictions, which are not taken from the arena
+    return bool(node.children)
+
+
+def _needs_scratch(op_node: OperatorNode) -> bool:
+    # weighted sums write the products of their inputs to a scratch buffer
+    return isinstance(op_node, WeightedMeanNode)
+
+
+def live_buffers(node: ValueNode) -> int:
+    """
+    Maximum number of arena buffers alive at once while evaluating the subtree of a value node.
+
+    The evaluation of the value node is kept while its operators run, and the results of the children of
+    an operator are kept until its output buffer is written, like registers of an expression evaluated
+    from left to right. Weighted Mean nodes take one more buffer as scratch space while they reduce.
+
+    Args:
+        node: Root of the subtree
+
+    Returns:
+        Number of buffers, 0 for leaves
+    """
+    peak = current = 0
+    for op_node in cast(List[OperatorNode], node.children):
+        held = current
+        for child in cast(List[ValueNode], op_node.children):
+            peak = max(peak, held + live_buffers(child))
+            held += _holds_buffer(child)
+        peak = max(peak, held + 1 + _needs_scratch(op_node))
+        current = 1
+    return peak
+
+
+class BufferArena:
+    """
+    Pool of preallocated tensors reused between evaluations of trees.
+
+    Buffers are grouped by shape, dtype and device. An arena is not thread safe, use `ArenaPool` to give each
+    thread its own arena. Buffers have the dtype of the predictions, so operators need to keep it,
+    which is the case for Mean, Weighted Mean, Min and Max nodes on floating point and quantized predictions.
+
+    Attributes:
+        allocations: Number of buffers allocated so far
+    """
+
+    def __init__(self):
+        self._free: Dict[Tuple[Any, ...], List[Tensor]] = defaultdict(list)
+        self.allocations = 0
+
+    @staticmethod
+    def _key(like: Tensor) -> Tuple[Any, ...]:
+        return tuple(B.shape(like)), str(like.dtype), str(getattr(like, "device", "cpu"))
+
+    def acquire(self, like: Tensor) -> Tensor:
+        """
+        Take a buffer with the shape and dtype of `like` from the pool, allocating it if the pool is empty.
+        Its content is undefined.
+        """
+        free = self._free[self._key(like)]
+        if free:
+            return free.pop()
+        self.allocations += 1
+        return B.empty(B.shape(like), like=like)
+
+    def release(self, buffer: Tensor):
+        """
+        Return a buffer to the pool. It must not be used afterwards.
+        """
+        self._free[self._key(buffer)].append(buffer)
+
+    def reserve(self, like: Tensor, count: int):
+        """
+        Make sure the pool holds at least `count` free buffers like `like`.
+        """
+        free = self._free[self._key(like)]
+        missing = count - len(free)
+        if missing > 0:
+            logger.debug(f"Allocating {missing} buffers of shape {tuple(B.shape(like))} in arena")
+        for _ in range(missing):
+            free.append(B.empty(B.shape(like), like=like))
+            self.allocations += 1
+
+    def clear(self):
+        """
+        Drop all free buffers.
+        """
+        self._free.clear()
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Number of bytes held by free buffers.
+        """
+        return sum(B.nbytes(buffer) for free in self._free.values() for buffer in free)
+
+    def _evaluate(self, node: ValueNode) -> Tuple[Tensor, bool]:
+        # returns the evaluation and whether it is a buffer of the arena
+        evaluation, owned = node.value, False
+        for op_node in cast(List[OperatorNode], node.children):
+            inputs = [(evaluation, owned)] + [self._evaluate(child) for child in cast(List[ValueNode], op_node.children)]
+            buffer = self.acquire(node.value)
+            scratch = self.acquire(node.value) if _needs_scratch(op_node) else None
+            evaluation = op_node.combine([tensor for tensor, _ in inputs], out=buffer, scratch=scratch)
+            if scratch is not None:
+                self.release(scratch)
+            # inputs are consumed, their buffers are free for the next operators
+            for tensor, is_buffer in inputs:
+                if is_buffer:
+                    self.release(tensor)
+            owned = evaluation is buffer
+            # the postprocessing function may return a new tensor, e.g. when normalizing multiclass predictions,
+            # the buffer is then free again, unless the result is a view of it
+            if not owned and not B.shares_memory(evaluation, buffer):
+                self.release(buffer)
+        return evaluation, owned
+
+    @contextmanager
+    def evaluate(self, tree: Tree) -> Iterator[Tensor]:
+        """
+        Evaluate a tree into arena buffers.
+
+        Evaluations of intermediate nodes are not stored on the nodes. The result is set as evaluation of the
+        root for the duration of the block, so that fitness functions can read `tree.evaluation`. Afterwards
+        it is cleared and its buffer is returned to the arena, so it must not be kept.
+
+        Args:
+            tree: Tree to evaluate, with predictions loaded in its value nodes
+
+        Yields:
+            Evaluation of the tree
+        """
+        root = tree.root
+        if not root.children:
+            yield root.value
+            return
+        self.reserve(root.value, live_buffers(root))
+        evaluation, owned = self._evaluate(root)
+        root.evaluation = evaluation
+        try:
+            yield evaluation
+        finally:
+            root.evaluation = None
+            if owned:
+                self.release(evaluation)
+
+
+class ArenaPool:
+    """
+    Thread safe pool of arenas, one per concurrent evaluation.
+
+    Arenas are not tied to threads: a thread borrows a free arena for one evaluation and returns it, so the
+    number of arenas is the largest number of concurrent evaluations, and they stay warm across batches
+    evaluated by different threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._arenas: List[BufferArena] = []
+        self._free: List[BufferArena] = []
+
+    @contextmanager
+    def borrow(self) -> Iterator[BufferArena]:
+        """
+        Take a free arena for the duration of the block, creating it if all arenas are in use.
+
+        Yields:
+            Arena that no other thread uses until the block exits
+        """
+        with self._lock:
+            if self._free:
+                arena = self._free.pop()
+            else:
+                arena = BufferArena()
+                self._arenas.append(arena)
+        try:
+            yield arena
+        finally:
+            with self._lock:
+                self._free.append(arena)
+
+    def clear(self):
+        """
+        Drop the free buffers of all arenas.
+        """
+        with self._lock:
+            for arena in self._arenas:
+                arena.clear()
+
+    @property
+    def allocations(self) -> int:
+        """
+        Number of buffers allocated by all arenas so far.
+        """
+        return sum(arena.allocations for arena in self._arenas)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Number of bytes held by free buffers of all arenas.
+        """
+        return sum(arena.nbytes for arena in self._arenas)
@@ -1,3 +1,4 @@
+import weakref
 from typing import Type
 
 from loguru import logger
@@ -15,9 +16,15 @@ class Backend:
 
     Important: The backend should only be set at the beginning of the program,
     before any GIRAFFE instances are initialized or predictions are loaded.
+
+    Instances of this class (such as `giraffe.globals.BACKEND`) serve as ops tables: operations of the current
+    backend are bound as instance attributes whenever the backend is set, so `B.concat(...)` is a plain attribute
+    lookup instead of a `__getattr__` call and a staticmethod lookup on every operation. All instances are
+    rebound by `set_backend`, so code holding a reference to an instance follows backend switches.
     """
 
     _current_backend: Type[BackendInterface] = NumpyBackend
+    _instances: "weakref.WeakSet[Backend]" = weakref.WeakSet()
 
     @classmethod
     def set_backend(cls, backend_name):  # TODO: Add option to set backend by providing class instead
@@ -46,6 +53,8 @@ class Backend:
         else:
             logger.error(f"Invalid backend: {backend_name}")
             raise ValueError(f"Invalid backend: {backend_name}")
+        for instance in cls._instances:
+            instance._bind(cls._current_backend)
 
     @classmethod
     def get_backend(cls) -> Type[BackendInterface]:
@@ -59,7 +68,16 @@ class Backend:
         return cls._current_backend
 
     def __init__(self):
-        pass
+        self._bind(Backend._current_backend)
+        Backend._instances.add(self)
+
+    def _bind(self, backend: Type[BackendInterface]):
+        for name in self.__dict__.pop("_bound_names", ()):
+            del self.__dict__[name]
+        ops = {name: getattr(backend, name) for name in dir(backend) if not name.startswith("_")}
+        self.__dict__.update(ops)
+        self.__dict__["_bound_names"] = tuple(ops)
 
     def __getattr__(self, name):
+        # only reached for names that are not bound, e.g. private helpers of a backend
         return getattr(Backend._current_backend, name)
@@ -76,5 +76,64 @@ class BackendInterface:
         raise NotImplementedError()
 
     @staticmethod
-    def load(path, device=None):
+    def empty(shape, like):
+        raise NotImplementedError()
+
+    @staticmethod
+    def from_numpy(x, device=None):
+        """
+        Convert a NumPy array to a tensor of the backend, sharing its memory when it stays on the CPU.
+        """
+        raise NotImplementedError()
+
+    @staticmethod
+    def nbytes(x):
+        raise NotImplementedError()
+
+    @staticmethod
+    def shares_memory(x, y):
+        """
+        Check whether two tensors may share memory, e.g. because one is a view of the other.
+        """
+        raise NotImplementedError()
+
+    @staticmethod
+    def load(path, device=None, mmap_mode=None):
+        raise NotImplementedError()
+
+    @staticmethod
+    def stack_reduce(tensors, reduction, out=None):
+        """
+        Reduce a sequence of same-shaped tensors elementwise, as `mean`/`max`/`min` over axis 0 of their stack,
+        without materializing the stack. Half precision means are accumulated in float32 and stored in half precision,
+        uint8 means are accumulated in a wider integer type and rounded back to uint8.
+
+        Args:
+            tensors: Sequence of tensors of the same shape, or a tensor stacked along axis 0
+            reduction: 'mean', 'max' or 'min'
+            out: Optional preallocated output tensor, written in place
+        """
+        raise NotImplementedError()
+
+    @staticmethod
+    def weighted_sum(tensors, weights, out=None, scratch=None):
+        """
+        Sum of tensors multiplied by scalar weights, as `sum(stack * weights, axis=0)` without the stack
+        and the full-size product. Half precision inputs are accumulated in float32 and stored in half precision,
+        uint8 inputs are accumulated in float32 and rounded back to uint8.
+
+        Args:
+            tensors: Sequence of tensors of the same shape, or a tensor stacked along axis 0
+            weights: One weight per tensor, a sequence of floats or a 1-D tensor
+            out: Optional preallocated output tensor, written in place
+            scratch: Optional buffer with the shape and dtype of the result for intermediate products, its content
+                is overwritten. Without it, backends that cannot fuse the multiply-add use a small block buffer
+        """
+        raise NotImplementedError()
+
+    @staticmethod
+    def astype(x, dtype):
+        """
+        Convert a tensor to the dtype given by name, e.g. 'float16', without copying if it already has it.
+        """
         raise NotImplementedError()
@@ -0,0 +1,125 @@
+"""
+Conversions between NumPy arrays and PyTorch tensors that share memory whenever possible.
+
+`torch.from_numpy` and `Tensor.numpy` return views of the same buffer, so a conversion only copies data when it
+has to: tensors on a GPU, arrays with negative strides, dtypes the other library does not support, or an explicitly
+requested different dtype. Every copy made here is added to a process-wide counter, which allows checking that
+hot paths such as fitness evaluation are copy-free:
+
+    >>> reset_bytes_copied()
+    >>> giraffe.train(1)
+    >>> bytes_copied()
+    0
+
+PyTorch is imported only when a tensor is converted to it, NumPy-only runs never load it.
+"""
+
+import sys
+import threading
+import warnings
+from typing import TYPE_CHECKING, Any, Union
+
+import numpy as np
+from loguru import logger
+
+if TYPE_CHECKING:
+    import torch
+
+_lock = threading.Lock()
+_bytes_copied = 0
+
+
+def _count_copy(nbytes: int, reason: str):
+    global _bytes_copied
+    with _lock:
+        _bytes_copied += nbytes
+    logger.trace("Copied {} bytes during conversion: {}", nbytes, reason)
+
+
+def bytes_copied() -> int:
+    """
+    Number of bytes copied by `as_numpy` and `as_torch` since the last reset.
+    """
+    return _bytes_copied
+
+
+def reset_bytes_copied():
+    """
+    Reset the counter of copied bytes to zero.
+    """
+    global _bytes_copied
+    with _lock:
+        _bytes_copied = 0
+
+
+def is_torch_tensor(x: Any) -> bool:
+    """
+    Check whether `x` is a PyTorch tensor, without importing PyTorch: if it is not imported yet, no tensor exists.
+    """
+    return "torch" in sys.modules and isinstance(x, sys.modules["torch"].Tensor)
+
+
+def as_numpy(x: Any, dtype: Union[np.dtype, type, str, None] = None) -> np.ndarray:
+    """
+    Convert a tensor to a NumPy array, sharing memory when possible.
+
+    Args:
+        x: PyTorch tensor, NumPy array or anything accepted by `np.asarray`
+        dtype: Optional dtype of the result, the data is copied if it differs
+
+    Returns:
+        NumPy array, a view of `x` unless a copy was needed
+    """
+    if is_torch_tensor(x):
+        x = x.detach()
+        if x.device.type != "cpu":
+            _count_copy(x.element_size() * x.nelement(), f"tensor on {x.device}")
+            x = x.cpu()
+        try:
+            array = x.numpy()
+        except TypeError:  # dtypes without NumPy equivalent, e.g. bfloat16
+            _count_copy(x.element_size() * x.nelement(), f"unsupported dtype {x.dtype}")
+            array = x.float().numpy()
+    elif isinstance(x, np.ndarray):
+        array = x
+    else:
+        array = np.asarray(x)
+        _count_copy(array.nbytes, f"conversion of {type(x).__name__}")
+    if dtype is not None and array.dtype != np.dtype(dtype):
+        array = array.astype(dtype)
+        _count_copy(array.nbytes, f"dtype conversion to {array.dtype}")
+    return array
+
+
+def as_torch(x: Any, dtype: Union["torch.dtype", None] = None) -> "torch.Tensor":
+    """
+    Convert an array to a PyTorch tensor, sharing memory when possible.
+
+    Read-only arrays, e.g. memory-mapped predictions, are shared as well. The returned tensor must then not be
+    modified in place, which is never done by fitness functions.
+
+    Args:
+        x: NumPy array, PyTorch tensor or anything accepted by `np.asarray`
+        dtype: Optional dtype of the result, the data is copied if it differs
+
+    Returns:
+        PyTorch tensor, a view of `x` unless a copy was needed
+    """
+    import torch
+
+    if not isinstance(x, torch.Tensor):
+        array = as_numpy(x)
+        if any(stride < 0 for stride in array.strides):
+            array = np.ascontiguousarray(array)
+            _count_copy(array.nbytes, "negative strides")
+        try:
+            with warnings.catch_warnings():
+                warnings.filterwarnings("ignore", message="The given NumPy array is not writable")
+                x = torch.from_numpy(array)
+        except TypeError:  # dtypes without PyTorch equivalent, e.g. float128
+            _count_copy(array.nbytes, f"unsupported dtype {array.dtype}")
+            x = torch.from_numpy(array.astype(np.float64))
+    if dtype is not None and x.dtype != dtype:
+        x = x.to(dtype)
+        _count_copy(x.element_size() * x.nelement(), f"dtype conversion to {dtype}")
+    return x
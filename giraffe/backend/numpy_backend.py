@@ -3,6 +3,66 @@ from loguru import logger
 
 from giraffe.backend.backend_interface import BackendInterface
 
+_REDUCTION_UFUNCS = {"mean": np.add, "max": np.maximum, "min": np.minimum}
+# number of elements of the products of `weighted_sum` computed at once when no scratch buffer is given
+_BLOCK_ELEMENTS = 1 << 16
+
+
+def _quantized_mean(tensors, out=None):
+    # uint8 sums are accumulated in uint32 and divided with rounding, so the mean stays quantized
+    accumulator = np.array(tensors[0], dtype=np.uint32)
+    for tensor in tensors[1:]:
+        np.add(accumulator, tensor, out=accumulator)
+    accumulator += len(tensors) // 2
+    accumulator //= len(tensors)
+    if out is None:
+        return accumulator.astype(np.uint8)
+    np.copyto(out, accumulator, casting="unsafe")
+    return out
+
+
+def _quantized_weighted_sum(tensors, weights, out=None):
+    # uint8 inputs are accumulated in float32 and rounded back to uint8
+    weights = np.asarray(weights, dtype=np.float32)
+    if isinstance(tensors, np.ndarray):
+        accumulator = np.einsum("k,k...->...", weights, tensors, dtype=np.float32)
+    else:
+        accumulator = np.multiply(tensors[0], weights[0], dtype=np.float32)
+        for tensor, weight in zip(tensors[1:], weights[1:], strict=True):
+            accumulator += np.multiply(tensor, weight, dtype=np.float32)
+    np.clip(np.rint(accumulator, out=accumulator), 0, 255, out=accumulator)
+    if out is None:
+        return accumulator.astype(np.uint8)
+    np.copyto(out, accumulator, casting="unsafe")
+    return out
+
+
+def _block_scratch(out, scratch=None):
+    # buffer for a block of rows of `out`, so that products are never materialized for all samples at once,
+    # taken from the leading rows of `scratch` when it fits
+    if out.ndim == 0:
+        return np.empty_like(out)
+    rows = min(max(1, _BLOCK_ELEMENTS // max(1, out[0].size)), len(out))
+    if scratch is not None and scratch.dtype == out.dtype and scratch.shape[1:] == out.shape[1:] and len(scratch) >= rows:
+        return scratch[:rows]
+    return np.empty((rows,) + out.shape[1:], dtype=out.dtype)
+
+
+def _add_products(out, tensors, weights, scratch):
+    # out += sum(weight * tensor), block by block of rows, with the products written to `scratch`
+    if out.ndim == 0:
+        for tensor, weight in zip(tensors, weights, strict=True):
+            np.multiply(tensor, weight, out=scratch)
+            np.add(out, scratch, out=out)
+        return
+    step = len(scratch)
+    for start in range(0, len(out), step):
+        target = out[start : start + step]
+        products = scratch[: len(target)]
+        for tensor, weight in zip(tensors, weights, strict=True):
+            np.multiply(tensor[start : start + step], weight, out=products)
+            np.add(target, products, out=target)
+
 
 class NumpyBackend(BackendInterface):
     @staticmethod
@@ -15,7 +75,7 @@ class NumpyBackend(BackendInterface):
 
     @staticmethod
     def mean(x, axis=None):
-        return np.mean(x, axis)
+        return np.mean(x, axis)  # float16 is accumulated in float32 by NumPy
 
     @staticmethod
     def max(x, axis=None):
@@ -70,10 +130,91 @@ class NumpyBackend(BackendInterface):
         return np.expand_dims(x, axis)
 
     @staticmethod
-    def load(path, device=None):
+    def empty(shape, like):
+        return np.empty(shape, dtype=like.dtype)
+
+    @staticmethod
+    def from_numpy(x, device=None):
+        return x
+
+    @staticmethod
+    def nbytes(x):
+        return x.nbytes
+
+    @staticmethod
+    def shares_memory(x, y):
+        return np.may_share_memory(x, y)
+
+    @staticmethod
+    def stack_reduce(tensors, reduction, out=None):
+        ufunc = _REDUCTION_UFUNCS[reduction]
+        dtype = np.result_type(*tensors)
+        if reduction == "mean" and dtype == np.uint8:
+            return _quantized_mean(tensors, out)
+        if reduction == "mean" and not np.issubdtype(dtype, np.inexact):
+            dtype = np.dtype(np.float64)
+        # float16 sums are accumulated in float32, as `np.mean` does, and stored back in float16
+        accumulate = reduction == "mean" and dtype == np.float16
+        result = out
+        if out is None or accumulate:
+            out = np.empty(np.shape(tensors[0]), dtype=np.float32 if accumulate else dtype)
+        np.copyto(out, tensors[0])
+        for tensor in tensors[1:]:
+            ufunc(out, tensor, out=out)
+        if reduction == "mean":
+            np.divide(out, len(tensors), out=out)
+        if not accumulate:
+            return out
+        if result is None:
+            return out.astype(dtype)
+        np.copyto(result, out)
+        return result
+
+    @staticmethod
+    def weighted_sum(tensors, weights, out=None, scratch=None):
+        dtype = np.result_type(*tensors)
+        if dtype == np.uint8:
+            return _quantized_weighted_sum(tensors, weights, out)
+        # float16 inputs are accumulated in float32 and the result is stored in float16,
+        # other floating inputs keep their dtype so that float32 predictions are not promoted to float64
+        low_precision = dtype == np.float16
+        if low_precision:
+            weights = np.asarray(weights, dtype=np.float32)
+        else:
+            weights = np.asarray(weights, dtype=dtype if np.issubdtype(dtype, np.floating) else np.float64)
+        if isinstance(tensors, np.ndarray):  # already stacked, contract the first axis without temporaries
+            if not low_precision:
+                return np.einsum("k,k...->...", weights, tensors, out=out)
+            result = np.einsum("k,k...->...", weights, tensors, dtype=np.float32)
+            if out is None:
+                return result.astype(np.float16)
+            np.copyto(out, result)
+            return out
+        result = out
+        if out is None or low_precision:
+            out = np.empty(np.shape(tensors[0]), dtype=np.result_type(*tensors, weights))
+        np.multiply(tensors[0], weights[0], out=out)
+        if len(tensors) > 1:
+            _add_products(out, tensors[1:], weights[1:], _block_scratch(out, scratch))
+        if not low_precision:
+            return out
+        if result is None:
+            return out.astype(np.float16)
+        np.copyto(result, out)
+        return result
+
+    @staticmethod
+    def astype(x, dtype):
+        if dtype == "bfloat16":
+            raise ValueError("bfloat16 is not supported by NumPy, use the PyTorch backend")
+        return x.astype(dtype, copy=False)
+
+    @staticmethod
+    def load(path, device=None, mmap_mode=None):
         if not any([str(path).endswith(suffix) for suffix in [".npy", ".npz"]]):
             logger.warning(f"file extension for {path} is different from common numpy extensions: .npy or .npz")
-        loaded = np.load(path)
+        # with mmap_mode set, .npy files are mapped into memory and pages are read from disk on access
+        loaded = np.load(path, mmap_mode=mmap_mode)
         if not isinstance(loaded, np.ndarray):
             raise ValueError(f"file {path} is not a numpy file")
         return loaded
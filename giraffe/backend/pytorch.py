@@ -1,7 +1,52 @@
+from typing import Callable, Dict
+
 import torch
 from loguru import logger
 
 from giraffe.backend.backend_interface import BackendInterface
+from giraffe.backend.interop import as_numpy
+
+_HALF_DTYPES = (torch.float16, torch.bfloat16)
+
+
+def _accumulation_dtype(dtype: torch.dtype) -> torch.dtype:
+    # half precision and integer tensors are reduced in float32
+    return dtype if dtype.is_floating_point and dtype not in _HALF_DTYPES else torch.float32
+
+
+def _storage_dtype(dtype: torch.dtype) -> torch.dtype:
+    return dtype if dtype.is_floating_point else torch.float32
+
+
+_REDUCTION_FUNCTIONS: Dict[str, Callable] = {"mean": torch.add, "max": torch.maximum, "min": torch.minimum}
+
+
+def _store(accumulator: torch.Tensor, out=None) -> torch.Tensor:
+    if out is None:
+        return accumulator.to(torch.uint8)
+    return out.copy_(accumulator)
+
+
+def _quantized_mean(tensors, out=None) -> torch.Tensor:
+    # uint8 sums are accumulated in int32 and divided with rounding, so the mean stays quantized
+    accumulator = tensors[0].to(torch.int32)
+    for tensor in tensors[1:]:
+        accumulator.add_(tensor)
+    accumulator.add_(len(tensors) // 2).floor_divide_(len(tensors))
+    return _store(accumulator, out)
+
+
+def _quantized_weighted_sum(tensors, weights, out=None) -> torch.Tensor:
+    # uint8 inputs are accumulated in float32 and rounded back to uint8
+    if isinstance(tensors, torch.Tensor):
+        weights = torch.as_tensor(weights, dtype=torch.float32, device=tensors.device)
+        accumulator = torch.tensordot(weights, tensors.float(), dims=([0], [0]))
+    else:
+        weights = [float(weight) for weight in weights]
+        accumulator = torch.mul(tensors[0], weights[0]).float()
+        for tensor, weight in zip(tensors[1:], weights[1:], strict=True):
+            accumulator.add_(tensor, alpha=weight)
+    return _store(accumulator.round_().clamp_(0, 255), out)
 
 
 class PyTorchBackend(BackendInterface):
@@ -17,7 +62,7 @@ class PyTorchBackend(BackendInterface):
 
     @staticmethod
     def mean(x, axis=None):
-        return torch.mean(x.float(), dim=axis)
+        return torch.mean(x, dim=axis, dtype=_accumulation_dtype(x.dtype)).to(_storage_dtype(x.dtype))
 
     @staticmethod
     def max(x, axis=None):
@@ -45,7 +90,7 @@ class PyTorchBackend(BackendInterface):
 
     @staticmethod
     def to_numpy(x):
-        return x.detach().numpy()
+        return as_numpy(x)
 
     @staticmethod
     def clip(x, min, max):
@@ -76,10 +121,87 @@ class PyTorchBackend(BackendInterface):
         return x.unsqueeze(axis)
 
     @staticmethod
-    def load(path, device=None):
+    def empty(shape, like):
+        return torch.empty(shape, dtype=like.dtype, device=like.device)
+
+    @staticmethod
+    def from_numpy(x, device=None):
+        tensor = torch.from_numpy(x)
+        return tensor if device is None else tensor.to(device)
+
+    @staticmethod
+    def nbytes(x):
+        return x.element_size() * x.nelement()
+
+    @staticmethod
+    def shares_memory(x, y):
+        return x.untyped_storage().data_ptr() == y.untyped_storage().data_ptr()
+
+    @staticmethod
+    def stack_reduce(tensors, reduction, out=None):
+        ufunc = _REDUCTION_FUNCTIONS[reduction]
+        dtype = tensors[0].dtype
+        for tensor in tensors[1:]:
+            dtype = torch.promote_types(dtype, tensor.dtype)
+        if reduction == "mean" and dtype == torch.uint8:
+            return _quantized_mean(tensors, out)
+        # the same dtypes as `mean`, `max` and `min` give for the stacked tensors
+        accumulation = _accumulation_dtype(dtype) if reduction == "mean" else dtype
+        dtype = _storage_dtype(dtype) if reduction == "mean" else dtype
+        result = out
+        if out is None or out.dtype != accumulation:
+            out = torch.empty(tensors[0].shape, dtype=accumulation, device=tensors[0].device)
+        out.copy_(tensors[0])
+        for tensor in tensors[1:]:
+            ufunc(out, tensor, out=out)
+        if reduction == "mean":
+            out.div_(len(tensors))
+        if result is None:
+            return out.to(dtype)
+        if result is not out:
+            result.copy_(out)
+        return result
+
+    @staticmethod
+    def weighted_sum(tensors, weights, out=None, scratch=None):  # the fused multiply-add needs no scratch
+        dtype = tensors[0].dtype
+        for tensor in tensors[1:]:
+            dtype = torch.promote_types(dtype, tensor.dtype)
+        if dtype == torch.uint8:
+            return _quantized_weighted_sum(tensors, weights, out)
+        if dtype not in _HALF_DTYPES:
+            dtype = torch.promote_types(dtype, torch.get_default_dtype())  # as for weights created with `torch.tensor`
+        accumulation = _accumulation_dtype(dtype)
+        if isinstance(tensors, torch.Tensor):  # already stacked, contract the first axis without temporaries
+            weights = torch.as_tensor(weights, dtype=accumulation, device=tensors.device)
+            if dtype == accumulation:
+                return torch.tensordot(weights, tensors.to(accumulation), dims=([0], [0]), out=out)
+            result = torch.tensordot(weights, tensors.to(accumulation), dims=([0], [0])).to(dtype)
+            return result if out is None else out.copy_(result)
+        weights = [float(weight) for weight in weights]
+        result = out
+        if out is None or out.dtype != accumulation:
+            out = torch.empty(tensors[0].shape, dtype=accumulation, device=tensors[0].device)
+        torch.mul(tensors[0], weights[0], out=out)
+        for tensor, weight in zip(tensors[1:], weights[1:], strict=True):
+            out.add_(tensor, alpha=weight)  # fused multiply-add, no temporary
+        if result is None:
+            return out.to(dtype)
+        if result is not out:
+            result.copy_(out)
+        return result
+
+    @staticmethod
+    def astype(x, dtype):
+        return x.to(getattr(torch, dtype))
+
+    @staticmethod
+    def load(path, device=None, mmap_mode=None):
         if not any([str(path).endswith(suffix) for suffix in [".pt", ".pth"]]):
             logger.warning(f"file extension for {path} is different from common pytorch extensions: .pt or .pth")
-        loaded = torch.load(path, map_location=device)
+        # torch only supports copy-on-write mapping of files saved in the zipfile format (the default since 1.6),
+        # so any mmap_mode enables it. Mapping is lost when the tensor is moved to a different device.
+        loaded = torch.load(path, map_location=device, mmap=mmap_mode is not None)
         if not isinstance(loaded, torch.Tensor):
             raise ValueError(f"file {path}  is not a torch.Tensor")
         return loaded
@@ -0,0 +1,94 @@
+import threading
+import time
+from typing import Literal, Union
+
+from loguru import logger
+
+BudgetReason = Literal["max_seconds", "max_evaluations"]
+
+
+class BudgetExhausted(Exception):
+    """
+    Raised when a training budget runs out.
+
+    Attributes:
+        reason: Which limit was reached, 'max_seconds' or 'max_evaluations'
+    """
+
+    def __init__(self, reason: BudgetReason):
+        super().__init__(f"Training budget exhausted: {reason}")
+        self.reason: BudgetReason = reason
+
+
+class Budget:
+    """
+    Wall-clock and fitness evaluation budget of a training run.
+
+    Time is measured with a monotonic clock from the moment the budget is created. Evaluations are
+    reserved one at a time with `reserve`, which can be called concurrently from worker threads.
+
+    Attributes:
+        max_seconds: Maximum wall-clock time in seconds, None for no limit
+        max_evaluations: Maximum number of fitness evaluations, None for no limit
+        evaluations: Number of evaluations reserved so far
+    """
+
+    def __init__(self, max_seconds: Union[float, None] = None, max_evaluations: Union[int, None] = None):
+        self.max_seconds = max_seconds
+        self.max_evaluations = max_evaluations
+        self.evaluations = 0
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self) -> float:
+        """
+        Seconds elapsed since the budget was created.
+        """
+        return time.monotonic() - self._start
+
+    def exhausted_reason(self) -> Union[BudgetReason, None]:
+        """
+        Check whether any limit has been reached.
+
+        Returns:
+            'max_seconds' or 'max_evaluations' if the respective limit has been reached, None otherwise
+        """
+        if self.max_evaluations is not None and self.evaluations >= self.max_evaluations:
+            return "max_evaluations"
+        if self.max_seconds is not None and self.elapsed >= self.max_seconds:
+            return "max_seconds"
+        return None
+
+    def check(self):
+        """
+        Raise if the budget is exhausted.
+
+        Raises:
+            BudgetExhausted: If any limit has been reached
+        """
+        reason = self.exhausted_reason()
+        if reason is not None:
+            raise BudgetExhausted(reason)
+
+    def reserve(self):
+        """
+        Reserve a single fitness evaluation.
+
+        Raises:
+            BudgetExhausted: If any limit has been reached, in which case nothing is reserved
+        """
+        with self._lock:
+            self.check()
+            self.evaluations += 1
+        logger.opt(lazy=True).trace("Reserved evaluation {}, {:.2f}s elapsed", lambda: self.evaluations, lambda: self.elapsed)
+
+    def record(self, count: int):
+        """
+        Count evaluations that were made without reserving them, e.g. when scoring the initial population.
+
+        Args:
+            count: Number of evaluations to add, which may take the total beyond `max_evaluations`
+        """
+        with self._lock:
+            self.evaluations += count
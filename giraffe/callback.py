@@ -69,6 +69,13 @@ class Callback:
 
 
 class FitnessNoChangeEarlyStoppingCallback(Callback):
+    """
+    Stops the evolution when fitness values of the population have not changed for a number of generations.
+
+    Sets `stop_reason` of the Giraffe instance to 'fitness_no_change', to distinguish it from running out
+    of the training budget.
+    """
+
     def __init__(self, n_iterations=5):
         super().__init__()
         self._iterations_no_change = 0
@@ -84,5 +91,6 @@ class FitnessNoChangeEarlyStoppingCallback(Callback):
             self._iterations_no_change += 1
             if self._iterations_no_change >= self._n_iterations:
                 giraffe.should_stop = True
+                giraffe.stop_reason = "fitness_no_change"
         else:
             self._iterations_no_change = 0
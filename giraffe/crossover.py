@@ -1,10 +1,13 @@
+from typing import Union
+
 import numpy as np
 from loguru import logger
 
 from giraffe.tree import Tree
+from giraffe.utils import resolve_rng
 
 
-def tournament_selection_indexes(fitnesses: np.ndarray, tournament_size: int = 5) -> np.ndarray:
+def tournament_selection_indexes(fitnesses: np.ndarray, tournament_size: int = 5, rng: Union[np.random.Generator, None] = None) -> np.ndarray:
     """
     Selects parent indices for crossover using tournament selection.
 
@@ -15,6 +18,7 @@ def tournament_selection_indexes(fitnesses: np.ndarray, tournament_size: int = 5
     Args:
         fitnesses: Array of fitness values for the entire population
         tournament_size: Number of individuals to include in each tournament
+        rng: Random generator to use, defaults to the global NumPy random state
 
     Returns:
         Array with indices of the two selected parents
@@ -22,7 +26,7 @@ def tournament_selection_indexes(fitnesses: np.ndarray, tournament_size: int = 5
     Raises:
         ValueError: If tournament_size is too large relative to population size
     """
-    logger.debug(f"Running tournament selection with tournament size {tournament_size}")
+    logger.debug("Running tournament selection with tournament size {}", tournament_size)
     assert len(fitnesses.shape) == 1
 
     if tournament_size >= (len(fitnesses) - 1):
@@ -35,16 +39,17 @@ def tournament_selection_indexes(fitnesses: np.ndarray, tournament_size: int = 5
             "The population should be at least twice as large as tournament for more stable parent selection"
         )
 
-    candidates = np.random.choice(fitnesses, size=(2, tournament_size))
-    logger.trace(f"Tournament candidates fitness values: {candidates}")
+    random_source = resolve_rng(rng)
+    candidates = random_source.choice(fitnesses, size=(2, tournament_size))
+    logger.trace("Tournament candidates fitness values: {}", candidates)
     selected = np.argmax(candidates, axis=1).ravel()
     assert selected.shape == (2,)
 
-    logger.debug(f"Selected parent indices: {selected}")
+    logger.debug("Selected parent indices: {}", selected)
     return selected
 
 
-def crossover(tree1: Tree, tree2: Tree, node_type=None):
+def crossover(tree1: Tree, tree2: Tree, node_type=None, rng: Union[np.random.Generator, None] = None):
     """
     Performs crossover between two parent trees to produce two offspring trees.
 
@@ -57,6 +62,7 @@ def crossover(tree1: Tree, tree2: Tree, node_type=None):
         tree2: Second parent tree
         node_type: Type of nodes to consider for crossover points ('value_nodes' or 'op_nodes').
                    If None, a random suitable type will be chosen.
+        rng: Random generator to use, defaults to the global NumPy random state
 
     Returns:
         Tuple of two new Tree objects created by crossover
@@ -65,6 +71,7 @@ def crossover(tree1: Tree, tree2: Tree, node_type=None):
         ValueError: If node_type is 'op_nodes' but one or both trees don't have operator nodes
     """
     logger.info("Performing crossover between two trees")
+    random_source = resolve_rng(rng)
 
     if node_type is None:
         allowable_node_types = ["value_nodes"]  # TODO: this may be worth refactoring along with "get_random_node" to not use string but types instead
@@ -75,28 +82,29 @@ def crossover(tree1: Tree, tree2: Tree, node_type=None):
         else:
             logger.debug("At least one tree has no operator nodes, using only value nodes for crossover")
 
-        nodes_type = np.random.choice(allowable_node_types)
-        logger.debug(f"Randomly selected node type for crossover: {nodes_type}")
+        nodes_type = random_source.choice(allowable_node_types)
+        logger.debug("Randomly selected node type for crossover: {}", nodes_type)
     else:
         if node_type == "op_nodes" and not ((len(tree1.nodes["op_nodes"]) > 0) & (len(tree2.nodes["op_nodes"]) > 0)):
             logger.error("Node type was chosen to be operator nodes but there are no operator nodes in at least one of the parents")
             raise ValueError("Node type was chosen to be operator nodes but there are not operator nodes in at least one of the parents")
         nodes_type = node_type
-        logger.debug(f"Using specified node type for crossover: {nodes_type}")
+        logger.debug("Using specified node type for crossover: {}", nodes_type)
 
     logger.debug("Creating copies of parent trees")
     tree1, tree2 = tree1.copy(), tree2.copy()
 
     logger.debug("Selecting random nodes for crossover")
-    node1, node2 = tree1.get_random_node(nodes_type), tree2.get_random_node(nodes_type)
-    logger.debug(f"Selected nodes: {node1} from tree1, {node2} from tree2")
+    node1, node2 = tree1.get_random_node(nodes_type, rng=rng), tree2.get_random_node(nodes_type, rng=rng)
+    logger.debug("Selected nodes: {} from tree1, {} from tree2", node1, node2)
 
     logger.debug("Creating copies of subtrees")
     branch1, branch2 = node1.copy_subtree(), node2.copy_subtree()
 
     logger.debug("Swapping subtrees between trees")
-    tree1.replace_at(node1, branch2).recalculate()
-    tree2.replace_at(node2, branch1).recalculate()
+    # evaluations are cleared by `replace_at` and computed lazily when the fitness is needed
+    tree1.replace_at(node1, branch2).update_nodes()
+    tree2.replace_at(node2, branch1).update_nodes()
 
     logger.info(f"Crossover complete, created two new trees with {tree1.nodes_count} and {tree2.nodes_count} nodes")
     return tree1, tree2
@@ -1,6 +1,6 @@
 import numpy as np
-from graphviz import Digraph
 
+from giraffe.backend.interop import as_numpy
 from giraffe.globals import BACKEND as B
 from giraffe.node import Node, OperatorNode, ValueNode
 from giraffe.tree import Tree
@@ -29,17 +29,19 @@ def draw_tree(to_draw: Node | OperatorNode | Tree | ValueNode, dot=None, add_val
         node = to_draw
 
     if dot is None:
+        from graphviz import Digraph  # optional dependency, only needed for drawing
+
         dot = Digraph(comment="Tree")
 
     if isinstance(node, ValueNode):
         if node.value is not None:
-            value = B.to_numpy(node.value) if (np.prod(node.value.shape) <= 9) else f"Tensor with memory adress: {hex(id(node.value))}"
+            value = as_numpy(node.value) if (np.prod(node.value.shape) <= 9) else f"Tensor with memory adress: {hex(id(node.value))}"
         else:
             value = None
 
         if node.evaluation is not None:
             evaluation = (
-                B.to_numpy(node.evaluation) if (np.prod(B.shape(node.evaluation)) <= 9) else f"Tensor with memory adress: {hex(id(node.evaluation))}"
+                as_numpy(node.evaluation) if (np.prod(B.shape(node.evaluation)) <= 9) else f"Tensor with memory adress: {hex(id(node.evaluation))}"
             )
         else:
             evaluation = None
@@ -1,14 +1,21 @@
 from functools import partial
-from typing import Literal
+from typing import TYPE_CHECKING, Literal, Tuple, Type, Union
 
-import torch
+import numpy as np
+from loguru import logger
 
-from giraffe.globals import BACKEND as B
+from giraffe.accumulators import AccuracyAccumulator, AUROCAccumulator, AveragePrecisionAccumulator, HistogramAccumulator
+from giraffe.backend.interop import as_numpy, as_torch
+from giraffe.fitness_context import FitnessContext, uses_fitness_context
 from giraffe.lib_types import Tensor
+from giraffe.quantization import dequantize
 from giraffe.tree import Tree
 
+if TYPE_CHECKING:
+    import torch
 
-def _infer_num_classes(gt: torch.Tensor, task: str) -> int:
+
+def _infer_num_classes(gt: "torch.Tensor", task: str) -> int:
     """
     Infer the number of classes from the ground truth tensor based on the task.
 
@@ -35,7 +42,41 @@ def _infer_num_classes(gt: torch.Tensor, task: str) -> int:
         raise ValueError(f"Unknown task type: {task}")
 
 
-def average_precision_fitness(tree: Tree, gt: Tensor, task: Literal["binary", "multiclass", "multilabel"] = "binary") -> float:
+def _torch_labels(gt: Union[Tensor, FitnessContext], task: str) -> Tuple["torch.Tensor", int]:
+    """
+    Convert ground truth to squeezed PyTorch labels and infer the number of classes, unless given a fitness context.
+    """
+    if isinstance(gt, FitnessContext):
+        gt.check_task(task)
+        return gt.labels, gt.num_classes
+    gt = as_torch(gt)
+    return gt.squeeze(), _infer_num_classes(gt, task)
+
+
+def _quantized(gt: Union[Tensor, FitnessContext]) -> bool:
+    # predictions are only treated as quantized when the context says so, uint8 alone may hold anything
+    return isinstance(gt, FitnessContext) and gt.quantized
+
+
+def _torch_predictions(tree: Tree, gt: Union[Tensor, FitnessContext]) -> "torch.Tensor":
+    """
+    Evaluation of the tree as a PyTorch tensor, with half precision predictions computed on in float32
+    and predictions dequantized if the fitness context marks them as quantized.
+    """
+    import torch
+
+    pred = as_torch(tree.evaluation)
+    if pred.dtype in (torch.float16, torch.bfloat16):
+        pred = as_torch(pred, dtype=torch.float32)
+    return dequantize(pred) if _quantized(gt) else pred
+
+
+def _numpy_labels(gt: Union[Tensor, FitnessContext]) -> Tensor:
+    return gt.labels_numpy if isinstance(gt, FitnessContext) else gt
+
+
+@uses_fitness_context
+def average_precision_fitness(tree: Tree, gt: Union[Tensor, FitnessContext], task: Literal["binary", "multiclass", "multilabel"] = "binary") -> float:
     """
     Calculate the Average Precision (AP) score as a fitness measure using torchmetrics.
 
@@ -45,7 +86,7 @@ def average_precision_fitness(tree: Tree, gt: Tensor, task: Literal["binary", "m
 
     Args:
         tree: The tree whose evaluation will be compared against ground truth
-        gt: Ground truth tensor containing labels
+        gt: Ground truth tensor containing labels, or a `FitnessContext` built from it
         task: Classification task type:
             - 'binary': Binary classification (default)
             - 'multiclass': Multiclass classification
@@ -56,18 +97,10 @@ def average_precision_fitness(tree: Tree, gt: Tensor, task: Literal["binary", "m
     """
     from torchmetrics.classification import AveragePrecision
 
-    # Ensure inputs are PyTorch tensors
-    if not isinstance(tree.evaluation, torch.Tensor):
-        pred = torch.tensor(B.to_numpy(tree.evaluation))
-    else:
-        pred = tree.evaluation
-
-    if not isinstance(gt, torch.Tensor):
-        gt = torch.tensor(B.to_numpy(gt))
+    # Ensure inputs are PyTorch tensors, sharing memory with NumPy arrays; labels are taken from the fitness context when given
+    pred = _torch_predictions(tree, gt)
 
-    # Infer number of classes from ground truth
-    num_classes = _infer_num_classes(gt, task)
-    gt = gt.squeeze()
+    gt, num_classes = _torch_labels(gt, task)
 
     # Create metric with appropriate parameters based on task
     if task == "multiclass":
@@ -81,7 +114,8 @@ def average_precision_fitness(tree: Tree, gt: Tensor, task: Literal["binary", "m
     return metric(pred, gt).item()
 
 
-def roc_auc_score_fitness(tree: Tree, gt: Tensor, task: Literal["binary", "multiclass", "multilabel"] = "binary") -> float:
+@uses_fitness_context
+def roc_auc_score_fitness(tree: Tree, gt: Union[Tensor, FitnessContext], task: Literal["binary", "multiclass", "multilabel"] = "binary") -> float:
     """
     Calculate the Area Under the ROC Curve (AUC-ROC) score as a fitness measure using torchmetrics.
 
@@ -91,7 +125,7 @@ def roc_auc_score_fitness(tree: Tree, gt: Tensor, task: Literal["binary", "multi
 
     Args:
         tree: The tree whose evaluation will be compared against ground truth
-        gt: Ground truth tensor containing labels
+        gt: Ground truth tensor containing labels, or a `FitnessContext` built from it
         task: Classification task type:
             - 'binary': Binary classification (default)
             - 'multiclass': Multiclass classification
@@ -102,18 +136,10 @@ def roc_auc_score_fitness(tree: Tree, gt: Tensor, task: Literal["binary", "multi
     """
     from torchmetrics.classification import AUROC
 
-    # Ensure inputs are PyTorch tensors
-    if not isinstance(tree.evaluation, torch.Tensor):
-        pred = torch.tensor(B.to_numpy(tree.evaluation))
-    else:
-        pred = tree.evaluation
-
-    if not isinstance(gt, torch.Tensor):
-        gt = torch.tensor(B.to_numpy(gt))
+    # Ensure inputs are PyTorch tensors, sharing memory with NumPy arrays; labels are taken from the fitness context when given
+    pred = _torch_predictions(tree, gt)
 
-    # Infer number of classes from ground truth
-    num_classes = _infer_num_classes(gt, task)
-    gt = gt.squeeze()
+    gt, num_classes = _torch_labels(gt, task)
 
     # Create metric with appropriate parameters based on task
     if task == "multiclass":
@@ -127,7 +153,8 @@ def roc_auc_score_fitness(tree: Tree, gt: Tensor, task: Literal["binary", "multi
     return metric(pred, gt).item()
 
 
-def accuracy_fitness(tree: Tree, gt: Tensor, task: Literal["binary", "multiclass", "multilabel"] = "binary") -> float:
+@uses_fitness_context
+def accuracy_fitness(tree: Tree, gt: Union[Tensor, FitnessContext], task: Literal["binary", "multiclass", "multilabel"] = "binary") -> float:
     """
     Calculate the Accuracy score as a fitness measure using torchmetrics.
 
@@ -136,7 +163,7 @@ def accuracy_fitness(tree: Tree, gt: Tensor, task: Literal["binary", "multiclass
 
     Args:
         tree: The tree whose evaluation will be compared against ground truth
-        gt: Ground truth tensor containing labels
+        gt: Ground truth tensor containing labels, or a `FitnessContext` built from it
         task: Classification task type:
             - 'binary': Binary classification (default)
             - 'multiclass': Multiclass classification
@@ -147,18 +174,10 @@ def accuracy_fitness(tree: Tree, gt: Tensor, task: Literal["binary", "multiclass
     """
     from torchmetrics.classification import Accuracy
 
-    # Ensure inputs are PyTorch tensors
-    if not isinstance(tree.evaluation, torch.Tensor):
-        pred = torch.tensor(B.to_numpy(tree.evaluation))
-    else:
-        pred = tree.evaluation
-
-    if not isinstance(gt, torch.Tensor):
-        gt = torch.tensor(B.to_numpy(gt))
+    # Ensure inputs are PyTorch tensors, sharing memory with NumPy arrays; labels are taken from the fitness context when given
+    pred = _torch_predictions(tree, gt)
 
-    # Infer number of classes from ground truth
-    num_classes = _infer_num_classes(gt, task)
-    gt = gt.squeeze()
+    gt, num_classes = _torch_labels(gt, task)
 
     # Create metric with appropriate parameters based on task
     if task == "multiclass":
@@ -172,6 +191,201 @@ def accuracy_fitness(tree: Tree, gt: Tensor, task: Literal["binary", "multiclass
     return metric(pred, gt).item()
 
 
+def _quantized_metric(
+    accumulator_type: Type[HistogramAccumulator],
+    tree: Tree,
+    gt: Union[Tensor, FitnessContext],
+    task: Literal["binary", "multiclass"],
+    bits: int,
+    sample_weight: Union[np.ndarray, None],
+) -> Tuple[float, float]:
+    accumulator = accumulator_type(n_bins=2**bits, task=task, quantized=_quantized(gt))
+    accumulator.update(tree.evaluation, _numpy_labels(gt), sample_weight=sample_weight)
+    return accumulator.compute_with_bound()
+
+
+def quantized_average_precision_with_bound(
+    tree: Tree,
+    gt: Union[Tensor, FitnessContext],
+    task: Literal["binary", "multiclass"] = "binary",
+    bits: int = 10,
+    sample_weight: Union[np.ndarray, None] = None,
+) -> Tuple[float, float]:
+    """
+    Calculate Average Precision over scores binned into 2^bits buckets, together with its error bound.
+
+    Instead of sorting scores in O(N log N), samples are counted per (bucket, label) with `np.bincount`
+    and the metric is computed in O(N + 2^bits). Scores are expected in [0, 1]. The result is exact when
+    scores take at most one distinct value per bucket, e.g. for low-precision probabilities, see
+    `giraffe.accumulators.HistogramAccumulator`. Quantized uint8 scores, marked by a `FitnessContext` with
+    `quantized` set, are counted directly and the result is exact for bits >= 8.
+
+    Args:
+        tree: The tree whose evaluation will be compared against ground truth
+        gt: Ground truth tensor containing labels, or a `FitnessContext` built from it
+        task: 'binary' or 'multiclass' (macro-averaged one-vs-rest)
+        bits: Number of bits of the buckets, 2^bits buckets are used
+        sample_weight: Optional weights of the samples
+
+    Returns:
+        Tuple of the Average Precision score and the maximum absolute difference from the score on unbinned predictions
+    """
+    return _quantized_metric(AveragePrecisionAccumulator, tree, gt, task, bits, sample_weight)
+
+
+def quantized_roc_auc_with_bound(
+    tree: Tree,
+    gt: Union[Tensor, FitnessContext],
+    task: Literal["binary", "multiclass"] = "binary",
+    bits: int = 10,
+    sample_weight: Union[np.ndarray, None] = None,
+) -> Tuple[float, float]:
+    """
+    Calculate ROC AUC over scores binned into 2^bits buckets, together with its error bound.
+
+    See `quantized_average_precision_with_bound` for details.
+
+    Args:
+        tree: The tree whose evaluation will be compared against ground truth
+        gt: Ground truth tensor containing labels, or a `FitnessContext` built from it
+        task: 'binary' or 'multiclass' (macro-averaged one-vs-rest)
+        bits: Number of bits of the buckets, 2^bits buckets are used
+        sample_weight: Optional weights of the samples
+
+    Returns:
+        Tuple of the ROC AUC score and the maximum absolute difference from the score on unbinned predictions
+    """
+    return _quantized_metric(AUROCAccumulator, tree, gt, task, bits, sample_weight)
+
+
+@uses_fitness_context
+def quantized_average_precision_fitness(
+    tree: Tree,
+    gt: Union[Tensor, FitnessContext],
+    task: Literal["binary", "multiclass"] = "binary",
+    bits: int = 10,
+    sample_weight: Union[np.ndarray, None] = None,
+) -> float:
+    """
+    Average Precision over scores binned into 2^bits buckets, computed in O(N + 2^bits).
+
+    Drop-in replacement of `average_precision_fitness`, see `quantized_average_precision_with_bound`.
+
+    Returns:
+        Average Precision score as a float between 0 and 1 (higher is better)
+    """
+    value, bound = quantized_average_precision_with_bound(tree, gt, task, bits, sample_weight)
+    logger.trace(f"Quantized average precision {value:.6f} with error bound {bound:.6f}")
+    return value
+
+
+@uses_fitness_context
+def quantized_roc_auc_fitness(
+    tree: Tree,
+    gt: Union[Tensor, FitnessContext],
+    task: Literal["binary", "multiclass"] = "binary",
+    bits: int = 10,
+    sample_weight: Union[np.ndarray, None] = None,
+) -> float:
+    """
+    ROC AUC over scores binned into 2^bits buckets, computed in O(N + 2^bits).
+
+    Drop-in replacement of `roc_auc_score_fitness`, see `quantized_average_precision_with_bound`.
+
+    Returns:
+        ROC AUC score as a float between 0 and 1 (higher is better)
+    """
+    value, bound = quantized_roc_auc_with_bound(tree, gt, task, bits, sample_weight)
+    logger.trace(f"Quantized ROC AUC {value:.6f} with error bound {bound:.6f}")
+    return value
+
+
+def _weighted_inputs(tree: Tree, gt: Union[Tensor, FitnessContext], task: str) -> Tuple[np.ndarray, np.ndarray]:
+    pred = as_numpy(tree.evaluation)
+    if pred.dtype == np.float16:  # scikit-learn computes in the precision of its inputs
+        pred = as_numpy(pred, np.float32)
+    if _quantized(gt):
+        pred = dequantize(pred)
+    labels = as_numpy(_numpy_labels(gt)).reshape(-1)
+    if task == "multiclass":
+        pred = pred.reshape(len(labels), -1)
+        if isinstance(gt, FitnessContext) and gt.num_classes == pred.shape[1]:
+            return pred, gt.one_hot
+        return pred, labels[:, None] == np.arange(pred.shape[1])
+    return pred.reshape(-1), labels
+
+
+@uses_fitness_context
+def weighted_average_precision_fitness(
+    tree: Tree, gt: Union[Tensor, FitnessContext], sample_weight: Union[np.ndarray, None] = None, task: Literal["binary", "multiclass"] = "binary"
+) -> float:
+    """
+    Calculate the Average Precision (AP) score with sample weights using scikit-learn.
+
+    Meant for training on deduplicated samples (`Giraffe(deduplicate_samples=True)`), where each weight is the
+    number of occurrences of a sample, which gives the same result as `average_precision_fitness` on full data.
+
+    Args:
+        tree: The tree whose evaluation will be compared against ground truth
+        gt: Ground truth tensor containing labels, or a `FitnessContext` built from it
+        sample_weight: Optional weights of the samples
+        task: 'binary' or 'multiclass' (macro-averaged one-vs-rest)
+
+    Returns:
+        Average Precision score as a float between 0 and 1 (higher is better)
+    """
+    from sklearn.metrics import average_precision_score
+
+    pred, labels = _weighted_inputs(tree, gt, task)
+    return float(average_precision_score(labels, pred, average="macro", sample_weight=sample_weight))
+
+
+@uses_fitness_context
+def weighted_roc_auc_score_fitness(
+    tree: Tree, gt: Union[Tensor, FitnessContext], sample_weight: Union[np.ndarray, None] = None, task: Literal["binary", "multiclass"] = "binary"
+) -> float:
+    """
+    Calculate the ROC AUC score with sample weights using scikit-learn.
+
+    See `weighted_average_precision_fitness` for details.
+
+    Args:
+        tree: The tree whose evaluation will be compared against ground truth
+        gt: Ground truth tensor containing labels, or a `FitnessContext` built from it
+        sample_weight: Optional weights of the samples
+        task: 'binary' or 'multiclass' (macro-averaged one-vs-rest)
+
+    Returns:
+        ROC AUC score as a float between 0 and 1 (higher is better)
+    """
+    from sklearn.metrics import roc_auc_score
+
+    pred, labels = _weighted_inputs(tree, gt, task)
+    return float(roc_auc_score(labels, pred, average="macro", sample_weight=sample_weight))
+
+
+@uses_fitness_context
+def weighted_accuracy_fitness(
+    tree: Tree, gt: Union[Tensor, FitnessContext], sample_weight: Union[np.ndarray, None] = None, task: Literal["binary", "multiclass"] = "binary"
+) -> float:
+    """
+    Calculate the Accuracy score with sample weights.
+
+    Binary predictions are thresholded at 0.5, multiclass predictions are compared with labels by argmax.
+    See `weighted_average_precision_fitness` for details.
+
+    Args:
+        tree: The tree whose evaluation will be compared against ground truth
+        gt: Ground truth tensor containing labels, or a `FitnessContext` built from it
+        sample_weight: Optional weights of the samples
+        task: 'binary' or 'multiclass'
+
+    Returns:
+        Accuracy score as a float between 0 and 1 (higher is better)
+    """
+    return AccuracyAccumulator(task=task, quantized=_quantized(gt)).update(tree.evaluation, _numpy_labels(gt), sample_weight=sample_weight).compute()
+
+
 # Convenience partial functions for different classification tasks
 average_precision_binary = partial(average_precision_fitness, task="binary")
 average_precision_multiclass = partial(average_precision_fitness, task="multiclass")
@@ -184,3 +398,18 @@ roc_auc_multilabel = partial(roc_auc_score_fitness, task="multilabel")
 accuracy_binary = partial(accuracy_fitness, task="binary")
 accuracy_multiclass = partial(accuracy_fitness, task="multiclass")
 accuracy_multilabel = partial(accuracy_fitness, task="multilabel")
+
+quantized_average_precision_binary = partial(quantized_average_precision_fitness, task="binary")
+quantized_average_precision_multiclass = partial(quantized_average_precision_fitness, task="multiclass")
+
+quantized_roc_auc_binary = partial(quantized_roc_auc_fitness, task="binary")
+quantized_roc_auc_multiclass = partial(quantized_roc_auc_fitness, task="multiclass")
+
+weighted_average_precision_binary = partial(weighted_average_precision_fitness, task="binary")
+weighted_average_precision_multiclass = partial(weighted_average_precision_fitness, task="multiclass")
+
+weighted_roc_auc_binary = partial(weighted_roc_auc_score_fitness, task="binary")
+weighted_roc_auc_multiclass = partial(weighted_roc_auc_score_fitness, task="multiclass")
+
+weighted_accuracy_binary = partial(weighted_accuracy_fitness, task="binary")
+weighted_accuracy_multiclass = partial(weighted_accuracy_fitness, task="multiclass")
@@ -0,0 +1,170 @@
+import inspect
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, TypeVar, Union
+
+import numpy as np
+from loguru import logger
+
+from giraffe.backend.interop import as_numpy, as_torch
+from giraffe.lib_types import Tensor
+
+if TYPE_CHECKING:
+    import torch
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class FitnessContext:
+    """
+    Ground truth preprocessed once for all fitness calls.
+
+    Fitness functions decorated with `uses_fitness_context` accept a context in place of the ground truth tensor,
+    so that label conversion, squeezing and class counting are not repeated for every evaluated tree.
+    `Giraffe` builds it once after loading the data. The context is immutable: its attributes cannot be reassigned
+    and its NumPy arrays are read-only.
+
+    Attributes:
+        task: Classification task type the context was built for ('binary', 'multiclass' or 'multilabel')
+        gt: Original ground truth tensor
+        labels_numpy: Labels as an integer NumPy array, flattened for binary and multiclass tasks
+        num_classes: Number of classes, 1 for binary tasks
+        one_hot: Boolean array of shape (N, num_classes) marking positive samples of every class
+        class_counts: Number of positive samples of every class
+        quantized: Whether predictions are quantized probabilities (see `giraffe.quantization`), only then are uint8
+            predictions dequantized by fitness functions
+    """
+
+    __slots__ = ("task", "gt", "labels_numpy", "num_classes", "one_hot", "class_counts", "quantized", "_labels")
+
+    def __init__(
+        self,
+        task: str,
+        gt: Tensor,
+        labels_numpy: np.ndarray,
+        num_classes: int,
+        one_hot: np.ndarray,
+        class_counts: np.ndarray,
+        quantized: bool = False,
+    ):
+        self.task = task
+        self.gt = gt
+        self.labels_numpy = labels_numpy
+        self.num_classes = num_classes
+        self.one_hot = one_hot
+        self.class_counts = class_counts
+        self.quantized = quantized
+        self._labels: Union["torch.Tensor", None] = None
+
+    def __setattr__(self, name: str, value: Any):
+        # fields are set once in __init__, only the cache of `labels` is filled later
+        if name != "_labels" and hasattr(self, name):
+            raise AttributeError(f"FitnessContext is immutable, cannot set '{name}'")
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name: str):
+        raise AttributeError(f"FitnessContext is immutable, cannot delete '{name}'")
+
+    @property
+    def labels(self) -> "torch.Tensor":
+        """
+        Squeezed labels as a PyTorch tensor, as expected by torchmetrics.
+
+        It is built from `gt` on first access and kept, so PyTorch is only imported by fitness functions that need it.
+        """
+        if self._labels is None:
+            self._labels = as_torch(self.gt).squeeze()
+        return self._labels
+
+    @classmethod
+    def build(cls, gt: Tensor, task: str = "binary", quantized: bool = False) -> "FitnessContext":
+        """
+        Preprocess ground truth for the given task.
+
+        Args:
+            gt: Ground truth tensor containing labels
+            task: 'binary', 'multiclass' or 'multilabel'
+            quantized: Whether predictions are quantized probabilities
+
+        Returns:
+            New fitness context
+        """
+        labels_numpy = as_numpy(gt, np.intp)
+        if task == "multilabel":
+            labels_numpy = labels_numpy.reshape(len(labels_numpy), -1)
+            one_hot = labels_numpy.astype(bool)
+        elif task == "multiclass":
+            labels_numpy = labels_numpy.reshape(-1)
+            one_hot = labels_numpy[:, None] == np.arange(int(labels_numpy.max()) + 1)
+        elif task == "binary":
+            labels_numpy = labels_numpy.reshape(-1)
+            one_hot = labels_numpy[:, None].astype(bool)
+        else:
+            raise ValueError(f"Unknown task type: {task}")
+        class_counts = one_hot.sum(axis=0)
+        for array in (labels_numpy, one_hot, class_counts):
+            array.flags.writeable = False
+        logger.debug(f"Built {task} fitness context for {len(labels_numpy)} samples and {one_hot.shape[1]} classes")
+        return cls(task, gt, labels_numpy, one_hot.shape[1], one_hot, class_counts, quantized)
+
+    def check_task(self, task: str):
+        """
+        Raise ValueError if the context was built for a different task.
+        """
+        if task != self.task:
+            raise ValueError(f"Fitness context was built for task '{self.task}', but '{task}' was requested")
+
+
+def uses_fitness_context(function: F) -> F:
+    """
+    Mark a fitness function as accepting a `FitnessContext` in place of the ground truth tensor.
+
+    The function still needs to accept a plain ground truth tensor, e.g. when called directly.
+    """
+    function.uses_fitness_context = True  # type: ignore[attr-defined]
+    return function
+
+
+def fitness_task(fitness_function: Callable) -> str:
+    """
+    Find the task a fitness function is configured for.
+
+    The task is taken from the `task` keyword of (possibly nested) partials, the `task` attribute of callable
+    objects or the default value of the `task` parameter, in that order.
+
+    Args:
+        fitness_function: Fitness function, partial or callable object
+
+    Returns:
+        Task name, 'binary' if it cannot be determined
+    """
+    function = fitness_function
+    while isinstance(function, partial):
+        if "task" in function.keywords:
+            return function.keywords["task"]
+        function = function.func
+    if isinstance(getattr(function, "task", None), str):
+        return function.task  # type: ignore[attr-defined]
+    parameter = inspect.signature(function).parameters.get("task")
+    if parameter is not None and parameter.default is not inspect.Parameter.empty:
+        return parameter.default
+    return "binary"
+
+
+def fitness_context_for(fitness_function: Callable, gt: Tensor, quantized: bool = False) -> Union[FitnessContext, None]:
+    """
+    Build a fitness context for the fitness function, if it accepts one.
+
+    Args:
+        fitness_function: Fitness function, partial or callable object
+        gt: Ground truth tensor
+        quantized: Whether predictions are quantized probabilities
+
+    Returns:
+        Fitness context for the task of the function, or None if the function does not use contexts
+    """
+    function = fitness_function
+    while isinstance(function, partial):
+        function = function.func
+    if not getattr(function, "uses_fitness_context", False):
+        return None
+    return FitnessContext.build(gt, fitness_task(fitness_function), quantized)
@@ -1,26 +1,41 @@
+import inspect
 import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Callable, Iterable, List, Sequence, Type, Union
+from typing import Callable, Deque, Dict, Iterable, List, Sequence, Set, Tuple, Type, Union
 
 import numpy as np
 import numpy.typing as npt
 from loguru import logger
 
 import giraffe.lib_types as lib_types
+from giraffe.arena import ArenaPool
 from giraffe.backend.backend import Backend
+from giraffe.budget import Budget, BudgetExhausted
 from giraffe.callback import Callback
 from giraffe.crossover import crossover, tournament_selection_indexes
 from giraffe.fitness import average_precision_fitness
+from giraffe.fitness_context import fitness_context_for
 from giraffe.globals import BACKEND as B
 from giraffe.globals import DEVICE, set_postprocessing_function
 from giraffe.lib_types import Tensor
+from giraffe.metrics import FitnessResult, split_fitness
 from giraffe.mutation import get_allowed_mutations
 from giraffe.node import OperatorNode
 from giraffe.operators import MAX, MEAN, MIN, WEIGHTED_MEAN
+from giraffe.parallel import limit_intra_op_threads, pinned_postprocessing, thread_map
 from giraffe.population import choose_pareto_then_sorted, initialize_individuals
+from giraffe.quantization import QUANTIZED_DTYPE, quantize
+from giraffe.racing import RacingEvaluator
+from giraffe.store import PackedStore, is_packed_store
+from giraffe.streaming import evaluate_in_chunks
 from giraffe.tree import Tree
 from giraffe.utils import first_uniques_mask, mark_paths
 
+COMPUTE_DTYPES = (None, "float32", "float16", "bfloat16", QUANTIZED_DTYPE)
+
 
 class Giraffe:
     """
@@ -44,45 +59,89 @@ class Giraffe:
         allowed_ops: Operator node types allowed in tree construction
         train_tensors: Dictionary mapping model names to their prediction tensors
         gt_tensor: Ground truth tensor for comparison
+        fitness_context: Ground truth preprocessed once for the fitness function, or None if the function does not use it
         population: Current population of trees
         additional_population: Additional trees generated during evolution
+        should_stop: Flag that callbacks can set to stop the evolution
+        stop_reason: Why the last training stopped early: 'max_seconds' or 'max_evaluations' when the budget
+            ran out, the reason set by a callback (e.g. 'fitness_no_change'), or None if it ran to completion
+        budget: Budget of the last training run, with the number of evaluations and elapsed time
     """
 
     def __init__(
         self,
         preds_source: Union[Path, str, Iterable[Path], Iterable[str]],
-        gt_path: Union[Path, str],
+        gt_path: Union[Path, str, Iterable[Path], Iterable[str], None],
         population_size: int,
         population_multiplier: int,
         tournament_size: int,
-        fitness_function: Callable[[Tree, lib_types.Tensor], float] = average_precision_fitness,
+        fitness_function: Callable[[Tree, lib_types.Tensor], Union[float, FitnessResult]] = average_precision_fitness,
         allowed_ops: Sequence[Type[OperatorNode]] = (MEAN, MIN, MAX, WEIGHTED_MEAN),
         callbacks: Iterable[Callback] = tuple(),
         backend: Union[Backend, None] = None,
-        seed: int = 0,
+        seed: Union[int, np.random.SeedSequence, None] = 0,
         postprocessing_function=None,
+        n_jobs: int = 1,
+        intra_op_threads: Union[int, None] = 1,
+        mmap_mode: Union[str, None] = None,
+        load_jobs: Union[int, None] = None,
+        chunk_size: Union[int, None] = None,
+        deduplicate_samples: bool = False,
+        racing: Union[RacingEvaluator, None] = None,
+        compute_dtype: Union[str, None] = None,
+        reuse_buffers: bool = False,
     ):
         """
         Initialize the Giraffe evolutionary algorithm.
 
         Args:
-            preds_source: Source of model predictions, can be a path to directory or iterable of paths
-            gt_path: Path to ground truth data
+            preds_source: Source of model predictions, can be a path to directory, iterable of paths
+            or a path to a packed store written by `giraffe.store.pack`, which is memory-mapped without copies
+            gt_path: Path to ground truth data. Can be None if preds_source is a packed store containing ground truth.
             population_size: Size of the population to evolve
             population_multiplier: Factor determining how many additional trees to generate
             tournament_size: Number of trees to consider in tournament selection
-            fitness_function: Function to evaluate fitness of trees
+            fitness_function: Function to evaluate fitness of trees. It can return a `giraffe.metrics.FitnessResult`
+            instead of a float, whose secondary objectives are then maximized by Pareto selection next to fitness and tree size.
+            Functions marked with `giraffe.fitness_context.uses_fitness_context` receive a `FitnessContext` built once
+            from the ground truth instead of the ground truth tensor.
             allowed_ops: Sequence of operator node types that can be used in trees
             callbacks: Iterable of callback objects for monitoring/modifying evolution
             backend: Optional backend implementation for tensor operations
-            seed: Random seed for reproducibility
+            seed: Random seed for reproducibility. All randomness of the instance comes from a Generator created from it,
+            the global NumPy random state is not used. Worker streams are spawned from the same SeedSequence.
             postprocessing_function: Function applied after each Op Node.
             Most of the operations may break some data characteristics, for example vector summing to one. This can be used to fix that.
+            n_jobs: Number of threads used to evaluate fitness of trees. NumPy and PyTorch kernels release the GIL,
+            so threads give a speedup without pickling or shared memory. 1 means serial evaluation.
+            intra_op_threads: Maximum number of BLAS/OpenMP/PyTorch threads per kernel while evaluating with n_jobs > 1,
+            to avoid oversubscription. None leaves the limits untouched.
+            mmap_mode: If set, prediction and ground truth files are memory-mapped instead of read into memory
+            (see `numpy.load`, e.g. 'r' or 'c'), so that only the pages touched during evaluation are read from disk.
+            Predictions split into several files are still concatenated in memory.
+            load_jobs: Number of threads used to load prediction and ground truth files. None uses the default
+            of `concurrent.futures.ThreadPoolExecutor`.
+            chunk_size: If set, trees are evaluated in chunks of this many samples (see `giraffe.streaming`), so that
+            only the final evaluation of a tree is kept in memory instead of evaluations of all its nodes.
+            deduplicate_samples: If True, samples with identical predictions of all models and identical labels are
+            collapsed into a single sample weighted by the number of its occurrences, so every tree is evaluated on
+            the compressed data. The fitness function then needs to accept a `sample_weight` argument,
+            e.g. `giraffe.fitness.weighted_average_precision_fitness`. Operators and the postprocessing function
+            need to work on each sample independently.
+            racing: Optional `RacingEvaluator`. If set, offspring are first scored on a subsample of the data and only those
+            that could survive selection are evaluated on full data.
+            compute_dtype: If set, predictions are converted to this dtype when loaded: 'float32', 'float16' or 'bfloat16'
+            (PyTorch backend only). Operator nodes keep results in this dtype, accumulating half precision sums in float32,
+            and fitness functions compute on half precision predictions in float32. 'uint8' quantizes probabilities to
+            256 levels (see `giraffe.quantization`), which suits ranking fitness functions such as
+            `giraffe.fitness.quantized_average_precision_fitness`. None keeps the dtype of the files.
+            reuse_buffers: If True, trees are evaluated into pools of preallocated buffers, one per concurrent evaluation
+            (see `giraffe.arena`), that are reused once the fitness is computed, instead of allocating a new tensor for
+            every operator node. Evaluations are then not kept on the trees. The buffers are freed when training ends.
+            Ignored when `chunk_size` is set.
         """
         if backend is not None:
             Backend.set_backend(backend)
-        if seed is not None:
-            np.random.seed(seed)
         if postprocessing_function:
             set_postprocessing_function(postprocessing_function)
 
@@ -92,13 +151,33 @@ class Giraffe:
         self.fitness_function = fitness_function
         self.callbacks = callbacks
         self.allowed_ops = allowed_ops
+        self.n_jobs = n_jobs
+        self.intra_op_threads = intra_op_threads
+        self.mmap_mode = mmap_mode
+        self.load_jobs = load_jobs
+        self.chunk_size = chunk_size
+        self.racing = racing
+        if compute_dtype not in COMPUTE_DTYPES:
+            raise ValueError(f"compute_dtype must be one of {COMPUTE_DTYPES}, got {compute_dtype}")
+        self.compute_dtype = compute_dtype
+        self.reuse_buffers = reuse_buffers
+        self._arenas = ArenaPool()
+        self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(self.seed_sequence)
 
         self.train_tensors, self.gt_tensor = self._build_train_tensors(preds_source, gt_path)
-        self.ids, self.models = list(self.train_tensors.keys()), list(self.train_tensors.values())
         self._validate_input()
+        self.sample_weights: None | npt.NDArray[np.float64] = None
+        if deduplicate_samples:
+            self._deduplicate_samples()
+        self.fitness_context = fitness_context_for(fitness_function, self.gt_tensor, quantized=self.compute_dtype == QUANTIZED_DTYPE)
+        self.ids, self.models = list(self.train_tensors.keys()), list(self.train_tensors.values())
 
         # state
         self.should_stop = False
+        self.stop_reason: Union[str, None] = None
+        self.budget: Union[Budget, None] = None
+        self._budget: Union[Budget, None] = None
 
         self.population = self._initialize_population()
         self.additional_population: List[Tree] = []  # for potential callbacks
@@ -124,7 +203,7 @@ class Giraffe:
             List of initialized Tree objects
         """
         logger.info(f"Initializing population with size {self.population_size}")
-        population = initialize_individuals(self.train_tensors, self.population_size)
+        population = initialize_individuals(self.train_tensors, self.population_size, rng=self.rng)
         logger.debug(f"Population initialized with {len(population)} individuals")
         return population
 
@@ -140,51 +219,98 @@ class Giraffe:
         """
         if trees is None:
             trees = self.population
-        logger.debug(f"Calculating fitness for {len(trees)} trees")
-        fitnesses = np.array([self.fitness_function(tree, self.gt_tensor) for tree in trees])
-        logger.trace(f"Fitness stats - min: {fitnesses.min():.4f}, max: {fitnesses.max():.4f}, mean: {fitnesses.mean():.4f}")
+        if len(trees) == 0:
+            return np.array([], dtype=np.float64)
+        logger.debug("Calculating fitness for {} trees", len(trees))
+        if self.n_jobs > 1 and len(trees) > 1:
+            fitnesses = np.array(thread_map(self._tree_fitness, trees, self.n_jobs, self.intra_op_threads))
+        else:
+            fitnesses = np.array([self._tree_fitness(tree) for tree in trees])
+        logger.opt(lazy=True).trace(
+            "Fitness stats - min: {:.4f}, max: {:.4f}, mean: {:.4f}", lambda: fitnesses.min(), lambda: fitnesses.max(), lambda: fitnesses.mean()
+        )
         return fitnesses
 
+    def _tree_fitness(self, tree: Tree) -> float:
+        if self._budget is not None:
+            self._budget.reserve()
+        if self.chunk_size is not None and tree.root.evaluation is None and tree.root.children:
+            tree.root.evaluation = evaluate_in_chunks(tree, self.chunk_size)
+        elif self.reuse_buffers and tree.root.evaluation is None:
+            with self._arenas.borrow() as arena, arena.evaluate(tree):
+                return self._evaluated_tree_fitness(tree)
+        return self._evaluated_tree_fitness(tree)
+
+    def _evaluated_tree_fitness(self, tree: Tree) -> float:
+        gt = self.gt_tensor if self.fitness_context is None else self.fitness_context
+        if self.sample_weights is not None:
+            result = self.fitness_function(tree, gt, sample_weight=self.sample_weights)  # type: ignore[call-arg]
+        else:
+            result = self.fitness_function(tree, gt)
+        fitness, tree.objectives = split_fitness(result)
+        return fitness
+
     def run_iteration(self):
         """
         Run a single iteration of the evolutionary algorithm.
 
         This method:
-        1. Calculates fitness values for the current population
+        1. Calculates fitness values for the current population, unless they are already known
         2. Performs tournament selection and crossover to create new trees
         3. Applies mutations to some of the new trees
-        4. Removes duplicate trees from the population
+        4. Removes duplicate trees and calculates fitness of the new ones
+        5. Selects the next population
+
+        If a training budget runs out in the middle of the iteration, the partially created offspring
+        are discarded, the population is left as it was before the iteration and BudgetExhausted is raised.
         """
         logger.info("Starting evolution iteration")
-        self.fitnesses = self._calculate_fitnesses(self.population)  # this generally unnecessarily happens again
-
-        logger.debug("Performing tournament selection and crossover")
-        crossover_count = self._perform_crossovers(self.fitnesses)
-        logger.debug(f"Performed {crossover_count} crossover operations")
-
-        logger.debug("Applying mutations")
-        mutation_count = self._mutate_additional_population()
-        logger.info(f"Applied {mutation_count} mutations")
+        try:
+            if self.fitnesses is None or len(self.fitnesses) != len(self.population):
+                self.fitnesses = self._calculate_fitnesses(self.population)
+            self._check_budget()
+
+            logger.debug("Performing tournament selection and crossover")
+            crossover_count = self._perform_crossovers(self.fitnesses)
+            logger.debug(f"Performed {crossover_count} crossover operations")
+
+            logger.debug("Applying mutations")
+            mutation_count = self._mutate_additional_population()
+            logger.info(f"Applied {mutation_count} mutations")
+            self._check_budget()
+
+            joined_population = self.population + self.additional_population
+            codes = np.array([tree.__repr__() for tree in joined_population])
+            mask = np.asarray(first_uniques_mask(codes), dtype=bool)
+            n_population = len(self.population)
+            new_trees = [tree for tree, keep in zip(self.additional_population, mask[n_population:], strict=True) if keep]
+            kept_population = [tree for tree, keep in zip(self.population, mask[:n_population], strict=True) if keep]
+            kept_fitnesses = self.fitnesses[mask[:n_population]]
+            if self.racing is not None:
+                new_fitnesses = self.racing.evaluate(self, new_trees, kept_population, kept_fitnesses)
+            else:
+                new_fitnesses = self._calculate_fitnesses(new_trees)
+        except BudgetExhausted:
+            logger.info("Budget exhausted during iteration, discarding offspring")
+            self.additional_population = []
+            raise
 
-        joined_population = np.array(self.population + self.additional_population)  # maybe worth it to calculated fitnesses first?
-        codes = np.array([tree.__repr__() for tree in joined_population])
-        mask = first_uniques_mask(codes)
-        self.population = list(joined_population[mask])
-        self.fitnesses = self._calculate_fitnesses(self.population)  # comm above, recalculating some fitnesses this way
+        population = kept_population + new_trees
+        fitnesses = np.concatenate([kept_fitnesses, new_fitnesses])
 
         logger.debug(f"Removed {len(joined_population) - sum(mask)} duplicate trees")
-        logger.debug(f"New population size: {len(self.population)}")
+        logger.debug(f"New population size: {len(population)}")
 
-        self.population, self.fitnesses = choose_pareto_then_sorted(self.population, self.fitnesses, self.population_size)
+        self.population, self.fitnesses = choose_pareto_then_sorted(population, fitnesses, self.population_size)
 
         self.additional_population = []
 
     def _perform_crossovers(self, fitnesses: npt.NDArray[np.float64]):
         crossover_count = 0
         while len(self.additional_population) < (self.population_multiplier * self.population_size):
-            idx1, idx2 = tournament_selection_indexes(fitnesses, self.tournament_size)
+            idx1, idx2 = tournament_selection_indexes(fitnesses, self.tournament_size, rng=self.rng)
             parent_1, parent_2 = self.population[idx1], self.population[idx2]
-            new_tree_1, new_tree_2 = crossover(parent_1, parent_2)
+            new_tree_1, new_tree_2 = crossover(parent_1, parent_2, rng=self.rng)
             self.additional_population += [new_tree_1, new_tree_2]
             crossover_count += 1
         return crossover_count
@@ -192,56 +318,293 @@ class Giraffe:
     def _mutate_additional_population(self) -> int:
         mutation_count = 0
         for tree in self.additional_population:
-            mutation_chance = np.random.rand()
-            if mutation_chance < tree.mutation_chance:
-                allowed_mutations = np.array(get_allowed_mutations(tree))
-                chosen_mutation = np.random.choice(allowed_mutations)
-                logger.trace(f"Applying mutation: {chosen_mutation.__name__}")
-                mutated_tree = chosen_mutation(
-                    tree,
-                    models=self.models,
-                    ids=self.ids,
-                    allowed_ops=self.allowed_ops,
-                )
+            mutated_tree = self._mutate(tree)
+            if mutated_tree is not None:
                 self.additional_population.append(mutated_tree)
                 mutation_count += 1
         return mutation_count
 
-    def train(self, iterations: int):
+    def _mutate(self, tree: Tree, rng: Union[np.random.Generator, None] = None) -> Union[Tree, None]:
         """
-        Run the evolutionary algorithm for a specified number of iterations.
+        Mutate a tree with its mutation chance.
 
         Args:
-            iterations: Number of evolution iterations to run
+            tree: Tree to mutate
+            rng: Random generator to use, defaults to the instance generator
+
+        Returns:
+            Mutated copy of the tree, or None if the tree was not chosen for mutation
         """
-        logger.info(f"Starting evolution with {iterations} iterations")
-        self._call_hook("on_evolution_start")
+        rng = self.rng if rng is None else rng
+        mutation_chance = rng.uniform()
+        if mutation_chance >= tree.mutation_chance:
+            return None
+        allowed_mutations = np.array(get_allowed_mutations(tree))
+        chosen_mutation = rng.choice(allowed_mutations)
+        logger.trace("Applying mutation: {}", chosen_mutation.__name__)
+        return chosen_mutation(
+            tree,
+            models=self.models,
+            ids=self.ids,
+            allowed_ops=self.allowed_ops,
+            rng=rng,
+        )
+
+    def add_trees(self, trees: List[Tree]):
+        """
+        Insert external trees into the population, e.g. migrants from another population.
 
-        for i in range(iterations):
-            logger.info(f"Generation {i + 1}/{iterations}")
-            self._call_hook("on_generation_start")  # possibly move to run_iteration instead
-            self.run_iteration()
-            self._call_hook("on_generation_end")
+        Trees may come without tensors (as saved with `Tree.save_tree_architecture`); their value nodes are
+        filled with this instance's prediction tensors. Trees already present in the population are skipped,
+        and the population is reduced back to `population_size` with the usual Pareto-then-sorted selection.
 
-            if self.should_stop:
-                logger.info("Early stopping triggered")
-                break
+        Args:
+            trees: Trees to insert
+        """
+        codes = set(tree.__repr__() for tree in self.population)
+        new_trees = []
+        for tree in trees:
+            code = tree.__repr__()
+            if code in codes:
+                continue
+            codes.add(code)
+            tree._load_tensors_to_tree(None, self.train_tensors)
+            tree._clean_evals()
+            new_trees.append(tree)
+        logger.debug(f"Adding {len(new_trees)} new trees out of {len(trees)} to the population")
+        if not new_trees:
+            return
+
+        if self.fitnesses is None or len(self.fitnesses) != len(self.population):
+            self.fitnesses = self._calculate_fitnesses(self.population)
+        new_fitnesses = self._calculate_fitnesses(new_trees)
+        self.population, self.fitnesses = choose_pareto_then_sorted(
+            self.population + new_trees, np.concatenate([self.fitnesses, new_fitnesses]), self.population_size
+        )
+
+    def train(self, iterations: Union[int, None] = None, max_seconds: Union[float, None] = None, max_evaluations: Union[int, None] = None):
+        """
+        Run the evolutionary algorithm for a specified number of iterations, or until a budget runs out.
+
+        The budget is checked before each iteration and at safe points within it, including between fitness
+        evaluations. When it runs out, the current iteration is abandoned and the population from the last completed
+        iteration is kept, with `stop_reason` set to 'max_seconds' or 'max_evaluations'. `on_generation_end` is
+        still called for an abandoned iteration. The initial population is always scored, and these evaluations
+        count towards the budget even if they exceed it.
+
+        Args:
+            iterations: Number of evolution iterations to run, None for no limit
+            max_seconds: Wall-clock time limit in seconds, None for no limit
+            max_evaluations: Limit on the number of fitness evaluations, None for no limit
+        """
+        if iterations is None and max_seconds is None and max_evaluations is None:
+            raise ValueError("At least one of iterations, max_seconds or max_evaluations needs to be set")
+
+        logger.info(f"Starting evolution with {iterations} iterations, {max_seconds} seconds and {max_evaluations} evaluations limit")
+        self.stop_reason = None
+        self.budget = Budget(max_seconds, max_evaluations)
+        if self.fitnesses is None or len(self.fitnesses) != len(self.population):
+            # scored without budget checks, so that the population never lacks fitnesses
+            self.fitnesses = self._calculate_fitnesses(self.population)
+            self.budget.record(len(self.population))
+        self._budget = self.budget
+        self._call_hook("on_evolution_start")
+
+        try:
+            i = 0
+            while iterations is None or i < iterations:
+                reason = self.budget.exhausted_reason()
+                if reason is None:
+                    logger.info(f"Generation {i + 1}/{iterations}")
+                    self._call_hook("on_generation_start")  # possibly move to run_iteration instead
+                    try:
+                        self.run_iteration()
+                    except BudgetExhausted as e:
+                        reason = e.reason
+                    self._call_hook("on_generation_end")
+                if reason is not None:
+                    self.stop_reason = reason
+                    logger.info(f"Training budget exhausted ({reason}) after {self.budget.evaluations} evaluations and {self.budget.elapsed:.2f}s")
+                    break
+                i += 1
+
+                if self.should_stop:
+                    if self.stop_reason is None:
+                        self.stop_reason = "callback"
+                    logger.info(f"Early stopping triggered ({self.stop_reason})")
+                    break
+        finally:
+            self._budget = None
+            self._arenas.clear()
 
         logger.info("Evolution complete")
         self._call_hook("on_evolution_end")
 
+    def _check_budget(self):
+        if self._budget is not None:
+            self._budget.check()
+
+    def spawn_rngs(self, n: int) -> List[np.random.Generator]:
+        """
+        Create independent random generators for parallel workers.
+
+        The generators are spawned from the instance SeedSequence, so a run remains reproducible for a given
+        seed as long as the generators are spawned and consumed in the same order.
+
+        Args:
+            n: Number of generators to create
+
+        Returns:
+            List of independent generators
+        """
+        return [np.random.default_rng(child) for child in self.seed_sequence.spawn(n)]
+
+    def _breed(self, parent_1: Tree, parent_2: Tree, rng: Union[np.random.Generator, None] = None) -> List[Tree]:
+        """
+        Create offspring of two parents with crossover, followed by mutation with each tree's mutation chance.
+
+        Args:
+            parent_1: First parent
+            parent_2: Second parent
+            rng: Random generator to use, defaults to the instance generator
+
+        Returns:
+            List of offspring trees, including mutated copies
+        """
+        rng = self.rng if rng is None else rng
+        offspring = list(crossover(parent_1, parent_2, rng=rng))
+        for tree in list(offspring):
+            mutated_tree = self._mutate(tree, rng=rng)
+            if mutated_tree is not None:
+                offspring.append(mutated_tree)
+        return offspring
+
+    def _breed_and_score(self, parent_1: Tree, parent_2: Tree, rng: np.random.Generator) -> Tuple[List[Tree], npt.NDArray[np.float64]]:
+        offspring = self._breed(parent_1, parent_2, rng)
+        return offspring, np.array([self._tree_fitness(tree) for tree in offspring])
+
+    def _insert_offspring(self, offspring: List[Tree], fitnesses: npt.NDArray[np.float64], codes: Set[str]) -> int:
+        """
+        Insert scored trees into the population with the Pareto-then-sorted replacement rule, skipping duplicates.
+
+        Args:
+            offspring: Scored trees to insert
+            fitnesses: Fitness values of the trees
+            codes: Codes of trees already in the population, updated in place
+
+        Returns:
+            Number of trees that survived the replacement
+        """
+        assert self.fitnesses is not None
+        mask = [False] * len(offspring)
+        for i, tree in enumerate(offspring):
+            code = tree.__repr__()
+            if code not in codes:
+                codes.add(code)
+                mask[i] = True
+        new_trees = [tree for tree, keep in zip(offspring, mask, strict=True) if keep]
+        if not new_trees:
+            return 0
+
+        self.population, self.fitnesses = choose_pareto_then_sorted(
+            self.population + new_trees, np.concatenate([self.fitnesses, fitnesses[mask]]), self.population_size
+        )
+        survivors = set(id(tree) for tree in self.population)
+        for tree in new_trees:
+            if id(tree) not in survivors:
+                codes.discard(tree.__repr__())
+        return sum(id(tree) in survivors for tree in new_trees)
+
+    def train_steady_state(self, evaluations: int, n_workers: Union[int, None] = None, callback_interval: Union[int, None] = None):
+        """
+        Run a steady-state (asynchronous) evolution for approximately the given number of fitness evaluations.
+
+        Instead of generations with barriers, a pool of worker threads continuously takes parent pairs chosen
+        with tournament selection, produces offspring with crossover and mutation, and scores them. Each scored
+        batch of offspring is inserted into the population with the same Pareto-then-sorted replacement rule
+        as in `run_iteration`, and a new parent pair is submitted right away. Results are consumed in submission
+        order, so the sequence of insertions does not depend on which worker finishes first. Each task gets its own
+        random generator spawned from the instance SeedSequence, which makes the run reproducible for a given seed
+        and number of workers.
+
+        Since there are no generations, callbacks `on_generation_start` and `on_generation_end` are called every
+        `callback_interval` evaluations.
+
+        Args:
+            evaluations: Number of offspring evaluations to run. Tasks already submitted are finished,
+                so a few more evaluations than requested may be performed.
+            n_workers: Number of worker threads, defaults to `n_jobs`
+            callback_interval: Number of evaluations between callback calls, defaults to population size
+        """
+        n_workers = n_workers or self.n_jobs
+        callback_interval = callback_interval or self.population_size
+        logger.info(f"Starting steady-state evolution with {evaluations} evaluations and {n_workers} workers")
+        self._call_hook("on_evolution_start")
+
+        if self.fitnesses is None or len(self.fitnesses) != len(self.population):
+            self.fitnesses = self._calculate_fitnesses(self.population)
+        codes = set(tree.__repr__() for tree in self.population)
+
+        evaluations_done = 0
+        next_callback = callback_interval
+        pending: Deque[Future] = deque()
+        breed_and_score = pinned_postprocessing(self._breed_and_score)
+
+        with limit_intra_op_threads(self.intra_op_threads if n_workers > 1 else None), ThreadPoolExecutor(max_workers=n_workers) as executor:
+
+            def submit():
+                assert self.fitnesses is not None
+                idx1, idx2 = tournament_selection_indexes(self.fitnesses, self.tournament_size, rng=self.rng)
+                (task_rng,) = self.spawn_rngs(1)
+                pending.append(executor.submit(breed_and_score, self.population[idx1], self.population[idx2], task_rng))
+
+            self._call_hook("on_generation_start")
+            for _ in range(n_workers):
+                submit()
+
+            while pending:
+                offspring, fitnesses = pending.popleft().result()
+                evaluations_done += len(offspring)
+                survived = self._insert_offspring(offspring, fitnesses, codes)
+                logger.trace(f"{survived} of {len(offspring)} offspring survived, {evaluations_done}/{evaluations} evaluations")
+
+                if evaluations_done >= next_callback:
+                    next_callback += callback_interval
+                    self._call_hook("on_generation_end")
+                    if self.should_stop:
+                        logger.info("Early stopping triggered")
+                    else:
+                        self._call_hook("on_generation_start")
+
+                # each pending task evaluates at least two offspring
+                if not self.should_stop and evaluations_done + 2 * len(pending) < evaluations:
+                    submit()
+
+        self._arenas.clear()
+        logger.info(f"Steady-state evolution complete after {evaluations_done} evaluations")
+        self._call_hook("on_evolution_end")
+
     def _build_train_tensors(self, preds_source, gt_path):
         """
         Load prediction tensors and ground truth from files.
 
         Args:
-            preds_source: Source of model predictions (path or iterable of paths)
-            gt_path: Path to ground truth data
+            preds_source: Source of model predictions (path, iterable of paths or packed store)
+            gt_path: Path to ground truth data, None to take it from a packed store
 
         Returns:
             Tuple of (train_tensors dictionary, ground truth tensor)
         """
         logger.info("Loading prediction tensors and ground truth")
+        if isinstance(preds_source, (str, Path)) and is_packed_store(preds_source):
+            logger.debug(f"Opening packed store: {preds_source}")
+            store = PackedStore(preds_source)
+            if gt_path is None:
+                if store.gt is None:
+                    raise ValueError(f"gt_path is required, packed store {preds_source} does not contain ground truth")
+                return self._to_compute_dtype(dict(store)), store.gt
+            return self._to_compute_dtype(dict(store)), self._join_shards(self._load_files(self._gt_paths(gt_path)))
+
         tensor_paths = []
         if isinstance(preds_source, str):
             preds_source = Path(preds_source)
@@ -263,39 +626,97 @@ class Giraffe:
                     " list of paths to directories with predictions, or list of paths to predictions"
                 )
 
-        train_tensors = {}
-        for tensor_path in tensor_paths:
-            logger.debug(f"Loading tensor: {tensor_path}")
-            tensor_id = Path(tensor_path).name
-            if tensor_id not in train_tensors:
-                train_tensors[tensor_id] = B.load(tensor_path, DEVICE)
-            else:
-                train_tensors[tensor_id] = B.concat([train_tensors[tensor_id], B.load(tensor_path, DEVICE)])
+        gt_paths = self._gt_paths(gt_path)
+        logger.debug(f"Loading ground truth from: {gt_path}")
+
+        loaded = self._load_files(list(tensor_paths) + gt_paths)
 
+        shards: Dict[str, List[Tensor]] = {}
+        for tensor_path, tensor in zip(tensor_paths, loaded[: len(tensor_paths)], strict=True):
+            shards.setdefault(Path(tensor_path).name, []).append(tensor)
+        train_tensors = self._to_compute_dtype({tensor_id: self._join_shards(tensors) for tensor_id, tensors in shards.items()})
         logger.debug(f"Loaded {len(train_tensors)} prediction tensors")
-        logger.debug(f"Loading ground truth from: {gt_path}")
 
-        gt_tensor: None | Tensor = None
+        gt_shards = loaded[len(tensor_paths) :]
+        gt_tensor: None | Tensor = self._join_shards(gt_shards) if gt_shards else None
+
+        logger.info("Tensors loaded successfully")
+        return train_tensors, gt_tensor
+
+    def _to_compute_dtype(self, tensors: Dict[str, Tensor]) -> Dict[str, Tensor]:
+        if self.compute_dtype is None:
+            return tensors
+        logger.debug(f"Converting {len(tensors)} prediction tensors to {self.compute_dtype}")
+        if self.compute_dtype == QUANTIZED_DTYPE:
+            return {tensor_id: quantize(tensor) for tensor_id, tensor in tensors.items()}
+        return {tensor_id: B.astype(tensor, self.compute_dtype) for tensor_id, tensor in tensors.items()}
+
+    @staticmethod
+    def _gt_paths(gt_path) -> List[Path]:
         if isinstance(gt_path, str):
             gt_path = Path(gt_path)
         if isinstance(gt_path, Path):
-            if os.path.isdir(gt_path):
-                for path in gt_path.glob("*"):
-                    if gt_tensor is None:
-                        gt_tensor = B.load(path)
-                    else:
-                        gt_tensor = B.concat([gt_tensor, B.load(path, device=DEVICE)])  # type: ignore
-        elif hasattr(gt_path, "__iter__"):
-            for path in gt_path:
-                if gt_tensor is None:
-                    gt_tensor = B.load(path)
-                else:
-                    gt_tensor = B.concat([gt_tensor, B.load(path, device=DEVICE)])  # type: ignore
-        else:
-            raise ValueError(f"{gt_path} is not valid for loading gt")
+            return list(gt_path.glob("*")) if os.path.isdir(gt_path) else [gt_path]
+        if hasattr(gt_path, "__iter__"):
+            return [Path(path) for path in gt_path]
+        raise ValueError(f"{gt_path} is not valid for loading gt")
 
-        logger.info("Tensors loaded successfully")
-        return train_tensors, gt_tensor
+    def _load_files(self, paths: List[Path]) -> List[Tensor]:
+        """
+        Load tensor files concurrently, preserving the order of paths.
+
+        Reading files is I/O bound and NumPy/PyTorch release the GIL while doing it, so files are loaded
+        with a pool of `load_jobs` threads.
+
+        Args:
+            paths: Paths of the files to load
+
+        Returns:
+            List of loaded tensors in the same order as paths
+        """
+        if len(paths) == 0:
+            return []
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.load_jobs) as executor:
+            loaded = list(executor.map(lambda path: B.load(path, DEVICE, mmap_mode=self.mmap_mode), paths))
+        elapsed = time.perf_counter() - start
+        megabytes = sum(B.nbytes(tensor) for tensor in loaded) / 2**20
+        logger.info(f"Loaded {len(paths)} files ({megabytes:.1f} MB) in {elapsed:.2f}s, {megabytes / max(elapsed, 1e-9):.1f} MB/s")
+        return loaded
+
+    @staticmethod
+    def _join_shards(shards: List[Tensor]) -> Tensor:
+        """
+        Concatenate shards of a single tensor with one copy. A single shard is returned as is, so it stays memory-mapped.
+        """
+        if len(shards) == 1:
+            return shards[0]
+        return B.concat(shards)
+
+    def _deduplicate_samples(self):
+        """
+        Collapse samples with identical predictions of all models and identical labels.
+
+        Unique samples are kept in the order of their first occurrence and their numbers of occurrences
+        are stored in `sample_weights`.
+        """
+        if "sample_weight" not in inspect.signature(self.fitness_function).parameters:
+            raise ValueError("Fitness function needs to accept a sample_weight argument when deduplicate_samples is True")
+
+        n_samples = B.shape(self.gt_tensor)[0]
+        rows = np.concatenate(
+            [B.to_numpy(tensor).reshape(n_samples, -1) for tensor in self.train_tensors.values()]
+            + [B.to_numpy(self.gt_tensor).reshape(n_samples, -1)],
+            axis=1,
+        )
+        _, first_index, counts = np.unique(rows, axis=0, return_index=True, return_counts=True)
+        order = np.argsort(first_index)
+        index = first_index[order]
+
+        self.train_tensors = {tensor_id: tensor[index] for tensor_id, tensor in self.train_tensors.items()}
+        self.gt_tensor = self.gt_tensor[index]
+        self.sample_weights = counts[order].astype(np.float64)
+        logger.info(f"Deduplicated samples from {n_samples} to {len(index)} ({len(index) / n_samples:.1%})")
 
     def _validate_input(self, fix_swapped=True):  # no way to change this argument for now TODO
         """
@@ -1,4 +1,6 @@
 import os
+import threading
+from contextlib import contextmanager
 
 from loguru import logger
 
@@ -25,14 +27,47 @@ def _passthrough(x):
 
 # Global postprocessing function that will be applied to tree evaluations
 class Postprocessor:
+    """
+    Callable holder for the postprocessing function applied after each Op Node.
+
+    The function can be replaced globally with `set_postprocessing_function`, or pinned for the current
+    thread with `pinned`. Pinning is used by threaded evaluation so that all trees of a batch are
+    postprocessed with the same function, even if the global one is changed in the meantime.
+    """
+
     def __init__(self):
         self._postprocessing_function = _passthrough
+        self._lock = threading.Lock()
+        self._local = threading.local()
 
     def __call__(self, x):
-        return self._postprocessing_function(x)
+        func = getattr(self._local, "function", None)
+        if func is None:
+            func = self._postprocessing_function
+        return func(x)
+
+    @property
+    def function(self):
+        return self._postprocessing_function
 
     def set_postprocessing_function(self, func):
-        self._postprocessing_function = func
+        with self._lock:
+            self._postprocessing_function = func
+
+    @contextmanager
+    def pinned(self, func):
+        """
+        Use the given function in the current thread only, for the duration of the context.
+
+        Args:
+            func: The function to use for postprocessing in the current thread
+        """
+        previous = getattr(self._local, "function", None)
+        self._local.function = func
+        try:
+            yield
+        finally:
+            self._local.function = previous
 
 
 postprocessing_function = Postprocessor()
@@ -0,0 +1,257 @@
+import multiprocessing as mp
+import pickle
+import traceback
+from typing import Any, Dict, List, Literal, Tuple
+
+import numpy as np
+import numpy.typing as npt
+from loguru import logger
+
+from giraffe.backend.backend import Backend
+from giraffe.backend.numpy_backend import NumpyBackend
+from giraffe.giraffe import Giraffe
+from giraffe.globals import postprocessing_function as PF
+from giraffe.population import choose_pareto
+from giraffe.tree import Tree
+from giraffe.utils import first_uniques_mask
+
+
+def _strip_tensors(trees: List[Tree]) -> List[Tree]:
+    """
+    Copy trees without their tensors, so that only the architecture is sent between processes.
+    """
+    stripped = []
+    for tree in trees:
+        copy_tree = tree.copy()
+        copy_tree._clean_values_and_evals()
+        stripped.append(copy_tree)
+    return stripped
+
+
+def _island_worker(connection, giraffe_kwargs: Dict[str, Any]):
+    """
+    Entry point of an island process.
+
+    Builds its own Giraffe instance and serves commands sent by `IslandGiraffe` through the connection:
+
+    - ("run", (n_generations, migration_size)): run generations, reply with the best trees (architectures only)
+    - ("migrate", trees): insert immigrants into the population, reply once they are scored
+    - ("finish", None): reply with the final population (architectures only) and fitnesses, then exit
+    """
+    try:
+        giraffe = Giraffe(**giraffe_kwargs)
+        giraffe._call_hook("on_evolution_start")
+        while True:
+            command, payload = connection.recv()
+            if command == "run":
+                n_generations, migration_size = payload
+                for _ in range(n_generations):
+                    if giraffe.should_stop:
+                        break
+                    giraffe._call_hook("on_generation_start")
+                    giraffe.run_iteration()
+                    giraffe._call_hook("on_generation_end")
+                assert giraffe.fitnesses is not None
+                best = np.argsort(-giraffe.fitnesses)[:migration_size]
+                connection.send(("ok", (_strip_tensors([giraffe.population[i] for i in best]), giraffe.should_stop)))
+            elif command == "migrate":
+                giraffe.add_trees(payload)
+                connection.send(("ok", None))
+            elif command == "finish":
+                giraffe._call_hook("on_evolution_end")
+                connection.send(("ok", (_strip_tensors(giraffe.population), giraffe.fitnesses)))
+                break
+            else:
+                raise ValueError(f"Unknown island command: {command}")
+    except Exception:
+        connection.send(("error", traceback.format_exc()))
+    finally:
+        connection.close()
+
+
+class IslandGiraffe:
+    """
+    Island model of evolution, running several independent Giraffe populations in separate processes.
+
+    Selection, duplicate removal and Pareto optimization are global operations within a population,
+    so a single large population scales poorly. Here K smaller populations (islands) evolve in parallel,
+    each in its own process, loading predictions from the same source. Every `migration_interval`
+    generations the best trees of each island are sent to other islands according to the topology:
+
+    - 'ring': island i sends its migrants to island (i + 1) mod K
+    - 'all_to_all': every island sends its migrants to all other islands
+
+    At the end, the populations of all islands are merged and their common Pareto front is computed.
+    Trees are exchanged and returned as architectures only (without tensors), the same way as
+    `Tree.save_tree_architecture` stores them; use `Tree.do_pred_on_another_tensors` to evaluate them.
+
+    Every island loads the predictions itself, so with files read into memory the islands together hold
+    `n_islands` copies of them. Passing a packed store (see `giraffe.store`) as `preds_source`, or setting `mmap_mode`,
+    maps the files instead, and the islands share the pages through the operating system page cache, as long as
+    `compute_dtype` does not convert the predictions.
+
+    Attributes:
+        n_islands: Number of islands (processes)
+        migration_interval: Number of generations between migrations
+        migration_size: Number of best trees each island sends in a migration
+        topology: Migration topology, 'ring' or 'all_to_all'
+        population: Merged final populations of all islands (architectures only)
+        fitnesses: Fitness values of the merged population
+        pareto_front: Trees on the Pareto front of the merged population
+        pareto_fitnesses: Fitness values of the Pareto front trees
+    """
+
+    def __init__(
+        self,
+        n_islands: int,
+        migration_interval: int = 5,
+        migration_size: int = 2,
+        topology: Literal["ring", "all_to_all"] = "ring",
+        mp_context: str = "spawn",
+        seed: int = 0,
+        **giraffe_kwargs,
+    ):
+        """
+        Initialize the island model.
+
+        Args:
+            n_islands: Number of islands, each running in a separate process
+            migration_interval: Number of generations between migrations
+            migration_size: Number of best trees each island sends in a migration
+            topology: Migration topology, 'ring' or 'all_to_all'
+            mp_context: Multiprocessing start method
+            seed: Base random seed, islands use independent streams spawned from its SeedSequence
+            **giraffe_kwargs: Arguments passed to the Giraffe instance of each island
+                (preds_source, gt_path, population_size, ...). Unless `mp_context` is 'fork', they need to be
+                picklable, so functions such as `postprocessing_function` or `fitness_function` have to be defined
+                at module level, not as lambdas or closures.
+        """
+        if n_islands < 1:
+            raise ValueError(f"Number of islands must be positive, got {n_islands}")
+        if topology not in ("ring", "all_to_all"):
+            raise ValueError(f"Unknown migration topology: {topology}")
+
+        self.n_islands = n_islands
+        self.migration_interval = migration_interval
+        self.migration_size = migration_size
+        self.topology = topology
+        self.mp_context = mp_context
+        self.seed = seed
+        self.giraffe_kwargs = giraffe_kwargs
+
+        self.population: List[Tree] = []
+        self.fitnesses: None | npt.NDArray[np.float64] = None
+        self.pareto_front: List[Tree] = []
+        self.pareto_fitnesses: None | npt.NDArray[np.float64] = None
+
+    def _island_kwargs(self, island_index: int) -> Dict[str, Any]:
+        kwargs = dict(self.giraffe_kwargs)
+        kwargs["seed"] = np.random.SeedSequence(self.seed).spawn(self.n_islands)[island_index]
+        # spawned processes do not inherit backend and postprocessing set at runtime
+        kwargs.setdefault("backend", "numpy" if Backend.get_backend() is NumpyBackend else "pytorch")
+        kwargs.setdefault("postprocessing_function", PF.function)
+        return kwargs
+
+    def _check_picklable(self, kwargs: Dict[str, Any]):
+        # processes that are not forked receive their arguments pickled, fail before starting any of them
+        if self.mp_context == "fork":
+            return
+        for name, value in kwargs.items():
+            try:
+                pickle.dumps(value)
+            except (pickle.PicklingError, AttributeError, TypeError) as e:
+                raise ValueError(
+                    f"Argument '{name}' of the islands cannot be pickled, which '{self.mp_context}' processes require. "
+                    "Use functions defined at module level instead of lambdas or closures."
+                ) from e
+
+    def _route_migrants(self, emigrants: List[List[Tree]]) -> List[List[Tree]]:
+        immigrants: List[List[Tree]] = [[] for _ in range(self.n_islands)]
+        for source, trees in enumerate(emigrants):
+            if self.topology == "ring":
+                targets = [(source + 1) % self.n_islands]
+            else:
+                targets = [target for target in range(self.n_islands) if target != source]
+            for target in targets:
+                if target != source:
+                    immigrants[target] += trees
+        return immigrants
+
+    @staticmethod
+    def _receive(connection, island_index: int, command: str) -> Any:
+        status, payload = connection.recv()
+        if status == "error":
+            raise RuntimeError(f"Island {island_index} failed on '{command}':\n{payload}")
+        return payload
+
+    def train(self, iterations: int):
+        """
+        Run the island model for a specified number of generations on every island.
+
+        Args:
+            iterations: Number of generations each island runs
+        """
+        logger.info(f"Starting island evolution with {self.n_islands} islands and {iterations} iterations")
+        context = mp.get_context(self.mp_context)
+        self._check_picklable(self._island_kwargs(0))
+        connections = []
+        processes = []
+        for island_index in range(self.n_islands):
+            parent_connection, child_connection = context.Pipe()
+            process = context.Process(  # type: ignore[attr-defined]
+                target=_island_worker, args=(child_connection, self._island_kwargs(island_index)), daemon=True
+            )
+            process.start()
+            child_connection.close()
+            connections.append(parent_connection)
+            processes.append(process)
+
+        try:
+            completed = 0
+            while completed < iterations:
+                n_generations = min(self.migration_interval, iterations - completed)
+                for connection in connections:
+                    connection.send(("run", (n_generations, self.migration_size)))
+                results: List[Tuple[List[Tree], bool]] = [
+                    self._receive(connection, island_index, "run") for island_index, connection in enumerate(connections)
+                ]
+                completed += n_generations
+                logger.info(f"Islands completed {completed}/{iterations} generations")
+
+                if all(stopped for _, stopped in results):
+                    logger.info("Early stopping triggered on all islands")
+                    break
+                if completed < iterations:
+                    immigrants = self._route_migrants([trees for trees, _ in results])
+                    for connection, trees in zip(connections, immigrants, strict=True):
+                        connection.send(("migrate", trees))
+                    for island_index, connection in enumerate(connections):
+                        self._receive(connection, island_index, "migrate")
+                    logger.debug(f"Migrated {sum(len(trees) for trees in immigrants)} trees using {self.topology} topology")
+
+            for connection in connections:
+                connection.send(("finish", None))
+            final = [self._receive(connection, island_index, "finish") for island_index, connection in enumerate(connections)]
+        finally:
+            for connection in connections:
+                connection.close()
+            for process in processes:
+                process.join(timeout=30)
+                if process.is_alive():
+                    process.terminate()
+
+        self._merge_populations(final)
+        logger.info("Island evolution complete")
+
+    def _merge_populations(self, final: List[Tuple[List[Tree], npt.NDArray[np.float64]]]):
+        trees: List[Tree] = []
+        fitnesses = []
+        for island_trees, island_fitnesses in final:
+            trees += island_trees
+            fitnesses.append(island_fitnesses)
+
+        mask = first_uniques_mask([tree.__repr__() for tree in trees])
+        self.population = [tree for tree, keep in zip(trees, mask, strict=True) if keep]
+        self.fitnesses = np.concatenate(fitnesses)[np.asarray(mask, dtype=bool)]
+        self.pareto_front, self.pareto_fitnesses = choose_pareto(self.population, self.fitnesses, len(self.population))
+        logger.info(f"Merged {len(self.population)} unique trees from {self.n_islands} islands, {len(self.pareto_front)} on the Pareto front")
@@ -0,0 +1,175 @@
+from typing import Dict, Literal, NamedTuple, Sequence, Tuple, Union
+
+import numpy as np
+
+from giraffe.fitness_context import FitnessContext
+from giraffe.globals import BACKEND as B
+from giraffe.lib_types import Tensor
+from giraffe.quantization import dequantize
+from giraffe.tree import Tree
+
+RANKING_METRICS = ("average_precision", "roc_auc")
+THRESHOLD_METRICS = ("accuracy", "precision", "recall", "f1")
+
+
+class FitnessResult(NamedTuple):
+    """
+    Fitness of a tree together with secondary objectives.
+
+    Fitness functions may return it instead of a float. `Giraffe` uses `fitness` wherever a single value is needed
+    (tournaments, callbacks, budget) and `objectives` as additional maximized objectives of Pareto selection,
+    next to fitness and number of nodes.
+
+    Attributes:
+        fitness: Primary fitness value, higher is better
+        objectives: Secondary objectives, higher is better
+        metrics: All computed metrics by name, for logging and inspection
+    """
+
+    fitness: float
+    objectives: Tuple[float, ...] = ()
+    metrics: Union[Dict[str, float], None] = None
+
+
+def split_fitness(result: Union[float, FitnessResult]) -> Tuple[float, Tuple[float, ...]]:
+    """
+    Split a value returned by a fitness function into the primary fitness and secondary objectives.
+
+    Args:
+        result: Float or `FitnessResult`
+
+    Returns:
+        Tuple of the primary fitness and a (possibly empty) tuple of secondary objectives
+    """
+    if isinstance(result, FitnessResult):
+        return float(result.fitness), tuple(float(value) for value in result.objectives)
+    return result, ()
+
+
+def _binary_metrics(scores: np.ndarray, labels: np.ndarray, weights: np.ndarray, threshold: float) -> Union[Dict[str, float], None]:
+    order = np.argsort(-scores, kind="stable")
+    scores, labels, weights = scores[order], labels[order], weights[order]
+    true_positives = np.cumsum(weights * labels)
+    false_positives = np.cumsum(weights * ~labels)
+    n_positive, n_negative = true_positives[-1], false_positives[-1]
+    if n_positive == 0 or n_negative == 0:
+        return None
+
+    # tied scores form a single threshold, the last sample of every group of ties closes it
+    closing = np.r_[np.flatnonzero(np.diff(scores)), len(scores) - 1]
+    tp, fp = true_positives[closing], false_positives[closing]
+    recall = tp / n_positive
+    average_precision = float(np.dot(np.diff(recall, prepend=0.0), tp / (tp + fp)))
+    roc_auc = float(np.trapezoid(np.r_[0.0, recall], np.r_[0.0, fp / n_negative]))
+
+    predicted_positive = int(np.searchsorted(-scores, -threshold, side="right"))
+    tp_at, fp_at = (true_positives[predicted_positive - 1], false_positives[predicted_positive - 1]) if predicted_positive else (0.0, 0.0)
+    fn_at = n_positive - tp_at
+    return {
+        "average_precision": average_precision,
+        "roc_auc": roc_auc,
+        "accuracy": float((tp_at + n_negative - fp_at) / (n_positive + n_negative)),
+        "precision": float(tp_at / (tp_at + fp_at)) if tp_at + fp_at else 0.0,
+        "recall": float(tp_at / n_positive),
+        "f1": float(2 * tp_at / (2 * tp_at + fp_at + fn_at)),
+    }
+
+
+def classification_metrics(
+    pred: Tensor,
+    gt: Union[Tensor, FitnessContext],
+    task: Literal["binary", "multiclass"] = "binary",
+    threshold: float = 0.5,
+    sample_weight: Union[np.ndarray, None] = None,
+) -> Dict[str, float]:
+    """
+    Compute ranking and threshold metrics with a single sort of predictions per class.
+
+    Average precision, ROC AUC and metrics at `threshold` (accuracy, precision, recall, F1) are all read from
+    the same cumulative true and false positive counts over predictions sorted in descending order, so the cost
+    is one O(N log N) sort per class instead of one per metric. Tied scores are treated as a single threshold,
+    as in scikit-learn and torchmetrics.
+
+    For multiclass tasks, predictions of shape (N, C) are scored one-vs-rest and metrics are macro-averaged over
+    classes that have both positive and negative samples, except accuracy, which compares labels with the argmax
+    of predictions.
+
+    Args:
+        pred: Predictions, of shape (N,) or (N, 1) for binary and (N, C) for multiclass tasks
+        gt: Ground truth labels, or a `FitnessContext` built from them, which also tells whether
+            predictions are quantized and need to be dequantized
+        task: 'binary' or 'multiclass'
+        threshold: Decision threshold of threshold metrics
+        sample_weight: Optional weights of the samples
+
+    Returns:
+        Dictionary with keys 'average_precision', 'roc_auc', 'accuracy', 'precision', 'recall' and 'f1'.
+        Metrics are 0.0 when no class has both positive and negative samples.
+    """
+    pred_array = B.to_numpy(pred)
+    if isinstance(gt, FitnessContext):
+        gt.check_task(task)
+        labels, positives = gt.labels_numpy, gt.one_hot
+        if gt.quantized:
+            pred_array = dequantize(pred_array)
+    else:
+        labels = B.to_numpy(gt).reshape(-1).astype(np.intp)
+        positives = None
+    if not np.issubdtype(pred_array.dtype, np.floating):  # scores are negated for sorting, which wraps unsigned integers
+        pred_array = pred_array.astype(np.float64)
+    weights = np.ones(len(labels)) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+    if task == "multiclass":
+        pred_array = pred_array.reshape(len(labels), -1)
+        if positives is None or positives.shape[1] != pred_array.shape[1]:
+            positives = labels[:, None] == np.arange(pred_array.shape[1])
+        per_class = [_binary_metrics(pred_array[:, c], positives[:, c], weights, threshold) for c in range(pred_array.shape[1])]
+    else:
+        per_class = [_binary_metrics(pred_array.reshape(-1), labels.astype(bool), weights, threshold)]
+
+    valid = [metrics for metrics in per_class if metrics is not None]
+    result = {name: float(np.mean([metrics[name] for metrics in valid])) if valid else 0.0 for name in RANKING_METRICS + THRESHOLD_METRICS}
+    if task == "multiclass":
+        result["accuracy"] = float(np.dot(pred_array.argmax(axis=1) == labels, weights) / weights.sum())
+    return result
+
+
+class MultiMetricFitness:
+    """
+    Fitness function computing several metrics in a single pass, see `classification_metrics`.
+
+    The primary metric becomes the fitness of a tree and secondary metrics become additional objectives of
+    Pareto selection in `Giraffe`. Instances accept `sample_weight`, so they can be used with deduplicated samples,
+    and a `FitnessContext` in place of ground truth.
+
+    Example:
+        >>> fitness = MultiMetricFitness("average_precision", secondary=("roc_auc", "accuracy"))
+        >>> giraffe = Giraffe(..., fitness_function=fitness)
+    """
+
+    uses_fitness_context = True
+
+    def __init__(
+        self,
+        primary: str = "average_precision",
+        secondary: Sequence[str] = (),
+        task: Literal["binary", "multiclass"] = "binary",
+        threshold: float = 0.5,
+    ):
+        """
+        Args:
+            primary: Name of the metric used as fitness
+            secondary: Names of metrics used as secondary objectives
+            task: 'binary' or 'multiclass'
+            threshold: Decision threshold of threshold metrics
+        """
+        for name in (primary, *secondary):
+            if name not in RANKING_METRICS + THRESHOLD_METRICS:
+                raise ValueError(f"Unknown metric {name}, expected one of {RANKING_METRICS + THRESHOLD_METRICS}")
+        self.primary = primary
+        self.secondary = tuple(secondary)
+        self.task = task
+        self.threshold = threshold
+
+    def __call__(self, tree: Tree, gt: Union[Tensor, FitnessContext], sample_weight: Union[np.ndarray, None] = None) -> FitnessResult:
+        metrics = classification_metrics(tree.evaluation, gt, self.task, self.threshold, sample_weight)
+        return FitnessResult(metrics[self.primary], tuple(metrics[name] for name in self.secondary), metrics)
@@ -1,4 +1,4 @@
-from typing import Callable, Sequence, Type
+from typing import Callable, Sequence, Type, Union
 
 import numpy as np
 from loguru import logger
@@ -6,10 +6,16 @@ from loguru import logger
 from giraffe.lib_types import Tensor
 from giraffe.node import MeanNode, OperatorNode, ValueNode
 from giraffe.tree import Tree
+from giraffe.utils import resolve_rng
 
 
 def append_new_node_mutation(
-    tree: Tree, models: Sequence[Tensor], ids: None | Sequence[str | int] = None, allowed_ops: tuple[Type[OperatorNode], ...] = (MeanNode,), **kwargs
+    tree: Tree,
+    models: Sequence[Tensor],
+    ids: None | Sequence[str | int] = None,
+    allowed_ops: tuple[Type[OperatorNode], ...] = (MeanNode,),
+    rng: Union[np.random.Generator, None] = None,
+    **kwargs,
 ):
     """
     Mutation that adds a new node to the tree.
@@ -24,12 +30,14 @@ def append_new_node_mutation(
         models: Sequence of tensor models that can be used as values for the new ValueNode
         ids: Optional sequence of identifiers for the models. If None, indices will be used
         allowed_ops: Tuple of OperatorNode types that can be used when creating a new operator node
+        rng: Random generator to use, defaults to the global NumPy random state
         **kwargs: Additional keyword arguments (ignored)
 
     Returns:
         A new Tree with the mutation applied
     """
     logger.debug("Applying append_new_node_mutation")
+    random_source = resolve_rng(rng)
     tree = tree.copy()
 
     if ids is None:
@@ -37,31 +45,31 @@ def append_new_node_mutation(
         logger.trace("Using indices as IDs for models")
     else:
         assert len(models) == len(ids)
-        logger.trace(f"Using provided IDs, confirmed length match: {len(ids)}")
+        logger.trace("Using provided IDs, confirmed length match: {}", len(ids))
 
-    idx_model = np.random.randint(len(ids))
-    logger.debug(f"Selected model ID: {ids[idx_model]}")
-    node = tree.get_random_node()
-    logger.debug(f"Selected random node for mutation: {node}")
+    idx_model = random_source.choice(len(ids))
+    logger.debug("Selected model ID: {}", ids[idx_model])
+    node = tree.get_random_node(rng=rng)
+    logger.debug("Selected random node for mutation: {}", node)
 
     val_node: ValueNode = ValueNode([], models[idx_model], ids[idx_model])
-    logger.trace(f"Created new value node with ID: {ids[idx_model]}")
+    logger.trace("Created new value node with ID: {}", ids[idx_model])
 
     if isinstance(node, ValueNode):
-        random_op: Type[OperatorNode] = np.random.choice(np.asarray(allowed_ops))
-        logger.debug(f"Selected random operator type: {random_op.__name__}")
-        op_node: OperatorNode = random_op.create_node([val_node])
+        random_op: Type[OperatorNode] = random_source.choice(np.asarray(allowed_ops))
+        logger.debug("Selected random operator type: {}", random_op.__name__)
+        op_node: OperatorNode = random_op.create_node([val_node], rng=rng)
         logger.debug("Appending operator node with value node child after selected node")
-        tree.append_after(node, op_node)
+        tree.append_after(node, op_node, rng=rng)
     else:
         logger.debug("Appending value node directly to operator node")
-        tree.append_after(node, val_node)
+        tree.append_after(node, val_node, rng=rng)
 
     logger.info(f"Append node mutation complete, new tree has {tree.nodes_count} nodes")
     return tree
 
 
-def lose_branch_mutation(tree: Tree, **kwargs):
+def lose_branch_mutation(tree: Tree, rng: Union[np.random.Generator, None] = None, **kwargs):
     """
     Mutation that removes a branch from the tree.
 
@@ -70,6 +78,7 @@ def lose_branch_mutation(tree: Tree, **kwargs):
 
     Args:
         tree: The tree to mutate
+        rng: Random generator to use, defaults to the global NumPy random state
         **kwargs: Additional keyword arguments (ignored)
 
     Returns:
@@ -85,8 +94,8 @@ def lose_branch_mutation(tree: Tree, **kwargs):
         logger.error(f"Cannot apply lose_branch_mutation - tree is too small: {tree.nodes_count} nodes")
         assert tree.nodes_count >= 3, "Tree is too small"
 
-    node = tree.get_random_node(allow_leaves=False, allow_root=False)
-    logger.debug(f"Selected node for pruning: {node}")
+    node = tree.get_random_node(allow_leaves=False, allow_root=False, rng=rng)
+    logger.debug("Selected node for pruning: {}", node)
 
     pruned = tree.prune_at(node)
     logger.info(f"Pruned branch with {len(pruned.get_nodes())} nodes, tree now has {tree.nodes_count} nodes")
@@ -94,7 +103,7 @@ def lose_branch_mutation(tree: Tree, **kwargs):
     return tree
 
 
-def new_tree_from_branch_mutation(tree: Tree, **kwargs):
+def new_tree_from_branch_mutation(tree: Tree, rng: Union[np.random.Generator, None] = None, **kwargs):
     """
     Mutation that creates a new tree from a branch of the existing tree.
 
@@ -103,6 +112,7 @@ def new_tree_from_branch_mutation(tree: Tree, **kwargs):
 
     Args:
         tree: The tree to mutate
+        rng: Random generator to use, defaults to the global NumPy random state
         **kwargs: Additional keyword arguments (ignored)
 
     Returns:
@@ -116,8 +126,8 @@ def new_tree_from_branch_mutation(tree: Tree, **kwargs):
     logger.debug("Applying new_tree_from_branch_mutation")
     tree = tree.copy()
 
-    node = tree.get_random_node(nodes_type="value_nodes", allow_leaves=True, allow_root=False)
-    logger.debug(f"Selected value node for creating new tree: {node}")
+    node = tree.get_random_node(nodes_type="value_nodes", allow_leaves=True, allow_root=False, rng=rng)
+    logger.debug("Selected value node for creating new tree: {}", node)
 
     _ = tree.prune_at(node)  # this may return parent op node, so we still want to use the original node.
     logger.debug("Pruned node and its subtree to create new tree")
@@ -142,7 +152,7 @@ def get_allowed_mutations(tree):
     Returns:
         A list of mutation functions that are valid for the given tree
     """
-    logger.debug(f"Determining allowed mutations for tree with {tree.nodes_count} nodes")
+    logger.debug("Determining allowed mutations for tree with {} nodes", tree.nodes_count)
     allowed_mutations: list[Callable] = [
         append_new_node_mutation,
     ]
@@ -154,5 +164,5 @@ def get_allowed_mutations(tree):
         logger.trace("Tree has enough value nodes for new_tree_from_branch_mutation")
         allowed_mutations.append(new_tree_from_branch_mutation)
 
-    logger.debug(f"Found {len(allowed_mutations)} allowed mutation types")
+    logger.debug("Found {} allowed mutation types", len(allowed_mutations))
     return allowed_mutations
@@ -1,4 +1,5 @@
-from typing import List, Optional, Sequence, TypeVar, Union, cast
+import threading
+from typing import Callable, List, Optional, Sequence, Tuple, TypeVar, Union, cast
 
 import numpy as np
 from loguru import logger
@@ -6,9 +7,14 @@ from loguru import logger
 from giraffe.globals import BACKEND as B
 from giraffe.globals import postprocessing_function as PF
 from giraffe.lib_types import Tensor
+from giraffe.utils import resolve_rng
 
 T = TypeVar("T", bound="Node")
 
+# Guards random weight draws and weight renormalization of WeightedMeanNodes, so that trees can be
+# built and modified from several threads at once.
+_WEIGHTS_LOCK = threading.RLock()
+
 
 class Node:
     """
@@ -37,30 +43,31 @@ class Node:
         for child in self.children:
             child.parent = self
 
-    def add_child(self, child_node: "Node"):
+    def add_child(self, child_node: "Node", rng: Union[np.random.Generator, None] = None):
         """
         Add a child to the Node.
 
         Parameters:
         - child_node: Node to be added as child
+        - rng: Random generator used by nodes that draw random parameters for a new child, ignored otherwise
         """
-        logger.debug(f"Adding child node to {self}")
+        logger.debug("Adding child node to {}", self)
         self.children.append(child_node)
         child_node.parent = self
-        logger.trace(f"Child added. Node now has {len(self.children)} children")
+        logger.trace("Child added. Node now has {} children", len(self.children))
 
     def remove_child(self, child_node: "Node") -> "Node":
-        logger.debug(f"Removing child node {child_node} from {self}")
+        logger.debug("Removing child node {} from {}", child_node, self)
         self.children.remove(child_node)
         child_node.parent = None
-        logger.trace(f"Child removed. Node now has {len(self.children)} children")
+        logger.trace("Child removed. Node now has {} children", len(self.children))
         return child_node
 
     def replace_child(self, child, replacement_node):
         """
         Replaces child in place. No add child or remove child is called, so no add/remove adjustments are made.
         """
-        logger.debug(f"Replacing child node {child} with {replacement_node} in {self}")
+        logger.debug("Replacing child node {} with {} in {}", child, replacement_node, self)
 
         if replacement_node.parent is not None:
             logger.error(f"Replacement node {replacement_node} already has a parent")
@@ -71,7 +78,7 @@ class Node:
 
         child.parent = None
         replacement_node.parent = self
-        logger.trace(f"Child replaced at index {ix}")
+        logger.trace("Child replaced at index {}", ix)
 
     def get_nodes(self):
         """
@@ -109,16 +116,16 @@ class Node:
         Returns:
         - Copy of the subtree rooted at this node
         """
-        logger.debug(f"Creating copy of subtree rooted at {self}")
+        logger.debug("Creating copy of subtree rooted at {}", self)
         self_copy = self.copy()
 
         for child in self.children:
-            logger.trace(f"Copying child subtree: {child}")
+            logger.trace("Copying child subtree: {}", child)
             child_copy = child.copy_subtree()
             self_copy.children.append(child_copy)  # not "append_child" to avoid any other operations
             child_copy.parent = self_copy
 
-        logger.trace(f"Subtree copy complete with {len(self_copy.children)} children")
+        logger.trace("Subtree copy complete with {} children", len(self_copy.children))
         return self_copy
 
     def calculate(self):
@@ -158,22 +165,22 @@ class ValueNode(Node):
         self.id = id
 
     def calculate(self):
-        logger.trace(f"Calculating value for ValueNode {self.id}")
+        logger.trace("Calculating value for ValueNode {}", self.id)
         if self.children:
             for child in self.children:
-                logger.trace(f"Calculating from child node: {child}")
+                logger.trace("Calculating from child node: {}", child)
                 self.evaluation = child.calculate()
         else:
             self.evaluation = self.value
-            logger.trace(f"Using direct value for node {self.id}")
+            logger.trace("Using direct value for node {}", self.id)
         return self.evaluation
 
     def __str__(self):
         return f"ValueNode with value at: {hex(id(self.value))}"  # and evaluation: {self.evaluation}"
 
-    def add_child(self, child_node):
-        logger.debug(f"Adding child to ValueNode {self.id}")
-        super().add_child(child_node)
+    def add_child(self, child_node, rng: Union[np.random.Generator, None] = None):
+        logger.debug("Adding child to ValueNode {}", self.id)
+        super().add_child(child_node, rng=rng)
         self.evaluation = None
         logger.debug("Child added and evaluation reset")
 
@@ -200,26 +207,58 @@ class OperatorNode(Node):
         super().__init__(children)
 
     def calculate(self):
-        logger.trace(f"Calculating value for {self.__class__.__name__}")
-        concat = self._concat()
-        logger.trace(f"Concatenated tensor shape: {B.shape(concat)}")
-        post_op = self.op(concat)
-        logger.trace(f"Post-operation tensor shape: {B.shape(post_op)}")
+        logger.trace("Calculating value for {}", self.__class__.__name__)
+        return self.combine(self._inputs())
+
+    def combine(self, tensors: Sequence[Tensor], out: Union[Tensor, None] = None, scratch: Union[Tensor, None] = None) -> Tensor:
+        """
+        Apply the operator to already evaluated inputs.
+
+        Args:
+            tensors: Evaluation of the parent followed by evaluations of the children, all of the same shape.
+                They may cover only a slice of the samples, which is how trees are evaluated in chunks.
+            out: Optional preallocated tensor the operation is written to, before postprocessing
+            scratch: Optional preallocated tensor like `out` for intermediate results, overwritten by the operation
+
+        Returns:
+            Postprocessed result of the operation
+        """
+        post_op = self.reduce(tensors, out=out, scratch=scratch)
+        logger.opt(lazy=True).trace("Post-operation tensor shape: {}", lambda: B.shape(post_op))
         postprocessed = PF(post_op)  # by default passthrough, may change for different tasks
         return postprocessed
 
-    def _concat(self):
+    def reduce(self, tensors: Sequence[Tensor], out: Union[Tensor, None] = None, scratch: Union[Tensor, None] = None) -> Tensor:
+        """
+        Apply the operation to a sequence of inputs, before postprocessing.
+
+        By default the inputs are stacked and passed to `op`. Subclasses override it with fused backend
+        primitives that do not materialize the stack and write directly to `out`, using `scratch` if they need
+        a temporary.
+        """
+        concat = self._stack(tensors)
+        logger.opt(lazy=True).trace("Concatenated tensor shape: {}", lambda: B.shape(concat))
+        if out is None:
+            return self.op(concat)
+        out[...] = self.op(concat)
+        return out
+
+    def _inputs(self) -> List[Tensor]:
         assert self.parent is not None, "OperatorNode must have a parent to be calculated"
         parent: ValueNode = cast(ValueNode, self.parent)
         parent_eval = parent.evaluation if parent.evaluation is not None else parent.value
-        logger.trace(f"Concatenating parent and {len(self.children)} children tensors")
-        return B.concat(
-            [B.unsqueeze(parent_eval, axis=0)] + [B.unsqueeze(child.calculate(), axis=0) for child in self.children],
-            axis=0,
-        )
+        return [parent_eval] + [child.calculate() for child in self.children]
+
+    @staticmethod
+    def _stack(tensors: Sequence[Tensor]) -> Tensor:
+        return B.concat([B.unsqueeze(tensor, axis=0) for tensor in tensors], axis=0)
+
+    def _concat(self):
+        logger.trace("Concatenating parent and {} children tensors", len(self.children))
+        return self._stack(self._inputs())
 
     @staticmethod
-    def create_node(children):
+    def create_node(children, rng: Union[np.random.Generator, None] = None):
         raise NotImplementedError()
 
     def op(self, x):
@@ -249,8 +288,11 @@ class MeanNode(OperatorNode):
     def op(self, x):
         return B.mean(x, axis=0)
 
+    def reduce(self, tensors, out=None, scratch=None):
+        return B.stack_reduce(tensors, "mean", out=out)
+
     @staticmethod
-    def create_node(children):  # TODO: it could be derived from simple vs parametrized OperatorNode
+    def create_node(children, rng: Union[np.random.Generator, None] = None):  # TODO: it could be derived from simple vs parametrized OperatorNode
         return MeanNode(children)
 
 
@@ -260,6 +302,9 @@ class WeightedMeanNode(OperatorNode):
 
     A Weighted Mean Node computes the mean of a tensor,
     but with different weights applied to each element.
+
+    Weights are validated when they change (`add_child`, `remove_child`), not on every evaluation,
+    and their array and backend tensor forms are cached in between.
     """
 
     def __init__(
@@ -267,70 +312,75 @@ class WeightedMeanNode(OperatorNode):
         children: Optional[Sequence[ValueNode]],
         weights: List[float],
     ):
-        logger.debug(f"Creating WeightedMeanNode with {len(weights) if weights else 0} weights")
+        logger.debug("Creating WeightedMeanNode with {} weights", len(weights) if weights else 0)
         self._weights = weights
+        self._invalidate_weights()
         super().__init__(children)
 
         self._weight_sum_assertion()
-        logger.trace(f"WeightedMeanNode initialized with weights: {weights}")
+        logger.trace("WeightedMeanNode initialized with weights: {}", weights)
 
     def op(self, x):
-        weight_shape = (-1, *([1] * (len(x.shape) - 1)))
-        w = B.reshape(self.weights, weight_shape)
-        x = x * w
-        x = B.sum(x, axis=0)
-        return x
+        return B.weighted_sum(x, self.weights)
+
+    def reduce(self, tensors, out=None, scratch=None):
+        return B.weighted_sum(tensors, self.weights_array, out=out, scratch=scratch)
+
+    def _invalidate_weights(self):
+        # caches derived from `_weights`, rebuilt lazily after every change of the weights
+        self._weights_array: Union[np.ndarray, None] = None
+        self._weights_tensor: Union[Tuple[Callable, Tensor], None] = None
 
     def copy(self):
         return WeightedMeanNode([], [x for x in self._weights])  # this needs to be rethought
 
-    def add_child(self, child_node: Node):
-        logger.debug(f"Adding child to WeightedMeanNode with current weights: {self._weights}")
+    def add_child(self, child_node: Node, rng: Union[np.random.Generator, None] = None):
+        logger.debug("Adding child to WeightedMeanNode with current weights: {}", self._weights)
         assert isinstance(child_node, ValueNode)
-        child_weight = np.random.uniform(0, 1)
-        adj = 1.0 - child_weight
-
-        logger.trace(f"Generated child weight: {child_weight}, adjustment factor: {adj}")
-        for i, val in enumerate(self._weights):
-            self._weights[i] = val * adj
-        self._weights.append(child_weight)
-        self._weight_sum_assertion()
-
-        super().add_child(child_node)
-        self._weight_length_assertion()
-        logger.debug(f"Child added, new weights: {self._weights}")
+        random_source = resolve_rng(rng)
+        with _WEIGHTS_LOCK:
+            child_weight = random_source.uniform(0, 1)
+            adj = 1.0 - child_weight
+
+            logger.trace("Generated child weight: {}, adjustment factor: {}", child_weight, adj)
+            for i, val in enumerate(self._weights):
+                self._weights[i] = val * adj
+            self._weights.append(child_weight)
+            self._invalidate_weights()
+            self._weight_sum_assertion()
+
+            super().add_child(child_node, rng=rng)
+            self._weight_length_assertion()
+        logger.debug("Child added, new weights: {}", self._weights)
 
     def remove_child(self, child_node: Node):
-        logger.debug(f"Removing child from WeightedMeanNode with current weights: {self._weights}")
+        logger.debug("Removing child from WeightedMeanNode with current weights: {}", self._weights)
         assert isinstance(child_node, ValueNode), "Child node of WMN must be a ValueNode"
 
-        child_ix = self.children.index(child_node)
-        adj = 1.0 - self._weights[child_ix + 1]  # adjust for parent weight being first
-        weight_removed = self._weights[child_ix + 1]
-        self._weights.pop(child_ix + 1)
+        with _WEIGHTS_LOCK:
+            child_ix = self.children.index(child_node)
+            adj = 1.0 - self._weights[child_ix + 1]  # adjust for parent weight being first
+            weight_removed = self._weights[child_ix + 1]
+            self._weights.pop(child_ix + 1)
 
-        logger.trace(f"Removed weight at index {child_ix + 1} with value {weight_removed}, adjustment factor: {adj}")
+            logger.trace("Removed weight at index {} with value {}, adjustment factor: {}", child_ix + 1, weight_removed, adj)
 
-        super().remove_child(child_node)
+            super().remove_child(child_node)
 
-        for i, val in enumerate(self._weights):
-            self._weights[i] = val / adj
+            for i, val in enumerate(self._weights):
+                self._weights[i] = val / adj
+            self._invalidate_weights()
 
-        self._weight_sum_assertion()
-        self._weight_length_assertion()
+            self._weight_sum_assertion()
+            self._weight_length_assertion()
 
-        logger.debug(f"Child removed, new weights: {self._weights}")
+        logger.debug("Child removed, new weights: {}", self._weights)
         return child_node
 
     def replace_child(self, child, replacement_node):
         super().replace_child(child, replacement_node)
         self._weight_length_assertion()
 
-    def calculate(self):
-        self._weight_length_assertion()
-        self._weight_sum_assertion()
-        return super().calculate()
-
     def __str__(self) -> str:
         return f"WeightedMeanNode with weights: {B.to_numpy(B.tensor(self._weights)).round(2)}"
 
@@ -340,34 +390,55 @@ class WeightedMeanNode(OperatorNode):
 
     @property
     def weights(self):
-        w = B.tensor(self._weights)
-        return w
+        """
+        Weights as a backend tensor, cached until the weights change or the backend is switched.
+        """
+        cached = getattr(self, "_weights_tensor", None)  # trees pickled before caching was added lack the attribute
+        if cached is None or cached[0] is not B.tensor:
+            cached = (B.tensor, B.tensor(self._weights))
+            self._weights_tensor = cached
+        return cached[1]
+
+    @property
+    def weights_array(self) -> np.ndarray:
+        """
+        Weights as a read-only contiguous float64 NumPy array, cached until the weights change.
+        """
+        array = getattr(self, "_weights_array", None)
+        if array is None:
+            array = np.array(self._weights, dtype=np.float64)
+            array.flags.writeable = False
+            self._weights_array = array
+        return array
 
     @staticmethod
-    def create_node(children: Sequence[ValueNode]):  # TODO: add tests for that function
-        logger.debug(f"Creating WeightedMeanNode with {len(children)} children")
+    def create_node(children: Sequence[ValueNode], rng: Union[np.random.Generator, None] = None):  # TODO: add tests for that function
+        logger.debug("Creating WeightedMeanNode with {} children", len(children))
+        random_source = resolve_rng(rng)
         if len(children) == 0:
             weights = [1.0]
             logger.trace("No children, setting weight to [1.0]")
         elif len(children) == 1:
-            parent_weight = np.random.uniform(0, 1)
+            with _WEIGHTS_LOCK:
+                parent_weight = random_source.uniform(0, 1)
             weights = [parent_weight, 1 - parent_weight]
-            logger.trace(f"One child, weights: [{parent_weight}, {1 - parent_weight}]")
+            logger.trace("One child, weights: [{}, {}]", parent_weight, 1 - parent_weight)
         else:
-            weights = [np.random.uniform(0, 1)]  # initial weight for parent
-            weight_left = 1 - weights[0]
-            logger.trace(f"Multiple children, parent weight: {weights[0]}, remaining: {weight_left}")
+            with _WEIGHTS_LOCK:
+                weights = [random_source.uniform(0, 1)]  # initial weight for parent
+                weight_left = 1 - weights[0]
+                logger.trace("Multiple children, parent weight: {}, remaining: {}", weights[0], weight_left)
 
-            for i in range(len(children) - 1):
-                weights.append(np.random.uniform(0, weight_left))
-                weight_left -= weights[-1]
-                logger.trace(f"Child {i + 1} weight: {weights[-1]}, remaining: {weight_left}")
+                for i in range(len(children) - 1):
+                    weights.append(random_source.uniform(0, weight_left))
+                    weight_left -= weights[-1]
+                    logger.trace("Child {} weight: {}, remaining: {}", i + 1, weights[-1], weight_left)
 
-            weights.append(weight_left)
-            logger.trace(f"Final child weight: {weight_left}")
+                weights.append(weight_left)
+                logger.trace("Final child weight: {}", weight_left)
 
         node = WeightedMeanNode(children, weights)
-        logger.debug(f"Created WeightedMeanNode with weights: {weights}")
+        logger.debug("Created WeightedMeanNode with weights: {}", weights)
         return node
 
     def _weight_sum_assertion(self):
@@ -375,7 +446,7 @@ class WeightedMeanNode(OperatorNode):
         if not np.isclose(weight_sum, 1):
             logger.error(f"Weights sum to {weight_sum}, not 1.0: {self._weights}")
             assert np.isclose(weight_sum, 1), "Weights do not sum to 1"
-        logger.trace(f"Weight sum assertion passed: {weight_sum}")
+        logger.trace("Weight sum assertion passed: {}", weight_sum)
 
     def _weight_length_assertion(self):
         expected_length = len(self.children) + 1
@@ -383,7 +454,7 @@ class WeightedMeanNode(OperatorNode):
         if actual_length != expected_length:
             logger.error(f"Weight array length ({actual_length}) does not match expected {expected_length}")
             assert actual_length == expected_length, "Length of weight array is different than number of adjacent nodes"
-        logger.trace(f"Weight length assertion passed: {actual_length}")
+        logger.trace("Weight length assertion passed: {}", actual_length)
 
 
 class MaxNode(OperatorNode):
@@ -409,11 +480,14 @@ class MaxNode(OperatorNode):
     def op(self, x):
         return B.max(x, axis=0)
 
+    def reduce(self, tensors, out=None, scratch=None):
+        return B.stack_reduce(tensors, "max", out=out)
+
     def adjust_params(self):
         return
 
     @staticmethod
-    def create_node(children):
+    def create_node(children, rng: Union[np.random.Generator, None] = None):
         return MaxNode(children)
 
 
@@ -440,11 +514,14 @@ class MinNode(OperatorNode):
     def op(self, x):
         return B.min(x, axis=0)
 
+    def reduce(self, tensors, out=None, scratch=None):
+        return B.stack_reduce(tensors, "min", out=out)
+
     def adjust_params(self):
         return
 
     @staticmethod
-    def create_node(children):
+    def create_node(children, rng: Union[np.random.Generator, None] = None):
         return MinNode(children)
 
 
@@ -0,0 +1,102 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Sequence, TypeVar
+
+from loguru import logger
+
+from giraffe.globals import postprocessing_function as PF
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+@contextmanager
+def limit_intra_op_threads(n_threads: int | None) -> Iterator[None]:
+    """
+    Temporarily cap the number of threads used inside BLAS/OpenMP and PyTorch kernels.
+
+    When several trees are evaluated concurrently, each NumPy or PyTorch kernel may still spawn its
+    own pool of threads. Without a cap, the number of runnable threads quickly exceeds the number of
+    cores and throughput drops. BLAS/OpenMP pools are limited with threadpoolctl (installed along
+    with scikit-learn), PyTorch intra-op threads with `torch.set_num_threads`, if torch is already imported.
+    Previous limits are restored on exit.
+
+    Args:
+        n_threads: Maximum number of threads per kernel. If None, limits are left untouched.
+    """
+    if n_threads is None:
+        yield
+        return
+
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:  # pragma: no cover - threadpoolctl comes with scikit-learn
+        logger.warning("threadpoolctl is not available, BLAS/OpenMP threads will not be limited")
+        threadpool_limits = None
+
+    torch_threads = None
+    if "torch" in sys.modules:
+        import torch
+
+        torch_threads = torch.get_num_threads()
+        torch.set_num_threads(n_threads)
+        logger.trace(f"Limited torch intra-op threads from {torch_threads} to {n_threads}")
+
+    try:
+        if threadpool_limits is not None:
+            with threadpool_limits(limits=n_threads):
+                yield
+        else:
+            yield
+    finally:
+        if torch_threads is not None:
+            import torch
+
+            torch.set_num_threads(torch_threads)
+
+
+def pinned_postprocessing(func: Callable[..., R]) -> Callable[..., R]:
+    """
+    Wrap a function so that it runs with the postprocessing function active at the time of wrapping.
+
+    The wrapped function is meant to be executed in worker threads, where changing the global
+    postprocessing function concurrently could otherwise affect trees evaluated in the middle of a batch.
+
+    Args:
+        func: Function to wrap
+
+    Returns:
+        Wrapped function
+    """
+    pinned_function = PF.function
+
+    def run(*args, **kwargs) -> R:
+        with PF.pinned(pinned_function):
+            return func(*args, **kwargs)
+
+    return run
+
+
+def thread_map(func: Callable[[T], R], items: Sequence[T], n_jobs: int, intra_op_threads: int | None = 1) -> List[R]:
+    """
+    Apply a function to every item using a pool of threads, preserving the order of results.
+
+    This is meant for tree evaluation and fitness calculation, where most of the time is spent inside
+    NumPy/PyTorch kernels that release the GIL, so threads give a real speedup without pickling trees
+    or sharing memory between processes. The postprocessing function active when the call is made is
+    pinned in every worker thread, so changing it concurrently cannot affect the running batch.
+
+    Args:
+        func: Function to apply
+        items: Items to process
+        n_jobs: Number of worker threads
+        intra_op_threads: Maximum number of threads used by each kernel, see `limit_intra_op_threads`
+
+    Returns:
+        List of results in the same order as items
+    """
+    run = pinned_postprocessing(func)
+    logger.debug(f"Evaluating {len(items)} items with {n_jobs} threads")
+    with limit_intra_op_threads(intra_op_threads), ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        return list(executor.map(run, items))
@@ -1,6 +1,5 @@
 from typing import Callable, Sequence
 
-import matplotlib.pyplot as plt
 import numpy as np
 
 
@@ -106,6 +105,8 @@ def plot_pareto_frontier(array: np.ndarray, objectives: Sequence[Callable[[float
     # Get the Pareto set (True for points on the Pareto frontier)
     pareto_mask = paretoset(array, objectives)
 
+    import matplotlib.pyplot as plt  # imported on first plot, selection alone does not need matplotlib
+
     # Create figure and axis
     fig, ax = plt.subplots(figsize=figsize)
 
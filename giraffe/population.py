@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Dict, List, Union
 
 import numpy as np
 from loguru import logger
@@ -6,9 +6,10 @@ from loguru import logger
 from giraffe.lib_types import Tensor
 from giraffe.node import ValueNode
 from giraffe.tree import Tree
+from giraffe.utils import resolve_rng
 
 
-def initialize_individuals(tensors_dict: Dict[str, Tensor], n: int, exclude_ids=tuple()) -> List[Tree]:
+def initialize_individuals(tensors_dict: Dict[str, Tensor], n: int, exclude_ids=tuple(), rng: Union[np.random.Generator, None] = None) -> List[Tree]:
     """
     Initialize a population of individuals (trees) from a dictionary of tensors.
 
@@ -19,6 +20,7 @@ def initialize_individuals(tensors_dict: Dict[str, Tensor], n: int, exclude_ids=
         tensors_dict: Dictionary mapping model IDs to their tensor representations
         n: Number of individuals (trees) to create
         exclude_ids: Optional tuple of model IDs to exclude from selection
+        rng: Random generator to use, defaults to the global NumPy random state
 
     Returns:
         List of initialized Tree objects
@@ -29,8 +31,9 @@ def initialize_individuals(tensors_dict: Dict[str, Tensor], n: int, exclude_ids=
     logger.info(f"Initializing {n} individuals")
     logger.debug(f"Available tensors: {len(tensors_dict)}, excluded IDs: {len(exclude_ids)}")
 
+    random_source = resolve_rng(rng)
     order = np.arange(len(tensors_dict))
-    np.random.shuffle(order)
+    random_source.shuffle(order)
     logger.trace("Shuffled tensor order")
 
     ids_list = list(tensors_dict.keys())
@@ -96,6 +99,8 @@ def choose_pareto(trees: List[Tree], fitnesses: np.ndarray, n: int):
     Optimizes for:
     - Maximizing fitness
     - Minimizing number of nodes in the tree
+    - Maximizing secondary objectives of the trees (`Tree.objectives`), if any.
+      Trees with fewer objectives than others are treated as having -inf in the missing ones.
 
     Args:
         trees: List of Tree objects
@@ -108,16 +113,18 @@ def choose_pareto(trees: List[Tree], fitnesses: np.ndarray, n: int):
     logger.debug(f"Selecting up to {n} Pareto-optimal trees from population of {len(trees)}")
     from giraffe.pareto import maximize, minimize, paretoset
 
-    # Create a 2D array with [fitness, nodes_count] for each tree
-    objectives_array = np.zeros((len(trees), 2), dtype=float)
+    # Create a 2D array with [fitness, nodes_count, *secondary objectives] for each tree
+    n_secondary = max((len(tree.objectives) for tree in trees), default=0)
+    objectives_array = np.full((len(trees), 2 + n_secondary), -np.inf, dtype=float)
     for i, (tree, fitness) in enumerate(zip(trees, fitnesses, strict=True)):
         objectives_array[i, 0] = fitness  # Maximize fitness
         objectives_array[i, 1] = tree.nodes_count  # Minimize nodes count
+        objectives_array[i, 2 : 2 + len(tree.objectives)] = tree.objectives  # Maximize secondary objectives
 
     logger.trace(f"Created objectives array with shape {objectives_array.shape}")
 
-    # Get Pareto-optimal mask using maximize for fitness and minimize for nodes count
-    pareto_mask = paretoset(objectives_array, [maximize, minimize])
+    # Get Pareto-optimal mask using maximize for fitness and secondary objectives and minimize for nodes count
+    pareto_mask = paretoset(objectives_array, [maximize, minimize] + [maximize] * n_secondary)
     pareto_count = np.sum(pareto_mask)
     logger.debug(f"Found {pareto_count} Pareto-optimal trees")
 
@@ -0,0 +1,104 @@
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterator, List, Literal, Mapping, Union
+
+from loguru import logger
+
+from giraffe.globals import BACKEND as B
+from giraffe.globals import DEVICE
+from giraffe.lib_types import Tensor
+from giraffe.store import PackedStore, is_packed_store
+
+
+class LazyTensorProvider(Mapping[str, Tensor]):
+    """
+    Read-only mapping from model ids to predictions, loading each tensor on first access.
+
+    Meant for inference with saved trees: pass the same provider as `tensors` to `Tree.load_tree` or as
+    `current_tensors` to `Tree.do_pred_on_another_tensors` for every tree, and only the models referenced
+    by the union of their value nodes are read, each once. Loaded tensors are cached in least recently used
+    order; when `max_bytes` is set, the oldest ones are dropped from the cache once the budget is exceeded.
+    Trees keep references to the tensors of their value nodes, so dropping a tensor from the cache only
+    frees memory once no loaded tree uses it.
+
+    Attributes:
+        source: Directory with prediction files or path to a packed store
+        max_bytes: Byte budget of the cache, None for no limit
+        mmap_mode: Memory-mapping mode passed to `Backend.load` for prediction files
+        loads: Number of tensors loaded so far, including reloads after eviction
+    """
+
+    def __init__(
+        self,
+        source: Union[Path, str],
+        max_bytes: Union[int, None] = None,
+        mmap_mode: Union[Literal["r", "r+", "c"], None] = None,
+    ):
+        """
+        Create a provider. Nothing is loaded until a tensor is requested.
+
+        Args:
+            source: Directory with prediction files named by model ids, or path to a packed store
+            max_bytes: Byte budget of the cache, None for no limit
+            mmap_mode: Memory-mapping mode passed to `Backend.load` for prediction files
+        """
+        self.source = Path(source)
+        self.max_bytes = max_bytes
+        self.mmap_mode = mmap_mode
+        self.loads = 0
+        self._store = PackedStore(self.source, mmap_mode=mmap_mode or "c") if is_packed_store(self.source) else None
+        self._cache: OrderedDict[str, Tensor] = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.RLock()
+
+    @property
+    def cached_bytes(self) -> int:
+        """
+        Total size of the tensors currently cached.
+        """
+        return self._cached_bytes
+
+    def _ids(self) -> List[str]:
+        if self._store is not None:
+            return list(self._store)
+        return sorted(path.name for path in self.source.iterdir() if path.is_file())
+
+    def _load(self, tensor_id: str) -> Tensor:
+        logger.debug(f"Lazily loading tensor for model ID: {tensor_id}")
+        if self._store is not None:
+            return self._store[tensor_id]
+        path = self.source / tensor_id
+        if not path.is_file():
+            raise KeyError(tensor_id)
+        return B.load(path, DEVICE, mmap_mode=self.mmap_mode)
+
+    def __getitem__(self, tensor_id: str) -> Tensor:
+        tensor_id = str(tensor_id)
+        with self._lock:
+            if tensor_id in self._cache:
+                self._cache.move_to_end(tensor_id)
+                return self._cache[tensor_id]
+
+            tensor = self._load(tensor_id)
+            self.loads += 1
+            self._cache[tensor_id] = tensor
+            self._cached_bytes += B.nbytes(tensor)
+            while self.max_bytes is not None and self._cached_bytes > self.max_bytes and len(self._cache) > 1:
+                evicted_id, evicted = self._cache.popitem(last=False)
+                self._cached_bytes -= B.nbytes(evicted)
+                logger.trace(f"Evicted tensor {evicted_id} from cache, {self._cached_bytes} bytes cached")
+            return tensor
+
+    def __contains__(self, tensor_id) -> bool:
+        if str(tensor_id) in self._cache:
+            return True
+        if self._store is not None:
+            return str(tensor_id) in self._store
+        return (self.source / str(tensor_id)).is_file()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids())
+
+    def __len__(self) -> int:
+        return len(self._ids())
@@ -0,0 +1,71 @@
+"""
+Quantized storage of probabilities as uint8.
+
+A probability p in [0, 1] is stored as round(p * 255), so the scale is fixed and equal to 1 / 255. Ranking metrics only
+depend on the order of predictions, which 8 bits preserve up to ties of probabilities closer than 1 / 510, and the
+predictions of a pool of models take 8 times less memory than float64.
+
+Operator nodes work directly on the quantized representation: Min and Max are exact, Mean and Weighted Mean accumulate
+in a wider type and round back to uint8. Histogram based fitness functions (`giraffe.fitness.quantized_average_precision_fitness`,
+`giraffe.fitness.quantized_roc_auc_fitness`) count quantized scores directly, the other fitness functions dequantize.
+
+The dtype alone does not make predictions quantized, uint8 tensors may as well hold hard labels. Predictions are treated
+as quantized only when this is recorded explicitly: `Giraffe(compute_dtype="uint8")` builds its `FitnessContext` with
+`quantized` set, and accumulators take a `quantized` argument.
+"""
+
+from typing import Any
+
+import numpy as np
+
+from giraffe.backend.interop import is_torch_tensor
+
+QUANTIZED_DTYPE = "uint8"
+LEVELS = 255
+
+
+def is_quantized(x: Any) -> bool:
+    """
+    Check whether a tensor has the dtype of quantized probabilities.
+    """
+    if is_torch_tensor(x):
+        import torch
+
+        return x.dtype == torch.uint8
+    return np.asarray(x).dtype == np.uint8
+
+
+def quantize(x: Any) -> Any:
+    """
+    Quantize probabilities to uint8, values outside [0, 1] are clipped.
+
+    Args:
+        x: NumPy array or PyTorch tensor of probabilities
+
+    Returns:
+        Tensor of the same kind with dtype uint8
+    """
+    if is_torch_tensor(x):
+        import torch
+
+        return torch.round(torch.clamp(x.float(), 0, 1) * LEVELS).to(torch.uint8)
+    return np.rint(np.clip(np.asarray(x, dtype=np.float32), 0, 1) * LEVELS).astype(np.uint8)
+
+
+def dequantize(x: Any) -> Any:
+    """
+    Convert quantized probabilities back to float32, tensors of other dtypes are returned unchanged.
+
+    It is meant to be called only for predictions known to be quantized, see the module documentation.
+
+    Args:
+        x: NumPy array or PyTorch tensor
+
+    Returns:
+        Tensor of the same kind, float32 in [0, 1] if `x` was quantized
+    """
+    if not is_quantized(x):
+        return x
+    if is_torch_tensor(x):
+        return x.float() / LEVELS
+    return np.asarray(x, dtype=np.float32) / np.float32(LEVELS)
@@ -0,0 +1,141 @@
+from typing import TYPE_CHECKING, Dict, List, Union
+
+import numpy as np
+import numpy.typing as npt
+from loguru import logger
+
+from giraffe.fitness_context import FitnessContext
+from giraffe.globals import BACKEND as B
+from giraffe.lib_types import Tensor
+from giraffe.metrics import split_fitness
+from giraffe.parallel import thread_map
+from giraffe.tree import Tree
+
+if TYPE_CHECKING:
+    from giraffe.giraffe import Giraffe
+
+
+class RacingEvaluator:
+    """
+    Subsample-then-confirm fitness evaluation of offspring.
+
+    Every candidate is first scored on a fixed subsample of the training data, stratified by label.
+    Full fitness is computed only for candidates that could still survive selection, i.e. whose subsample
+    score plus `margin` either reaches the `population_size`-th best fitness of the current population
+    or is not dominated by any current tree in (fitness, number of nodes), so that it could enter the Pareto front.
+    Remaining candidates get a fitness of -inf and are never selected, as each of them is beaten by trees
+    already in the population. Fitness values of selected trees are therefore always exact.
+
+    Secondary objectives of a `giraffe.metrics.FitnessResult` are not taken into account when deciding
+    which candidates could survive. Subsample evaluations are not counted towards the evaluation budget of `Giraffe.train`.
+
+    Attributes:
+        subsample_size: Fraction of samples (float in (0, 1]) or number of samples (int) in the subsample
+        margin: Confidence margin added to subsample scores
+        candidates: Number of candidates seen so far
+        full_evaluations: Number of candidates evaluated on full data so far
+    """
+
+    def __init__(self, subsample_size: Union[float, int] = 0.1, margin: float = 0.05, seed: Union[int, None] = 0):
+        """
+        Args:
+            subsample_size: Fraction of samples (float in (0, 1]) or number of samples (int) in the subsample
+            margin: Confidence margin added to subsample scores before comparing them with full-data fitness
+            seed: Seed of the random generator used to draw the subsample
+        """
+        if isinstance(subsample_size, float) and not 0 < subsample_size <= 1:
+            raise ValueError(f"Subsample fraction must be in (0, 1], got {subsample_size}")
+        self.subsample_size = subsample_size
+        self.margin = margin
+        self.rng = np.random.default_rng(seed)
+        self.candidates = 0
+        self.full_evaluations = 0
+        self._index: Union[npt.NDArray[np.intp], None] = None
+        self._gt: Union[Tensor, None] = None
+
+    @property
+    def avoided_fraction(self) -> float:
+        """
+        Fraction of candidates for which full evaluation was avoided.
+        """
+        return 1 - self.full_evaluations / self.candidates if self.candidates else 0.0
+
+    def _subsample_index(self, gt: Tensor) -> npt.NDArray[np.intp]:
+        if self._index is not None and self._gt is gt:
+            return self._index
+        labels = B.to_numpy(gt)
+        n_samples = len(labels)
+        fraction = self.subsample_size / n_samples if isinstance(self.subsample_size, int) else self.subsample_size
+        _, strata = np.unique(labels.reshape(n_samples, -1), axis=0, return_inverse=True)
+        index = []
+        for stratum in np.unique(strata):
+            members = np.flatnonzero(strata == stratum)
+            size = min(len(members), max(1, int(round(fraction * len(members)))))
+            index.append(self.rng.choice(members, size, replace=False))
+        self._index, self._gt = np.sort(np.concatenate(index)), gt
+        logger.debug(f"Drawn stratified subsample of {len(self._index)} out of {n_samples} samples")
+        return self._index
+
+    def _subsample_fitness(
+        self, giraffe: "Giraffe", tree: Tree, tensors: Dict[str, Tensor], index: npt.NDArray[np.intp], gt: Union[Tensor, FitnessContext]
+    ) -> float:
+        _, subsampled_tree = tree.do_pred_on_another_tensors(current_tensors=tensors, return_tree=True)
+        if giraffe.sample_weights is not None:
+            result = giraffe.fitness_function(subsampled_tree, gt, sample_weight=giraffe.sample_weights[index])  # type: ignore[call-arg]
+        else:
+            result = giraffe.fitness_function(subsampled_tree, gt)
+        return split_fitness(result)[0]
+
+    def evaluate(
+        self, giraffe: "Giraffe", candidates: List[Tree], population: List[Tree], fitnesses: npt.NDArray[np.float64]
+    ) -> npt.NDArray[np.float64]:
+        """
+        Calculate fitness of candidates competing with the current population.
+
+        Args:
+            giraffe: Giraffe instance providing data, fitness function and parallelism settings
+            candidates: New trees to evaluate
+            population: Current population the candidates compete with
+            fitnesses: Exact fitness values of the current population
+
+        Returns:
+            Fitness of every candidate, exact for candidates that could survive selection and -inf for the rest
+        """
+        if len(candidates) == 0:
+            return np.array([], dtype=np.float64)
+        index = self._subsample_index(giraffe.gt_tensor)
+        gt = giraffe.gt_tensor[index]
+        if giraffe.fitness_context is not None:
+            gt = FitnessContext.build(gt, giraffe.fitness_context.task, giraffe.fitness_context.quantized)
+        # predictions of the models used by candidates are subsampled once and shared by all candidates
+        used_ids = {node.id for tree in candidates for node in tree.nodes["value_nodes"]}
+        tensors = {tensor_id: giraffe.train_tensors[tensor_id][index] for tensor_id in used_ids}
+
+        def subsample_fitness(tree: Tree) -> float:
+            return self._subsample_fitness(giraffe, tree, tensors, index, gt)
+
+        if giraffe.n_jobs > 1 and len(candidates) > 1:
+            optimistic = np.array(thread_map(subsample_fitness, candidates, giraffe.n_jobs, giraffe.intra_op_threads)) + self.margin
+        else:
+            optimistic = np.array([subsample_fitness(tree) for tree in candidates]) + self.margin
+
+        may_survive = np.ones(len(candidates), dtype=bool)
+        if len(population) >= giraffe.population_size:
+            threshold = np.sort(fitnesses)[::-1][giraffe.population_size - 1]
+            nodes = np.array([tree.nodes_count for tree in population])
+            candidate_nodes = np.array([tree.nodes_count for tree in candidates])
+            for i, (score, n_nodes) in enumerate(zip(optimistic, candidate_nodes, strict=True)):
+                dominated = np.any((fitnesses >= score) & (nodes <= n_nodes) & ((fitnesses > score) | (nodes < n_nodes)))
+                may_survive[i] = score >= threshold or not dominated
+
+        result = np.full(len(candidates), -np.inf)
+        confirmed = np.flatnonzero(may_survive)
+        result[confirmed] = giraffe._calculate_fitnesses([candidates[i] for i in confirmed])
+
+        self.candidates += len(candidates)
+        self.full_evaluations += len(confirmed)
+        logger.info(
+            f"Racing: {len(confirmed)}/{len(candidates)} candidates evaluated on full data, "
+            f"{self.avoided_fraction:.1%} of full evaluations avoided so far"
+        )
+        return result
@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Literal, Mapping, Union
+
+import numpy as np
+from loguru import logger
+
+from giraffe.backend.interop import as_numpy
+from giraffe.globals import BACKEND as B
+from giraffe.globals import DEVICE
+from giraffe.lib_types import Tensor
+
+MAGIC = b"GIRAFFE\x01"
+ALIGNMENT = 64
+_PREAMBLE_SIZE = len(MAGIC) + 8  # magic followed by little-endian uint64 header length
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _as_numpy(x) -> np.ndarray:
+    return np.ascontiguousarray(as_numpy(x))  # torch.Tensor, whatever the current backend is
+
+
+def is_packed_store(path: Union[Path, str]) -> bool:
+    """
+    Check whether a path points to a packed prediction store.
+
+    Args:
+        path: Path to check
+
+    Returns:
+        True if path is a file starting with the store magic bytes
+    """
+    path = Path(path)
+    if not path.is_file():
+        return False
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def pack(path: Union[Path, str], tensors: Mapping[str, Tensor], gt: Union[Tensor, None] = None):
+    """
+    Write predictions of all models, and optionally the ground truth, into a single packed file.
+
+    The file starts with magic bytes, the length of a JSON header and the header itself, which holds
+    the shape, dtype, offset and size of every tensor. Tensor data follows, each tensor starting at an offset
+    aligned to 64 bytes, so that it can be memory-mapped directly with `PackedStore`.
+
+    Args:
+        path: Path of the file to write
+        tensors: Mapping from model ids to their predictions
+        gt: Optional ground truth tensor
+    """
+    items = [(tensor_id, _as_numpy(tensor)) for tensor_id, tensor in tensors.items()]
+    if gt is not None:
+        items.append(("gt", _as_numpy(gt)))
+
+    entries: List[Dict[str, Any]] = []
+    offset = 0
+    for tensor_id, array in items:
+        if array.dtype.hasobject:
+            raise ValueError(f"Tensor {tensor_id} has object dtype and cannot be packed")
+        entries.append({"shape": list(array.shape), "dtype": array.dtype.str, "offset": offset, "nbytes": array.nbytes})
+        offset = _align(offset + array.nbytes)
+
+    gt_entry = entries[-1] if gt is not None else None
+    tensor_entries = dict(zip(tensors.keys(), entries[: len(tensors)], strict=True))
+    header = json.dumps({"version": 1, "alignment": ALIGNMENT, "tensors": tensor_entries, "gt": gt_entry}).encode("utf-8")
+    data_start = _align(_PREAMBLE_SIZE + len(header))
+
+    logger.info(f"Packing {len(tensors)} tensors{' and ground truth' if gt is not None else ''} into {path}")
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        for (_, array), entry in zip(items, entries, strict=True):
+            f.seek(data_start + entry["offset"])
+            array.tofile(f)
+        f.truncate(data_start + offset)
+    logger.debug(f"Packed store written, {data_start + offset} bytes")
+
+
+def pack_files(path: Union[Path, str], preds_paths: List[Union[Path, str]], gt_path: Union[Path, str, None] = None):
+    """
+    Pack prediction files into a single store. Model ids are file names, the same as when loading a directory with `Giraffe`.
+
+    Args:
+        path: Path of the file to write
+        preds_paths: Prediction files or directories containing them
+        gt_path: Optional ground truth file
+    """
+    files: List[Path] = []
+    for preds_path in map(Path, preds_paths):
+        files += sorted(preds_path.glob("*")) if preds_path.is_dir() else [preds_path]
+    shards: Dict[str, List[np.ndarray]] = {}
+    for file in files:
+        shards.setdefault(file.name, []).append(_as_numpy(B.load(file, DEVICE, mmap_mode="r")))
+    tensors = {tensor_id: arrays[0] if len(arrays) == 1 else np.concatenate(arrays) for tensor_id, arrays in shards.items()}
+    gt = None if gt_path is None else B.load(gt_path, DEVICE, mmap_mode="r")
+    pack(path, tensors, gt)
+
+
+class PackedStore(Mapping[str, Tensor]):
+    """
+    Read-only mapping from model ids to predictions stored in a packed file written by `pack`.
+
+    The data region of the file is memory-mapped once and every tensor is a view into the mapping, so nothing
+    is copied and only the pages touched during evaluation are read from disk. With the PyTorch backend, tensors
+    share memory with the mapping through `torch.from_numpy`, unless `DEVICE` moves them to another device.
+    An open store can be passed to `Tree.load_tree` and `Tree.do_pred_on_another_tensors` for any number of trees.
+
+    Attributes:
+        path: Path of the packed file
+        gt: Ground truth tensor, or None if the store does not contain it
+    """
+
+    def __init__(self, path: Union[Path, str], mmap_mode: Literal["r", "r+", "c"] = "c"):
+        """
+        Open a packed store.
+
+        Args:
+            path: Path of the packed file
+            mmap_mode: Mode of `numpy.memmap`. The default 'c' (copy-on-write) never modifies the file
+                and gives writable arrays, which PyTorch requires to share memory without warnings.
+
+        Raises:
+            ValueError: If the file is not a packed store
+        """
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.path} is not a packed GIRAFFE store")
+            header_length = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(header_length).decode("utf-8"))
+        self._data_start = _align(_PREAMBLE_SIZE + header_length)
+        self._entries: Dict[str, Dict] = header["tensors"]
+        data_size = os.path.getsize(self.path) - self._data_start
+        # memmap cannot map empty regions, which only happens when every tensor is empty
+        self._data = np.memmap(self.path, dtype=np.uint8, mode=mmap_mode, offset=self._data_start) if data_size > 0 else np.empty(0, np.uint8)
+        self._tensors: Dict[str, Tensor] = {}
+        self.gt: Union[Tensor, None] = None if header["gt"] is None else self._map(header["gt"])
+        logger.debug(f"Opened packed store {self.path} with {len(self._entries)} tensors")
+
+    def _map(self, entry: Dict) -> Tensor:
+        start = entry["offset"]
+        array = self._data[start : start + entry["nbytes"]].view(np.dtype(entry["dtype"])).reshape(entry["shape"])
+        return B.from_numpy(array, DEVICE)
+
+    def __getitem__(self, tensor_id: str) -> Tensor:
+        if tensor_id not in self._tensors:
+            self._tensors[tensor_id] = self._map(self._entries[tensor_id])
+        return self._tensors[tensor_id]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def unpack(path: Union[Path, str], output_directory: Union[Path, str]):
+    """
+    Write the contents of a packed store back into separate NumPy files.
+
+    Predictions are written to `output_directory/preds` under their model ids, and the ground truth,
+    if present, to `output_directory/gt.npy`.
+
+    Args:
+        path: Path of the packed file
+        output_directory: Directory to write the files to
+    """
+    store = PackedStore(path)
+    preds_directory = Path(output_directory) / "preds"
+    os.makedirs(preds_directory, exist_ok=True)
+    for tensor_id in store:
+        with open(preds_directory / tensor_id, "wb") as f:
+            np.save(f, B.to_numpy(store[tensor_id]))
+    if store.gt is not None:
+        np.save(Path(output_directory) / "gt.npy", B.to_numpy(store.gt))
+    logger.info(f"Unpacked {len(store)} tensors from {path} into {output_directory}")
+
+
+def main(argv: Union[List[str], None] = None):
+    parser = argparse.ArgumentParser(prog="python -m giraffe.store", description="Pack predictions into a single file or unpack them.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    pack_parser = subparsers.add_parser("pack", help="pack prediction files into a single store")
+    pack_parser.add_argument("output", help="path of the packed file to write")
+    pack_parser.add_argument("preds", nargs="+", help="prediction files or directories containing them")
+    pack_parser.add_argument("--gt", default=None, help="ground truth file")
+    pack_parser.add_argument("--backend", default="numpy", choices=["numpy", "pytorch"], help="backend used to read the files")
+
+    unpack_parser = subparsers.add_parser("unpack", help="unpack a store into separate NumPy files")
+    unpack_parser.add_argument("store", help="path of the packed file")
+    unpack_parser.add_argument("output_directory", help="directory to write the files to")
+
+    args = parser.parse_args(argv)
+    if args.command == "pack":
+        from giraffe.backend.backend import Backend
+
+        Backend.set_backend(args.backend)
+        pack_files(args.output, args.preds, args.gt)
+    else:
+        unpack(args.store, args.output_directory)
+
+
+if __name__ == "__main__":
+    main()
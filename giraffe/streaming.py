@@ -0,0 +1,83 @@
+from typing import Iterator, List, Tuple, TypeVar, Union, cast
+
+from loguru import logger
+
+from giraffe.globals import BACKEND as B
+from giraffe.lib_types import Tensor
+from giraffe.node import OperatorNode, ValueNode
+from giraffe.tree import Tree
+
+A = TypeVar("A")
+
+
+def _evaluate_chunk(node: ValueNode, index: slice) -> Tensor:
+    evaluation = node.value[index]
+    for op_node in cast(List[OperatorNode], node.children):
+        inputs = [evaluation] + [_evaluate_chunk(child, index) for child in cast(List[ValueNode], op_node.children)]
+        evaluation = op_node.combine(inputs)
+    return evaluation
+
+
+def iter_chunks(tree: Tree, chunk_size: int) -> Iterator[Tuple[slice, Tensor]]:
+    """
+    Evaluate a tree on consecutive chunks of samples.
+
+    Nothing is stored on the nodes, only the evaluations along the path currently being computed are alive,
+    so peak memory is proportional to chunk size times tree depth instead of number of samples times number
+    of nodes. Combined with memory-mapped predictions, this allows evaluating trees on data larger than RAM.
+    The postprocessing function needs to work on each sample independently, as it is applied per chunk.
+
+    Args:
+        tree: Tree to evaluate
+        chunk_size: Number of samples in a chunk
+
+    Yields:
+        Tuples of the slice of samples and the evaluation of the tree on them
+    """
+    if chunk_size < 1:
+        raise ValueError(f"Chunk size must be positive, got {chunk_size}")
+    n_samples = B.shape(tree.root.value)[0]
+    logger.trace(f"Evaluating tree in {-(-n_samples // chunk_size)} chunks of {chunk_size} samples")
+    for start in range(0, n_samples, chunk_size):
+        index = slice(start, min(start + chunk_size, n_samples))
+        yield index, _evaluate_chunk(tree.root, index)
+
+
+def evaluate_in_chunks(tree: Tree, chunk_size: int, out: Union[Tensor, None] = None) -> Tensor:
+    """
+    Evaluate a tree chunk by chunk, writing the results into a single output tensor.
+
+    Args:
+        tree: Tree to evaluate
+        chunk_size: Number of samples in a chunk
+        out: Optional preallocated output tensor. If None, it is allocated after evaluating the first chunk.
+
+    Returns:
+        Evaluation of the tree, the same as `tree.evaluation`
+    """
+    if not tree.root.children:
+        return tree.root.value
+    n_samples = B.shape(tree.root.value)[0]
+    for index, chunk in iter_chunks(tree, chunk_size):
+        if out is None:
+            out = B.empty((n_samples, *B.shape(chunk)[1:]), like=chunk)
+        out[index] = chunk
+    return out
+
+
+def accumulate_in_chunks(tree: Tree, gt: Tensor, accumulator: A, chunk_size: int) -> A:
+    """
+    Feed evaluation of a tree to a streaming accumulator chunk by chunk, without materializing the full evaluation.
+
+    Args:
+        tree: Tree to evaluate
+        gt: Ground truth tensor, sliced along the sample axis together with predictions
+        accumulator: Object with an `update(pred_chunk, gt_chunk)` method
+        chunk_size: Number of samples in a chunk
+
+    Returns:
+        The accumulator, updated with all chunks
+    """
+    for index, chunk in iter_chunks(tree, chunk_size):
+        accumulator.update(chunk, gt[index])  # type: ignore[attr-defined]
+    return accumulator
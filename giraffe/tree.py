@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import Self, Tuple, cast
+from typing import Mapping, Self, Tuple, cast
 
 import numpy as np
 from loguru import logger
@@ -7,7 +7,9 @@ from loguru import logger
 from giraffe.globals import BACKEND as B
 from giraffe.globals import DEVICE
 from giraffe.node import Node, OperatorNode, ValueNode, check_if_both_types_same_node_variant
-from giraffe.utils import Pickle
+from giraffe.provider import LazyTensorProvider
+from giraffe.store import PackedStore, is_packed_store
+from giraffe.utils import Pickle, resolve_rng
 
 
 class Tree:
@@ -29,11 +31,13 @@ class Tree:
         root: The root node of the tree (must be a ValueNode)
         nodes: Dictionary containing lists of all value nodes and operator nodes in the tree
         mutation_chance: Probability of mutation for this tree during evolution
+        objectives: Secondary objectives of the tree set by `Giraffe` when the fitness function returns
+            a `giraffe.metrics.FitnessResult`, empty otherwise. They are not copied with the tree.
     """
 
     def __init__(self, root: ValueNode, mutation_chance=0.1):
         self.root = root
-        logger.debug(f"Creating new tree with root: {root}")
+        logger.debug("Creating new tree with root: {}", root)
 
         if isinstance(self.root, OperatorNode):
             logger.error("Cannot initialize tree with OperatorNode as root")
@@ -41,8 +45,9 @@ class Tree:
 
         self.nodes: dict[str, list] = {"value_nodes": [], "op_nodes": []}
         self.mutation_chance = mutation_chance
+        self.objectives: Tuple[float, ...] = ()
         self.update_nodes()
-        logger.trace(f"Tree initialized with {len(self.nodes['value_nodes'])} value nodes and {len(self.nodes['op_nodes'])} operator nodes")
+        logger.trace("Tree initialized with {} value nodes and {} operator nodes", len(self.nodes['value_nodes']), len(self.nodes['op_nodes']))
 
     def update_nodes(self):
         """
@@ -59,7 +64,7 @@ class Tree:
                 self.nodes["value_nodes"].append(node)
             else:
                 self.nodes["op_nodes"].append(node)
-        logger.trace(f"Updated nodes: {len(self.nodes['value_nodes'])} value nodes, {len(self.nodes['op_nodes'])} operator nodes")
+        logger.trace("Updated nodes: {} value nodes, {} operator nodes", len(self.nodes['value_nodes']), len(self.nodes['op_nodes']))
 
     @staticmethod
     def create_tree_from_root(root: ValueNode, mutation_chance=0.1):
@@ -73,7 +78,7 @@ class Tree:
         Returns:
             A new Tree instance
         """
-        logger.debug(f"Creating tree from root node with mutation chance: {mutation_chance}")
+        logger.debug("Creating tree from root node with mutation chance: {}", mutation_chance)
         tree = Tree(root, mutation_chance)
         return tree
 
@@ -144,6 +149,21 @@ class Tree:
         root_copy: ValueNode = cast(ValueNode, self.root.copy_subtree())
         return Tree.create_tree_from_root(root_copy)
 
+    def take_samples(self, index) -> "Tree":
+        """
+        Create a copy of the tree whose value nodes hold only the selected samples.
+
+        Args:
+            index: Index along the sample axis, e.g. a slice or an array of sample indices
+
+        Returns:
+            A new Tree instance with the same structure, evaluated only on the selected samples
+        """
+        copy_tree = self.copy()
+        for value_node in copy_tree.nodes["value_nodes"]:
+            value_node.value = value_node.value[index]
+        return copy_tree
+
     def prune_at(self, node: Node) -> Node:
         """
         Remove a node and its subtree from the tree.
@@ -161,7 +181,7 @@ class Tree:
         Raises:
             ValueError: If the node is not found in the tree or if attempting to prune the root node
         """
-        logger.debug(f"Pruning node from tree: {node}")
+        logger.debug("Pruning node from tree: {}", node)
 
         if node not in self.nodes["value_nodes"] and node not in self.nodes["op_nodes"]:
             logger.error(f"Attempted to prune node not in tree: {node}")
@@ -174,13 +194,13 @@ class Tree:
         if isinstance(node.parent, OperatorNode) and (
             len(node.parent.children) < 2
         ):  # if only child of op node is to be pruned, remove the parent instead
-            logger.debug(f"Node is the only child of operator node, pruning parent: {node.parent}")
+            logger.debug("Node is the only child of operator node, pruning parent: {}", node.parent)
             return self.prune_at(node.parent)
 
         subtree_nodes = node.get_nodes()
         node_count = len(subtree_nodes)
 
-        logger.debug(f"Removing {node_count} nodes in subtree")
+        logger.debug("Removing {} nodes in subtree", node_count)
         for subtree_node in subtree_nodes:
             if isinstance(subtree_node, ValueNode):
                 self.nodes["value_nodes"].remove(subtree_node)
@@ -192,7 +212,7 @@ class Tree:
         self._clean_evals()
         return node
 
-    def append_after(self, node: Node, new_node: Node):
+    def append_after(self, node: Node, new_node: Node, rng: np.random.Generator | None = None):
         """
         Append a new node as a child of an existing node.
 
@@ -202,12 +222,13 @@ class Tree:
         Args:
             node: The existing node to which the new node will be appended
             new_node: The new node to append
+            rng: Random generator used by nodes that draw random parameters when a child is added
 
         Raises:
             ValueError: If the node is not found in the tree or if attempting to append
                        a node of the same type
         """
-        logger.debug(f"Appending node {new_node} after {node}")
+        logger.debug("Appending node {} after {}", new_node, node)
 
         if node not in self.nodes["value_nodes"] and node not in self.nodes["op_nodes"]:
             logger.error(f"Attempted to append to node not in tree: {node}")
@@ -218,7 +239,7 @@ class Tree:
             raise ValueError("Cannot append node of the same type")
 
         subtree_nodes = new_node.get_nodes()
-        logger.debug(f"Adding {len(subtree_nodes)} nodes from subtree")
+        logger.debug("Adding {} nodes from subtree", len(subtree_nodes))
 
         for subtree_node in subtree_nodes:
             if isinstance(subtree_node, ValueNode):
@@ -226,7 +247,7 @@ class Tree:
             else:
                 self.nodes["op_nodes"].append(subtree_node)
 
-        node.add_child(new_node)
+        node.add_child(new_node, rng=rng)
         logger.debug("Append complete, clearing cached evaluations")
         self._clean_evals()
 
@@ -270,7 +291,7 @@ class Tree:
         self._clean_evals()
         return self
 
-    def get_random_node(self, nodes_type: str | None = None, allow_root=True, allow_leaves=True):
+    def get_random_node(self, nodes_type: str | None = None, allow_root=True, allow_leaves=True, rng: np.random.Generator | None = None):
         """
         Get a random node from the tree based on specified constraints.
 
@@ -279,6 +300,7 @@ class Tree:
                        If None, a random type will be chosen
             allow_root: Whether to allow selecting the root node
             allow_leaves: Whether to allow selecting leaf nodes
+            rng: Random generator to use, defaults to the global NumPy random state
 
         Returns:
             A randomly selected node that satisfies the constraints
@@ -301,7 +323,8 @@ class Tree:
                 nodes_type,
             ]
         else:
-            nodes_types = list(np.random.permutation(["op_nodes", "value_nodes"]))
+            random_source = resolve_rng(rng)
+            nodes_types = list(random_source.permutation(["op_nodes", "value_nodes"]))
 
         for nodes_type in nodes_types:
             assert nodes_type is not None, "Nodes type cannot be None"
@@ -354,29 +377,50 @@ class Tree:
         logger.debug("Tree architecture loaded successfully")
         return tree
 
-    def _load_tensors_from_path(self, preds_directory):
+    def _load_tensors_from_path(self, preds_directory, mmap_mode=None, loaded=None):
         current_tensors = {}
-        preds_directory = Path(preds_directory)
+        loaded = {} if loaded is None else loaded
+        store = preds_directory if isinstance(preds_directory, PackedStore) else None
+        if store is None:
+            preds_directory = Path(preds_directory)
+            # a packed store is only opened if some tensors are not loaded yet
+            missing = any(value_node.id not in loaded for value_node in self.nodes["value_nodes"])
+            store = PackedStore(preds_directory) if missing and is_packed_store(preds_directory) else None
         for value_node in self.nodes["value_nodes"]:
             node_id = value_node.id
-            if node_id not in current_tensors:
+            if node_id not in current_tensors and node_id not in loaded:
                 logger.debug(f"Loading tensor for node ID: {node_id}")
-                current_tensors[node_id] = B.load(preds_directory / str(node_id), DEVICE)
+                if store is not None:
+                    current_tensors[node_id] = store[node_id]
+                else:
+                    current_tensors[node_id] = B.load(preds_directory / str(node_id), DEVICE, mmap_mode=mmap_mode)
             else:
                 logger.trace(f"Using pre-loaded tensor for node ID: {node_id}")
         return current_tensors
 
-    def _load_tensors_to_tree(self, preds_directory, current_tensors):
+    def _load_tensors_to_tree(self, preds_directory, current_tensors, mmap_mode=None):
         if preds_directory is not None:
-            preds_directory = Path(preds_directory)
-            loaded_tensors = self._load_tensors_from_path(preds_directory)
+            loaded_tensors = self._load_tensors_from_path(preds_directory, mmap_mode=mmap_mode, loaded=current_tensors)
             current_tensors.update(loaded_tensors)
         for value_node in self.nodes["value_nodes"]:
             node_id = value_node.id
             value_node.value = current_tensors[node_id]
         return current_tensors
 
-    def do_pred_on_another_tensors(self, preds_directory=None, current_tensors=None, return_tree=False):
+    def do_pred_on_another_tensors(self, preds_directory=None, current_tensors=None, return_tree=False, mmap_mode=None):
+        """
+        Evaluate a copy of the tree on different predictions of the same models.
+
+        Args:
+            preds_directory: Directory containing the tensor files, or a packed store written by `giraffe.store.pack`,
+                either as a path or as an open `giraffe.store.PackedStore` shared between trees
+            current_tensors: Mapping from model ids to tensors, e.g. a `LazyTensorProvider` shared between trees
+            return_tree: If True, the evaluated copy of the tree is returned as well
+            mmap_mode: If set, tensor files are memory-mapped instead of read into memory (see `numpy.load`)
+
+        Returns:
+            Evaluation of the tree, or a tuple of the evaluation and the evaluated copy if return_tree is True
+        """
         assert not all(
             [current_tensors is not None, preds_directory is not None]
         ), "Either preds directory or current tensors needs to be set, not both"
@@ -384,17 +428,18 @@ class Tree:
             [current_tensors is not None, preds_directory is not None]
         ), "Either preds directory or current tensors needs to be set, none was set"
 
-        current_tensors = {}
+        if current_tensors is None:
+            current_tensors = {}
         copy_tree = self.copy()
         copy_tree._clean_values_and_evals()
-        current_tensors = copy_tree._load_tensors_to_tree(preds_directory, current_tensors)
+        copy_tree._load_tensors_to_tree(preds_directory, current_tensors, mmap_mode=mmap_mode)
         if return_tree:
             return copy_tree.evaluation, copy_tree
 
         return copy_tree.evaluation
 
     @staticmethod
-    def load_tree(architecture_path, preds_directory, tensors={}) -> Tuple["Tree", dict]:
+    def load_tree(architecture_path, preds_directory=None, tensors={}, mmap_mode=None) -> Tuple["Tree", Mapping]:
         """
         Load a complete tree with tensor values from files.
 
@@ -403,22 +448,34 @@ class Tree:
 
         Args:
             architecture_path: Path to the saved tree architecture file
-            preds_directory: Directory containing the tensor files
-            tensors: Optional dictionary of pre-loaded tensors
+            preds_directory: Directory containing the tensor files, or a packed store written by `giraffe.store.pack`,
+                either as a path or as an open `giraffe.store.PackedStore` shared between trees
+            tensors: Optional dictionary of pre-loaded tensors, or a `LazyTensorProvider` that loads only the tensors
+                the tree uses. A provider is used directly instead of being copied, so it can be shared by many trees,
+                and preds_directory must then be None.
+            mmap_mode: If set, tensor files are memory-mapped instead of read into memory (see `numpy.load`),
+                so that only the pages touched during evaluation are read from disk
 
         Returns:
             A tuple containing:
             - The loaded Tree object with tensor values
-            - A dictionary of all tensors used in the tree
+            - A dictionary of all tensors used in the tree, or the provider if one was passed
         """
+        loaded = Tree.load_tree_architecture(architecture_path)
+        if isinstance(tensors, LazyTensorProvider):
+            if preds_directory is not None:
+                raise ValueError("preds_directory cannot be set when tensors is a LazyTensorProvider")
+            logger.info(f"Loading complete tree from {architecture_path} with tensors from {tensors.source}")
+            loaded._load_tensors_to_tree(None, tensors)
+            return loaded, tensors
+
         logger.info(f"Loading complete tree from {architecture_path} with tensors from {preds_directory}")
         logger.debug(f"Starting with {len(tensors)} pre-loaded tensors")
 
         current_tensors = {}
         current_tensors.update(tensors)  # tensors argument is mutable and we do not want to modify it
 
-        loaded = Tree.load_tree_architecture(architecture_path)
-        current_tensors = loaded._load_tensors_to_tree(preds_directory, current_tensors)
+        current_tensors = loaded._load_tensors_to_tree(preds_directory, current_tensors, mmap_mode=mmap_mode)
 
         logger.info(
             f"Tree loaded successfully with {len(loaded.nodes['value_nodes'])} value nodes and {len(loaded.nodes['op_nodes'])} operator nodes"
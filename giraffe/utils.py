@@ -1,6 +1,8 @@
 import os
 import pickle
+from typing import Any, Protocol, Union
 
+import numpy as np
 from loguru import logger
 
 
@@ -105,3 +107,34 @@ def mark_paths(list_of_paths) -> tuple[list[str | None], bool]:
             marked_paths.append(None)
     all_same = all(item == marked_paths[0] for item in marked_paths)
     return marked_paths, all_same
+
+
+class RandomSource(Protocol):
+    """
+    Random methods available both on `numpy.random.Generator` and on the `numpy.random` module.
+    """
+
+    def uniform(self, low: Any = 0.0, high: Any = 1.0, size: Any = None) -> Any: ...
+
+    def choice(self, a: Any, size: Any = None, replace: bool = True, p: Any = None) -> Any: ...
+
+    def shuffle(self, x: Any) -> None: ...
+
+    def permutation(self, x: Any) -> Any: ...
+
+
+def resolve_rng(rng: Union[np.random.Generator, None] = None) -> RandomSource:
+    """
+    Return the random generator to use in functions that accept an optional generator.
+
+    If no generator is given, the global NumPy random state (the `numpy.random` module) is returned,
+    which keeps the previous behaviour for code that does not pass a generator, including seeding with
+    `numpy.random.seed`. The result therefore only provides the methods of `RandomSource`.
+
+    Args:
+        rng: Optional random generator
+
+    Returns:
+        The given generator, or the `numpy.random` module
+    """
+    return np.random if rng is None else rng
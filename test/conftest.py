@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from giraffe.giraffe import Giraffe
+
+
+@pytest.fixture
+def predictions_directory(tmp_path):
+    rng = np.random.default_rng(0)
+    n_samples, n_models = 200, 8
+
+    gt = rng.integers(0, 2, n_samples)
+    preds_dir = tmp_path / "preds"
+    preds_dir.mkdir()
+    for i in range(n_models):
+        noise = rng.normal(0, 0.5 + 0.1 * i, n_samples)
+        preds = 1 / (1 + np.exp(-(2 * gt - 1 + noise)))
+        np.save(preds_dir / f"model_{i}.npy", preds)
+
+    gt_path = tmp_path / "gt.npy"
+    np.save(gt_path, gt)
+    return preds_dir, gt_path
+
+
+@pytest.fixture
+def create_giraffe(predictions_directory):
+    """
+    Factory of small Giraffe instances trained on `predictions_directory`, keyword arguments override the defaults.
+    """
+
+    def create(**kwargs):
+        preds_dir, gt_path = predictions_directory
+        params = dict(population_size=6, population_multiplier=1, tournament_size=2)
+        params.update(kwargs)
+        return Giraffe(preds_dir, [gt_path], **params)
+
+    return create
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+from sklearn.metrics import accuracy_score, average_precision_score, roc_auc_score
+
+from giraffe.accumulators import AccuracyAccumulator, AUROCAccumulator, AveragePrecisionAccumulator, streaming_fitness
+from giraffe.node import MeanNode, ValueNode
+from giraffe.tree import Tree
+
+
+@pytest.fixture
+def binary_data():
+    rng = np.random.default_rng(0)
+    gt = rng.integers(0, 2, 3000)
+    scores = np.clip(0.3 * gt + 0.7 * rng.random(3000), 0, 1)
+    return scores, gt
+
+
+def chunked_update(accumulator, pred, gt, chunk_size=700):
+    for start in range(0, len(gt), chunk_size):
+        accumulator.update(pred[start : start + chunk_size], gt[start : start + chunk_size])
+    return accumulator
+
+
+@pytest.mark.parametrize("accumulator_type, metric", [(AUROCAccumulator, roc_auc_score), (AveragePrecisionAccumulator, average_precision_score)])
+def test_exact_for_quantized_scores(binary_data, accumulator_type, metric):
+    scores, gt = binary_data
+    quantized = np.round(scores * 255) / 255
+
+    accumulator = chunked_update(accumulator_type(n_bins=256), quantized, gt)
+
+    np.testing.assert_allclose(accumulator.compute(), metric(gt, quantized))
+
+
+@pytest.mark.parametrize("accumulator_type, metric", [(AUROCAccumulator, roc_auc_score), (AveragePrecisionAccumulator, average_precision_score)])
+def test_error_bound_for_continuous_scores(binary_data, accumulator_type, metric):
+    scores, gt = binary_data
+
+    value, bound = chunked_update(accumulator_type(n_bins=32), scores, gt).compute_with_bound()
+
+    assert bound > 0
+    assert abs(value - metric(gt, scores)) <= bound
+
+
+def test_merge_matches_single_pass(binary_data):
+    scores, gt = binary_data
+    shards = [AveragePrecisionAccumulator(n_bins=128).update(scores[i::3], gt[i::3]) for i in range(3)]
+    merged = shards[0].merge(shards[1]).merge(shards[2])
+
+    single = AveragePrecisionAccumulator(n_bins=128).update(scores, gt)
+
+    np.testing.assert_array_equal(merged.counts, single.counts)
+    assert merged.compute() == single.compute()
+    with pytest.raises(ValueError):
+        merged.merge(AveragePrecisionAccumulator(n_bins=64))
+
+
+def test_multiclass_macro_auroc():
+    rng = np.random.default_rng(1)
+    gt = rng.integers(0, 3, 2000)
+    scores = rng.random((2000, 3))
+    scores[np.arange(2000), gt] += 0.3
+    scores = np.round(np.clip(scores, 0, 1) * 100) / 100
+
+    accumulator = chunked_update(AUROCAccumulator(n_bins=101, task="multiclass"), scores, gt)
+
+    expected = np.mean([roc_auc_score(gt == c, scores[:, c]) for c in range(3)])
+    np.testing.assert_allclose(accumulator.compute(), expected)
+
+
+def test_accuracy(binary_data):
+    scores, gt = binary_data
+    accumulator = chunked_update(AccuracyAccumulator(), scores, gt)
+    assert accumulator.compute() == accuracy_score(gt, scores >= 0.5)
+
+    multiclass_gt = np.array([0, 1, 2, 1])
+    multiclass_pred = np.array([[0.8, 0.1, 0.1], [0.2, 0.7, 0.1], [0.5, 0.3, 0.2], [0.1, 0.8, 0.1]])
+    assert AccuracyAccumulator(task="multiclass").update(multiclass_pred, multiclass_gt).compute() == 0.75
+
+
+def test_streaming_fitness(binary_data):
+    scores, gt = binary_data
+    # multiples of 1 / 256 and their means are exact in floating point, so ties are not broken by rounding
+    quantized_a = np.floor(scores * 255) / 256
+    quantized_b = np.floor(scores[::-1] * 255) / 256
+    root = ValueNode(None, quantized_a, "a")
+    mean = MeanNode(None)
+    root.add_child(mean)
+    mean.add_child(ValueNode(None, quantized_b, "b"))
+    tree = Tree.create_tree_from_root(root)
+
+    fitness = streaming_fitness(lambda: AUROCAccumulator(n_bins=512), chunk_size=500)
+
+    np.testing.assert_allclose(fitness(tree, gt), roc_auc_score(gt, tree.evaluation))
+
+
+@pytest.mark.parametrize("accumulator_type", [AUROCAccumulator, AveragePrecisionAccumulator, AccuracyAccumulator])
+def test_sample_weight_matches_repeated_samples(binary_data, accumulator_type):
+    scores, gt = binary_data
+    weights = np.random.default_rng(2).integers(1, 4, len(gt))
+
+    weighted = accumulator_type().update(scores, gt, sample_weight=weights)
+    repeated = accumulator_type().update(np.repeat(scores, weights), np.repeat(gt, weights))
+
+    assert weighted.compute() == pytest.approx(repeated.compute())
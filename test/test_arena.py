@@ -0,0 +1,131 @@
+import threading
+
+import numpy as np
+import pytest
+import torch
+
+from giraffe.arena import ArenaPool, BufferArena, live_buffers
+from giraffe.backend.backend import Backend
+from giraffe.functions import scale_vector_to_sum_1
+from giraffe.globals import BACKEND as B
+from giraffe.globals import postprocessing_function as PF
+from giraffe.globals import set_postprocessing_function
+from giraffe.node import MaxNode, MeanNode, ValueNode, WeightedMeanNode
+from giraffe.tree import Tree
+
+
+def build_tree(values):
+    r"""
+    Builds a tree with the following structure:
+           A
+          / \
+       WMN   MAX
+       / \     \
+      B   C     D
+          |
+         MEAN
+          |
+          E
+    """
+    a, b, c, d, e = (ValueNode(None, value, name) for name, value in zip("ABCDE", values, strict=True))
+    a.add_child(WeightedMeanNode([b, c], [0.2, 0.3, 0.5]))
+    maximum = MaxNode(None)
+    a.add_child(maximum)
+    maximum.add_child(d)
+    c.add_child(MeanNode([e]))
+    return Tree.create_tree_from_root(a)
+
+
+@pytest.fixture
+def values():
+    rng = np.random.default_rng(0)
+    return [rng.random((50, 3)) for _ in range(5)]
+
+
+def test_arena_evaluation_matches_tree_evaluation(values):
+    tree = build_tree(values)
+    arena = BufferArena()
+
+    with arena.evaluate(tree) as evaluation:
+        np.testing.assert_allclose(evaluation, build_tree(values).evaluation)
+        assert tree.evaluation is evaluation
+        assert all(node.evaluation is None for node in tree.nodes["value_nodes"][1:])
+    assert tree.root.evaluation is None
+
+
+def test_warm_arena_does_not_allocate(values):
+    tree = build_tree(values)
+    arena = BufferArena()
+
+    with arena.evaluate(tree):
+        pass
+    assert arena.allocations == live_buffers(tree.root) == 3  # including the scratch buffer of the weighted mean
+    with arena.evaluate(build_tree(values)):
+        pass
+    assert arena.allocations == 3
+    assert arena.nbytes == 3 * values[0].nbytes
+
+
+def test_buffers_are_reused_when_postprocessing_returns_new_tensor(values):
+    previous = PF.function
+    set_postprocessing_function(scale_vector_to_sum_1)
+    try:
+        arena = BufferArena()
+        for _ in range(3):
+            with arena.evaluate(build_tree(values)) as evaluation:
+                np.testing.assert_allclose(evaluation, build_tree(values).evaluation)
+        assert arena.allocations == live_buffers(build_tree(values).root)
+    finally:
+        set_postprocessing_function(previous)
+
+
+def test_leaf_tree_is_not_copied(values):
+    tree = Tree.create_tree_from_root(ValueNode(None, values[0], "A"))
+    with BufferArena().evaluate(tree) as evaluation:
+        assert evaluation is values[0]
+
+
+def test_postprocessing_result_is_not_reused(values):
+    previous = PF.function
+    set_postprocessing_function(lambda x: x[:, ::-1])
+    try:
+        arena = BufferArena()
+        with arena.evaluate(build_tree(values)) as evaluation:
+            expected = build_tree(values).evaluation
+            np.testing.assert_allclose(evaluation, expected)
+            with arena.evaluate(build_tree(values[::-1])):
+                np.testing.assert_allclose(evaluation, expected)
+    finally:
+        set_postprocessing_function(previous)
+
+
+def test_arena_pytorch(values):
+    Backend.set_backend("pytorch")
+    try:
+        tensors = [torch.tensor(value) for value in values]
+        with BufferArena().evaluate(build_tree(tensors)) as evaluation:
+            assert isinstance(evaluation, torch.Tensor)
+            np.testing.assert_allclose(B.to_numpy(evaluation), B.to_numpy(build_tree(tensors).evaluation))
+    finally:
+        Backend.set_backend("numpy")
+
+
+def test_arena_pool_reuses_arenas_across_threads(values):
+    pool = ArenaPool()
+    tree = build_tree(values)
+
+    def evaluate():
+        with pool.borrow() as arena, arena.evaluate(tree):
+            pass
+
+    for _ in range(3):  # a new thread for every batch, as with a new executor per generation
+        thread = threading.Thread(target=evaluate)
+        thread.start()
+        thread.join()
+    assert pool.allocations == live_buffers(tree.root)
+
+    with pool.borrow() as first, pool.borrow() as second:
+        assert first is not second
+    assert pool.nbytes > 0
+    pool.clear()
+    assert pool.nbytes == 0
@@ -1,6 +1,7 @@
 import numpy as np
 import pytest
 
+from giraffe.backend import numpy_backend
 from giraffe.backend.numpy_backend import NumpyBackend
 from giraffe.backend.pytorch import PyTorchBackend
 
@@ -146,3 +147,171 @@ def test_unsqueeze(array, axis, expected_shape):
         tensor = B.tensor(array)
         result = B.to_numpy(B.unsqueeze(tensor, axis))
         np.testing.assert_array_equal(result.shape, expected_shape)
+
+
+def test_load_mmap(tmp_path):
+    array = np.arange(12, dtype=np.float32).reshape(3, 4)
+
+    np.save(tmp_path / "array.npy", array)
+    loaded = NumpyBackend.load(tmp_path / "array.npy", mmap_mode="r")
+    assert isinstance(loaded, np.memmap)
+    np.testing.assert_array_equal(loaded, array)
+    assert not isinstance(NumpyBackend.load(tmp_path / "array.npy"), np.memmap)
+
+    import torch
+
+    torch.save(torch.tensor(array), tmp_path / "array.pt")
+    loaded = PyTorchBackend.load(tmp_path / "array.pt", mmap_mode="r")
+    np.testing.assert_array_equal(PyTorchBackend.to_numpy(loaded), array)
+
+
+def test_interop_shares_memory():
+    import torch
+
+    from giraffe.backend.interop import as_numpy, as_torch, bytes_copied, reset_bytes_copied
+
+    reset_bytes_copied()
+    array = np.arange(12, dtype=np.float32).reshape(3, 4)
+    tensor = as_torch(array)
+    assert np.shares_memory(as_numpy(tensor), array)
+    assert as_torch(tensor) is tensor
+
+    read_only = array[:, ::2]
+    read_only.flags.writeable = False
+    assert np.shares_memory(as_torch(read_only).numpy(), array)
+    assert bytes_copied() == 0
+
+    as_torch(array[::-1])
+    assert bytes_copied() == array.nbytes
+    as_numpy(torch.zeros(4, dtype=torch.float64), dtype=np.float32)
+    assert bytes_copied() == array.nbytes + 16
+
+
+def test_fitness_evaluation_is_copy_free():
+    from giraffe.backend.interop import bytes_copied, reset_bytes_copied
+    from giraffe.fitness import average_precision_fitness, roc_auc_score_fitness
+    from giraffe.fitness_context import FitnessContext
+    from giraffe.node import ValueNode
+    from giraffe.tree import Tree
+
+    rng = np.random.default_rng(0)
+    gt = rng.integers(0, 2, 100)
+    tree = Tree.create_tree_from_root(ValueNode(None, rng.random(100).astype(np.float32), "model"))
+    context = FitnessContext.build(gt)
+
+    reset_bytes_copied()
+    for function in (average_precision_fitness, roc_auc_score_fitness):
+        function(tree, gt)
+        function(tree, context)
+    assert bytes_copied() == 0
+
+
+def test_ops_table_follows_backend_switch():
+    import torch
+
+    from giraffe.backend.backend import Backend
+    from giraffe.globals import BACKEND
+
+    assert "concat" in vars(BACKEND)
+    try:
+        Backend.set_backend("pytorch")
+        assert BACKEND.concat is PyTorchBackend.concat
+        assert isinstance(BACKEND.tensor([1.0]), torch.Tensor)
+    finally:
+        Backend.set_backend("numpy")
+    assert BACKEND.concat is NumpyBackend.concat
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("reduction", ["mean", "max", "min"])
+def test_stack_reduce(backend, reduction):
+    rng = np.random.default_rng(0)
+    tensors = [backend.tensor(rng.random((10, 3)).astype(np.float32)) for _ in range(4)]
+    expected = getattr(backend, reduction)(backend.concat([backend.unsqueeze(t, 0) for t in tensors]), axis=0)
+
+    result = backend.stack_reduce(tensors, reduction)
+    np.testing.assert_allclose(backend.to_numpy(result), backend.to_numpy(expected), rtol=1e-6)
+
+    out = backend.empty((10, 3), like=expected)
+    assert backend.stack_reduce(tensors, reduction, out=out) is out
+    np.testing.assert_allclose(backend.to_numpy(out), backend.to_numpy(expected), rtol=1e-6)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_weighted_sum(backend):
+    rng = np.random.default_rng(0)
+    arrays = rng.random((3, 10, 2)).astype(np.float32)
+    weights = [0.2, 0.3, 0.5]
+    expected = np.tensordot(np.array(weights), arrays, axes=1)
+
+    tensors = [backend.tensor(array) for array in arrays]
+    np.testing.assert_allclose(backend.to_numpy(backend.weighted_sum(tensors, weights)), expected, rtol=1e-6)
+    stacked = backend.tensor(arrays)
+    np.testing.assert_allclose(backend.to_numpy(backend.weighted_sum(stacked, weights)), expected, rtol=1e-6)
+
+    assert backend.to_numpy(backend.weighted_sum(tensors, weights)).dtype == np.float32  # not promoted by the weights
+    assert backend.to_numpy(backend.weighted_sum(stacked, weights)).dtype == np.float32
+
+    out = backend.empty((10, 2), like=backend.weighted_sum(tensors, weights))
+    assert backend.weighted_sum(tensors, weights, out=out) is out
+    np.testing.assert_allclose(backend.to_numpy(out), expected, rtol=1e-6)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_weighted_sum_scratch(backend, monkeypatch):
+    monkeypatch.setattr(numpy_backend, "_BLOCK_ELEMENTS", 8)  # several blocks of 4 rows and a shorter last one
+    rng = np.random.default_rng(0)
+    arrays = rng.random((3, 10, 2)).astype(np.float32)
+    weights = [0.2, 0.3, 0.5]
+    expected = np.tensordot(np.array(weights), arrays, axes=1)
+    tensors = [backend.tensor(array) for array in arrays]
+    np.testing.assert_allclose(backend.to_numpy(backend.weighted_sum(tensors, weights)), expected, rtol=1e-6)
+
+    out = backend.empty((10, 2), like=tensors[0])
+    scratch = backend.empty((10, 2), like=tensors[0])
+    assert backend.weighted_sum(tensors, weights, out=out, scratch=scratch) is out
+    np.testing.assert_allclose(backend.to_numpy(out), expected, rtol=1e-6)
+
+
+def test_half_precision_accumulates_in_float32():
+    import torch
+
+    tensors = [np.full(4, 0.1, dtype=np.float16) for _ in range(2048)]
+    expected = float(np.float16(0.1))
+
+    mean = NumpyBackend.stack_reduce(tensors, "mean")
+    assert mean.dtype == np.float16
+    np.testing.assert_allclose(mean, expected, rtol=1e-3)
+    weighted = NumpyBackend.weighted_sum(tensors, [1 / 2048] * 2048)
+    assert weighted.dtype == np.float16
+    np.testing.assert_allclose(weighted, expected, rtol=1e-3)
+    out = np.empty(4, dtype=np.float16)
+    assert NumpyBackend.weighted_sum(np.stack(tensors), [1 / 2048] * 2048, out=out) is out
+    np.testing.assert_allclose(out, expected, rtol=1e-3)
+
+    bf16 = [torch.full((4,), 0.1, dtype=torch.bfloat16) for _ in range(2048)]
+    assert PyTorchBackend.stack_reduce(bf16, "mean").dtype == torch.bfloat16
+    np.testing.assert_allclose(PyTorchBackend.stack_reduce(bf16, "mean").float().numpy(), float(bf16[0][0]), rtol=1e-2)
+    assert PyTorchBackend.mean(torch.stack(bf16), axis=0).dtype == torch.bfloat16
+    assert PyTorchBackend.weighted_sum(bf16, [1 / 2048] * 2048).dtype == torch.bfloat16
+    assert PyTorchBackend.astype(torch.zeros(2), "bfloat16").dtype == torch.bfloat16
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_quantized_reduce_stays_uint8(backend):
+    arrays = np.array([[0, 255, 10, 3], [0, 255, 11, 4], [1, 254, 11, 4]], dtype=np.uint8)
+    tensors = [backend.tensor(array) for array in arrays]
+
+    for reduction in ("max", "min"):
+        result = backend.to_numpy(backend.stack_reduce(tensors, reduction))
+        np.testing.assert_array_equal(result, getattr(np, reduction)(arrays, axis=0))
+    mean = backend.to_numpy(backend.stack_reduce(tensors, "mean"))
+    assert mean.dtype == np.uint8
+    np.testing.assert_array_equal(mean, np.rint(arrays.mean(axis=0)))  # no overflow of the uint8 sum
+
+    weighted = backend.to_numpy(backend.weighted_sum(tensors, [0.5, 0.25, 0.25]))
+    assert weighted.dtype == np.uint8
+    np.testing.assert_array_equal(weighted, np.rint(np.tensordot([0.5, 0.25, 0.25], arrays.astype(float), axes=1)))
+    out = backend.empty((4,), like=tensors[0])
+    assert backend.stack_reduce(tensors, "mean", out=out) is out
+    np.testing.assert_array_equal(backend.to_numpy(out), mean)
@@ -0,0 +1,41 @@
+import time
+
+import pytest
+
+from giraffe.budget import Budget, BudgetExhausted
+
+
+def test_unlimited_budget():
+    budget = Budget()
+    for _ in range(100):
+        budget.reserve()
+    assert budget.evaluations == 100
+    assert budget.exhausted_reason() is None
+
+
+def test_max_evaluations():
+    budget = Budget(max_evaluations=3)
+    for _ in range(3):
+        budget.reserve()
+
+    with pytest.raises(BudgetExhausted) as e:
+        budget.reserve()
+    assert e.value.reason == "max_evaluations"
+    assert budget.evaluations == 3
+
+
+def test_max_seconds():
+    budget = Budget(max_seconds=0.01)
+    budget.check()
+    time.sleep(0.02)
+
+    with pytest.raises(BudgetExhausted) as e:
+        budget.check()
+    assert e.value.reason == "max_seconds"
+
+
+def test_record():
+    budget = Budget(max_evaluations=3)
+    budget.record(5)
+    assert budget.evaluations == 5
+    assert budget.exhausted_reason() == "max_evaluations"
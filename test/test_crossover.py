@@ -158,11 +158,11 @@ def test_crossover_with_operator_nodes(medium_tree, another_medium_tree, monkeyp
     # Mock the get_random_node to ensure we're only swapping value nodes to avoid type issues
     original_get_random_node = Tree.get_random_node
 
-    def mock_get_random_node(self, nodes_type):
+    def mock_get_random_node(self, nodes_type, **kwargs):
         if nodes_type == "op_nodes":
             # Select value nodes instead to avoid type mismatch issues
-            return original_get_random_node(self, "value_nodes")
-        return original_get_random_node(self, nodes_type)
+            return original_get_random_node(self, "value_nodes", **kwargs)
+        return original_get_random_node(self, nodes_type, **kwargs)
 
     monkeypatch.setattr(Tree, "get_random_node", mock_get_random_node)
 
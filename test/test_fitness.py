@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from giraffe.fitness import (
+    average_precision_fitness,
+    quantized_average_precision_binary,
+    quantized_average_precision_with_bound,
+    quantized_roc_auc_fitness,
+    quantized_roc_auc_with_bound,
+    roc_auc_score_fitness,
+)
+from giraffe.node import ValueNode
+from giraffe.tree import Tree
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    gt = rng.integers(0, 2, 2000)
+    scores = np.clip(0.3 * gt + 0.7 * rng.random(2000), 0, 1).astype(np.float32)
+    return scores, gt
+
+
+def tree_of(scores):
+    return Tree.create_tree_from_root(ValueNode(None, scores, "model"))
+
+
+@pytest.mark.parametrize(
+    "quantized, exact",
+    [(quantized_average_precision_with_bound, average_precision_fitness), (quantized_roc_auc_with_bound, roc_auc_score_fitness)],
+)
+def test_quantized_metrics_within_bound(data, quantized, exact):
+    scores, gt = data
+    value, bound = quantized(tree_of(scores), gt, bits=6)
+    assert abs(value - exact(tree_of(scores), gt)) <= bound + 1e-6
+
+
+@pytest.mark.parametrize(
+    "quantized, exact",
+    [(quantized_average_precision_binary, average_precision_fitness), (quantized_roc_auc_fitness, roc_auc_score_fitness)],
+)
+def test_quantized_metrics_exact_for_low_precision_scores(data, quantized, exact):
+    scores, gt = data
+    low_precision = np.floor(scores * 255) / 256
+    assert quantized(tree_of(low_precision), gt, bits=8) == pytest.approx(exact(tree_of(low_precision), gt), abs=1e-6)
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+import giraffe.fitness as fitness
+from giraffe.fitness_context import FitnessContext, fitness_context_for, fitness_task
+from giraffe.metrics import MultiMetricFitness
+from giraffe.node import ValueNode
+from giraffe.tree import Tree
+
+
+def tree_of(pred):
+    return Tree.create_tree_from_root(ValueNode(None, pred, "model"))
+
+
+@pytest.fixture
+def binary_data():
+    rng = np.random.default_rng(0)
+    gt = rng.integers(0, 2, 300)
+    return np.clip(0.3 * gt + 0.7 * rng.random(300), 0, 1).astype(np.float32), gt
+
+
+@pytest.fixture
+def multiclass_data():
+    rng = np.random.default_rng(0)
+    gt = rng.integers(0, 3, 300)
+    pred = rng.random((300, 3)).astype(np.float32) + np.eye(3, dtype=np.float32)[gt]
+    return pred / pred.sum(axis=1, keepdims=True), gt
+
+
+def test_build_multiclass(multiclass_data):
+    _, gt = multiclass_data
+    context = FitnessContext.build(gt, "multiclass")
+
+    assert context.num_classes == 3
+    assert context.one_hot.shape == (300, 3)
+    np.testing.assert_array_equal(context.class_counts, np.bincount(gt))
+    np.testing.assert_array_equal(context.labels.numpy(), gt)
+    assert context.labels is context.labels  # converted once
+    with pytest.raises(ValueError):
+        context.one_hot[0, 0] = True
+    with pytest.raises(AttributeError):
+        context.num_classes = 2
+    with pytest.raises(AttributeError):
+        del context.gt
+
+
+def test_build_binary_and_multilabel():
+    assert FitnessContext.build(np.array([[0], [1], [1]]), "binary").num_classes == 1
+    multilabel = FitnessContext.build(np.array([[0, 1], [1, 1]]), "multilabel")
+    assert multilabel.num_classes == 2
+    np.testing.assert_array_equal(multilabel.class_counts, [1, 2])
+    with pytest.raises(ValueError):
+        FitnessContext.build(np.array([0, 1]), "regression")
+
+
+def test_fitness_task():
+    assert fitness_task(fitness.average_precision_fitness) == "binary"
+    assert fitness_task(fitness.roc_auc_multiclass) == "multiclass"
+    assert fitness_task(MultiMetricFitness(task="multiclass")) == "multiclass"
+
+
+def test_fitness_context_for_undecorated_function(binary_data):
+    _, gt = binary_data
+    assert fitness_context_for(lambda tree, gt: 0.0, gt) is None
+    context = fitness_context_for(fitness.accuracy_multiclass, gt)
+    assert context is not None and context.task == "multiclass"
+
+
+@pytest.mark.parametrize(
+    "function",
+    [
+        fitness.average_precision_binary,
+        fitness.roc_auc_binary,
+        fitness.accuracy_binary,
+        fitness.quantized_average_precision_binary,
+        fitness.quantized_roc_auc_binary,
+        fitness.weighted_average_precision_binary,
+        fitness.weighted_accuracy_binary,
+    ],
+)
+def test_binary_functions_match_plain_labels(binary_data, function):
+    pred, gt = binary_data
+    context = fitness_context_for(function, gt)
+    assert function(tree_of(pred), context) == pytest.approx(function(tree_of(pred), gt))
+
+
+@pytest.mark.parametrize(
+    "function",
+    [
+        fitness.average_precision_multiclass,
+        fitness.roc_auc_multiclass,
+        fitness.accuracy_multiclass,
+        fitness.quantized_roc_auc_multiclass,
+        fitness.weighted_average_precision_multiclass,
+        fitness.weighted_roc_auc_multiclass,
+        MultiMetricFitness(task="multiclass"),
+    ],
+)
+def test_multiclass_functions_match_plain_labels(multiclass_data, function):
+    pred, gt = multiclass_data
+    context = fitness_context_for(function, gt)
+    assert function(tree_of(pred), context) == pytest.approx(function(tree_of(pred), gt))
+
+
+def test_task_mismatch(binary_data):
+    pred, gt = binary_data
+    with pytest.raises(ValueError):
+        fitness.average_precision_multiclass(tree_of(pred), FitnessContext.build(gt, "binary"))
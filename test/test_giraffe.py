@@ -0,0 +1,307 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import giraffe.giraffe as giraffe_module
+from giraffe.callback import Callback, FitnessNoChangeEarlyStoppingCallback
+from giraffe.crossover import crossover
+from giraffe.fitness import average_precision_fitness, quantized_average_precision_binary, weighted_average_precision_binary
+from giraffe.giraffe import Giraffe
+from giraffe.metrics import MultiMetricFitness
+from giraffe.node import ValueNode, WeightedMeanNode
+from giraffe.tree import Tree
+
+
+def test_train(create_giraffe):
+    giraffe = create_giraffe()
+    giraffe.train(3)
+
+    assert len(giraffe.population) == 6
+    assert giraffe.fitnesses is not None
+    assert giraffe.fitnesses.shape == (6,)
+
+
+def test_threaded_fitness_matches_serial(create_giraffe):
+    giraffe = create_giraffe()
+    giraffe.train(2)
+
+    serial = giraffe._calculate_fitnesses(giraffe.population)
+    giraffe.n_jobs = 4
+    threaded = giraffe._calculate_fitnesses(giraffe.population)
+
+    np.testing.assert_array_equal(serial, threaded)
+
+
+def test_mmap_mode(create_giraffe):
+    giraffe = create_giraffe(mmap_mode="r")
+    assert all(isinstance(model, np.memmap) for model in giraffe.models)
+
+    giraffe.train(2)
+    in_memory = create_giraffe()
+    in_memory.train(2)
+
+    np.testing.assert_array_equal(giraffe.fitnesses, in_memory.fitnesses)
+
+
+def test_load_sharded_predictions(predictions_directory, create_giraffe, tmp_path):
+    preds_dir, gt_path = predictions_directory
+    shard_dirs = [tmp_path / f"shard_{i}" for i in range(3)]
+    for shard_dir in shard_dirs:
+        shard_dir.mkdir()
+    for pred_path in preds_dir.glob("*"):
+        for shard_dir, shard in zip(shard_dirs, np.array_split(np.load(pred_path), 3), strict=True):
+            np.save(shard_dir / pred_path.name, shard)
+    gt_dir = tmp_path / "gt"
+    gt_dir.mkdir()
+    np.save(gt_dir / "gt.npy", np.load(gt_path))
+
+    sharded = Giraffe(shard_dirs, gt_dir, population_size=6, population_multiplier=1, tournament_size=2, load_jobs=4)
+    whole = create_giraffe()
+
+    assert sharded.train_tensors.keys() == whole.train_tensors.keys()
+    for tensor_id, tensor in whole.train_tensors.items():
+        np.testing.assert_array_equal(sharded.train_tensors[tensor_id], tensor)
+    np.testing.assert_array_equal(sharded.gt_tensor, whole.gt_tensor)
+
+
+def test_add_trees(create_giraffe):
+    giraffe = create_giraffe()
+    giraffe.train(2)
+    migrant = giraffe.population[0].copy()
+    migrant._clean_values_and_evals()
+    other = create_giraffe(seed=1)
+    other.train(1)
+
+    other.add_trees([migrant])
+
+    assert len(other.population) == 6
+    assert all(node.value is not None for tree in other.population for node in tree.nodes["value_nodes"])
+    np.testing.assert_array_equal(other.fitnesses, other._calculate_fitnesses(other.population))
+
+
+class CountingCallback(Callback):
+    def __init__(self):
+        super().__init__()
+        self.calls = {"on_evolution_start": 0, "on_generation_start": 0, "on_generation_end": 0, "on_evolution_end": 0}
+
+    def on_evolution_start(self, giraffe):
+        self.calls["on_evolution_start"] += 1
+
+    def on_generation_start(self, giraffe):
+        self.calls["on_generation_start"] += 1
+
+    def on_generation_end(self, giraffe):
+        self.calls["on_generation_end"] += 1
+
+    def on_evolution_end(self, giraffe):
+        self.calls["on_evolution_end"] += 1
+
+
+@pytest.mark.parametrize("n_workers", [1, 3])
+def test_train_steady_state(create_giraffe, n_workers):
+    callback = CountingCallback()
+    giraffe = create_giraffe(callbacks=[callback])
+
+    giraffe.train_steady_state(30, n_workers=n_workers, callback_interval=10)
+
+    assert len(giraffe.population) == 6
+    assert len(set(repr(tree) for tree in giraffe.population)) == 6
+    np.testing.assert_array_equal(giraffe.fitnesses, giraffe._calculate_fitnesses(giraffe.population))
+    assert callback.calls["on_evolution_start"] == callback.calls["on_evolution_end"] == 1
+    assert callback.calls["on_generation_end"] >= 3
+    assert callback.calls["on_generation_start"] >= callback.calls["on_generation_end"]
+
+
+def test_train_requires_limit(create_giraffe):
+    giraffe = create_giraffe()
+    with pytest.raises(ValueError):
+        giraffe.train()
+
+
+@pytest.mark.parametrize("n_jobs", [1, 3])
+def test_train_max_evaluations(create_giraffe, n_jobs):
+    callback = CountingCallback()
+    giraffe = create_giraffe(n_jobs=n_jobs, callbacks=[callback])
+
+    giraffe.train(iterations=100, max_evaluations=20)
+
+    assert giraffe.stop_reason == "max_evaluations"
+    assert giraffe.budget is not None and giraffe.budget.evaluations == 20
+    assert len(giraffe.population) == 6
+    assert giraffe.additional_population == []
+    np.testing.assert_array_equal(giraffe.fitnesses, giraffe._calculate_fitnesses(giraffe.population))
+    assert callback.calls["on_generation_start"] == callback.calls["on_generation_end"]
+
+
+def test_train_budget_smaller_than_population(create_giraffe):
+    callback = CountingCallback()
+    giraffe = create_giraffe(callbacks=[callback])
+
+    giraffe.train(iterations=5, max_evaluations=2)
+
+    assert giraffe.stop_reason == "max_evaluations"
+    assert giraffe.fitnesses is not None and giraffe.fitnesses.shape == (6,)  # the initial population is always scored
+    assert giraffe.budget is not None and giraffe.budget.evaluations == 6
+    assert callback.calls["on_generation_start"] == callback.calls["on_generation_end"] == 0
+    assert callback.calls["on_evolution_start"] == callback.calls["on_evolution_end"] == 1
+
+
+def test_train_max_seconds(create_giraffe):
+    giraffe = create_giraffe()
+
+    giraffe.train(max_seconds=0.5)
+
+    assert giraffe.stop_reason == "max_seconds"
+    assert giraffe.budget is not None and giraffe.budget.elapsed >= 0.5
+    np.testing.assert_array_equal(giraffe.fitnesses, giraffe._calculate_fitnesses(giraffe.population))
+
+
+def test_early_stopping_reason():
+    callback = FitnessNoChangeEarlyStoppingCallback(n_iterations=2)
+    giraffe = SimpleNamespace(fitnesses=np.array([0.5, 0.4]), should_stop=False, stop_reason=None)
+
+    for _ in range(3):
+        callback.on_generation_end(giraffe)  # type: ignore
+
+    assert giraffe.should_stop
+    assert giraffe.stop_reason == "fitness_no_change"
+
+
+def test_seed_reproducibility(create_giraffe):
+    giraffe_1 = create_giraffe(seed=3)
+    giraffe_1.train(3)
+    np.random.seed(123)  # global state does not affect the run
+    giraffe_2 = create_giraffe(seed=3)
+    giraffe_2.train(3)
+
+    assert [repr(tree) for tree in giraffe_1.population] == [repr(tree) for tree in giraffe_2.population]
+    np.testing.assert_array_equal(giraffe_1.fitnesses, giraffe_2.fitnesses)
+
+
+def test_steady_state_reproducibility(create_giraffe):
+    populations = []
+    for _ in range(2):
+        giraffe = create_giraffe(seed=5)
+        giraffe.train_steady_state(40, n_workers=3)
+        populations.append([repr(tree) for tree in giraffe.population])
+
+    assert populations[0] == populations[1]
+
+
+def test_chunked_evaluation(create_giraffe, monkeypatch):
+    full = create_giraffe(seed=0)
+    full.train(10)
+
+    offspring = []
+
+    def recording_crossover(*args, **kwargs):
+        trees = crossover(*args, **kwargs)
+        offspring.extend(trees)
+        return trees
+
+    monkeypatch.setattr(giraffe_module, "crossover", recording_crossover)
+    giraffe = create_giraffe(chunk_size=16, seed=0)
+    giraffe.train(10)
+
+    np.testing.assert_allclose(giraffe.fitnesses, full.fitnesses)
+    # offspring are evaluated in chunks too, so no intermediate evaluation is kept on their nodes
+    assert any(tree.root.children for tree in offspring)
+    assert all(node.evaluation is None for tree in offspring for node in tree.nodes["value_nodes"] if node is not tree.root)
+
+
+def test_quantized_fitness_function(create_giraffe):
+    giraffe = create_giraffe(fitness_function=quantized_average_precision_binary)
+    giraffe.train(2)
+
+    assert giraffe.fitnesses is not None
+    assert np.all((giraffe.fitnesses >= 0) & (giraffe.fitnesses <= 1))
+
+
+def test_deduplicate_samples(tmp_path):
+    rng = np.random.default_rng(0)
+    gt = rng.integers(0, 2, 500)
+    preds_dir = tmp_path / "preds"
+    preds_dir.mkdir()
+    for i in range(3):
+        np.save(preds_dir / f"model_{i}.npy", np.round(np.clip(0.3 * gt + 0.7 * rng.random(500), 0, 1), 1))
+    np.save(tmp_path / "gt.npy", gt)
+    params = dict(population_size=3, population_multiplier=1, tournament_size=1, fitness_function=weighted_average_precision_binary)
+
+    deduplicated = Giraffe(preds_dir, tmp_path / "gt.npy", deduplicate_samples=True, **params)
+    full = Giraffe(preds_dir, tmp_path / "gt.npy", **params)
+
+    assert deduplicated.sample_weights is not None
+    assert len(deduplicated.gt_tensor) < 500
+    assert deduplicated.sample_weights.sum() == 500
+    np.testing.assert_allclose(deduplicated._calculate_fitnesses(), full._calculate_fitnesses())
+    np.testing.assert_allclose(full._calculate_fitnesses(), [average_precision_fitness(tree, full.gt_tensor) for tree in full.population], atol=1e-6)
+
+    with pytest.raises(ValueError):
+        Giraffe(preds_dir, tmp_path / "gt.npy", population_size=3, population_multiplier=1, tournament_size=1, deduplicate_samples=True)
+
+
+def test_multi_metric_fitness_function(create_giraffe):
+    giraffe = create_giraffe(fitness_function=MultiMetricFitness("average_precision", secondary=("roc_auc",)))
+    giraffe.train(2)
+
+    assert giraffe.fitnesses is not None
+    for tree, fitness in zip(giraffe.population, giraffe.fitnesses, strict=True):
+        assert len(tree.objectives) == 1
+        assert fitness == pytest.approx(average_precision_fitness(tree, giraffe.gt_tensor), abs=1e-6)
+
+
+def test_fitness_context_built_once(create_giraffe, monkeypatch):
+    giraffe = create_giraffe()
+    assert giraffe.fitness_context is not None
+
+    def fail(*args, **kwargs):
+        raise AssertionError("labels should not be preprocessed per fitness call")
+
+    monkeypatch.setattr("giraffe.fitness._infer_num_classes", fail)
+    giraffe.train(2)
+
+
+@pytest.mark.parametrize("compute_dtype", ["float16", "float32"])
+def test_compute_dtype(create_giraffe, compute_dtype):
+    giraffe = create_giraffe(compute_dtype=compute_dtype)
+    full = create_giraffe()
+    dtype = np.dtype(compute_dtype)
+
+    assert all(tensor.dtype == dtype for tensor in giraffe.train_tensors.values())
+    np.testing.assert_allclose(giraffe._calculate_fitnesses(), full._calculate_fitnesses(), atol=1e-2)
+    giraffe.train(2)
+    assert all(tree.evaluation.dtype == dtype for tree in giraffe.population)
+
+    a, b, c = (ValueNode(None, tensor, tensor_id) for tensor_id, tensor in list(giraffe.train_tensors.items())[:3])
+    a.add_child(WeightedMeanNode([b, c], [0.2, 0.3, 0.5]))
+    assert Tree.create_tree_from_root(a).evaluation.dtype == dtype
+
+
+def test_quantized_compute_dtype(create_giraffe):
+    giraffe = create_giraffe(compute_dtype="uint8", fitness_function=quantized_average_precision_binary)
+    full = create_giraffe(fitness_function=quantized_average_precision_binary)
+
+    assert all(tensor.dtype == np.uint8 for tensor in giraffe.train_tensors.values())
+    np.testing.assert_allclose(giraffe._calculate_fitnesses(), full._calculate_fitnesses(), atol=1e-2)
+    giraffe.train(2)
+    assert all(tree.evaluation.dtype == np.uint8 for tree in giraffe.population)
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_reuse_buffers(create_giraffe, n_jobs):
+    giraffe = create_giraffe(reuse_buffers=True, n_jobs=n_jobs, seed=3)
+    full = create_giraffe(seed=3)
+    giraffe.train(3)
+    full.train(3)
+
+    np.testing.assert_allclose(giraffe.fitnesses, full.fitnesses)
+    assert all(tree.root.evaluation is None for tree in giraffe.population if tree.root.children)
+    assert giraffe._arenas.nbytes == 0  # buffers are freed when training ends
+
+
+def test_invalid_compute_dtype(create_giraffe):
+    with pytest.raises(ValueError):
+        create_giraffe(compute_dtype="int8")
+    with pytest.raises(ValueError):
+        create_giraffe(compute_dtype="bfloat16")
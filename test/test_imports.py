@@ -0,0 +1,39 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+
+HEAVY_MODULES = ["torch", "torchmetrics", "matplotlib", "graphviz", "sklearn"]
+
+
+def loaded_modules(code: str) -> list:
+    # a fresh interpreter, the test session has already imported everything
+    script = f"import sys\n{code}\nimport json\nprint(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    env = dict(os.environ, PYTHONPATH=str(Path(__file__).parents[1]), GIRAFFE_LOG_LEVEL="ERROR")
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, env=env, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_import_does_not_load_optional_dependencies():
+    assert loaded_modules("import giraffe\nimport giraffe.draw\nimport giraffe.pareto") == []
+
+
+def test_numpy_run_does_not_load_torch(tmp_path):
+    rng = np.random.default_rng(0)
+    gt = rng.integers(0, 2, 50)
+    (tmp_path / "preds").mkdir()
+    for i in range(8):
+        np.save(tmp_path / "preds" / f"model_{i}.npy", rng.random(50))
+    np.save(tmp_path / "gt.npy", gt)
+
+    code = f"""
+from giraffe import Giraffe
+from giraffe.fitness import quantized_average_precision_binary
+giraffe = Giraffe({str(tmp_path / "preds")!r}, [{str(tmp_path / "gt.npy")!r}], population_size=6, population_multiplier=1,
+                  tournament_size=2, fitness_function=quantized_average_precision_binary, seed=0)
+giraffe.train(2)
+"""
+    assert loaded_modules(code) == []
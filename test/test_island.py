@@ -0,0 +1,62 @@
+import multiprocessing as mp
+
+import pytest
+
+from giraffe.island import IslandGiraffe, _island_worker
+from giraffe.node import ValueNode
+from giraffe.tree import Tree
+
+
+@pytest.mark.parametrize("topology, expected", [("ring", [["c"], ["a"], ["b"]]), ("all_to_all", [["b", "c"], ["a", "c"], ["a", "b"]])])
+def test_route_migrants(topology, expected):
+    islands = IslandGiraffe(3, topology=topology)
+    emigrants = [[Tree(ValueNode(None, None, name))] for name in ["a", "b", "c"]]
+
+    immigrants = islands._route_migrants(emigrants)
+
+    assert [[tree.root.id for tree in trees] for trees in immigrants] == expected
+
+
+def test_island_train(predictions_directory):
+    preds_dir, gt_path = predictions_directory
+    islands = IslandGiraffe(
+        2,
+        migration_interval=1,
+        migration_size=2,
+        preds_source=preds_dir,
+        gt_path=[gt_path],
+        population_size=5,
+        population_multiplier=1,
+        tournament_size=2,
+    )
+    islands.train(3)
+
+    assert islands.fitnesses is not None and islands.pareto_fitnesses is not None
+    assert 0 < len(islands.population) <= 10
+    assert len(islands.fitnesses) == len(islands.population)
+    assert len(islands.pareto_front) > 0
+    assert islands.pareto_fitnesses.max() == islands.fitnesses.max()
+    assert all(node.value is None for tree in islands.population for node in tree.nodes["value_nodes"])
+
+
+def test_unpicklable_postprocessing_function(predictions_directory):
+    preds_dir, gt_path = predictions_directory
+    islands = IslandGiraffe(2, preds_source=preds_dir, gt_path=[gt_path], postprocessing_function=lambda x: x)
+
+    with pytest.raises(ValueError, match="postprocessing_function"):
+        islands.train(1)
+
+
+def test_migration_is_acknowledged(predictions_directory):
+    preds_dir, gt_path = predictions_directory
+    islands = IslandGiraffe(2, preds_source=preds_dir, gt_path=[gt_path], population_size=5, population_multiplier=1, tournament_size=2)
+    parent, child = mp.Pipe()
+    migrant = Tree.create_tree_from_root(ValueNode(None, None, "model_0.npy"))
+    parent.send(("migrate", [migrant]))
+    parent.send(("migrate", [Tree.create_tree_from_root(ValueNode(None, None, "missing"))]))
+
+    _island_worker(child, islands._island_kwargs(0))  # serves the commands already in the pipe, then fails
+
+    assert islands._receive(parent, 0, "migrate") is None
+    with pytest.raises(RuntimeError, match="Island 1 failed on 'migrate'"):
+        islands._receive(parent, 1, "migrate")
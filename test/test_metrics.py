@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from sklearn.metrics import accuracy_score, average_precision_score, f1_score, precision_score, recall_score, roc_auc_score
+
+from giraffe.metrics import FitnessResult, MultiMetricFitness, classification_metrics, split_fitness
+from giraffe.node import ValueNode
+from giraffe.tree import Tree
+
+
+@pytest.fixture
+def binary_data():
+    rng = np.random.default_rng(0)
+    gt = rng.integers(0, 2, 1000)
+    scores = np.round(np.clip(0.3 * gt + 0.7 * rng.random(1000), 0, 1), 2)  # rounding creates ties
+    weights = rng.integers(1, 4, 1000).astype(np.float64)
+    return scores, gt, weights
+
+
+@pytest.mark.parametrize("weighted", [False, True])
+def test_binary_metrics_match_sklearn(binary_data, weighted):
+    scores, gt, weights = binary_data
+    sample_weight = weights if weighted else None
+
+    metrics = classification_metrics(scores, gt, threshold=0.6, sample_weight=sample_weight)
+
+    predicted = scores >= 0.6
+    assert metrics["average_precision"] == pytest.approx(average_precision_score(gt, scores, sample_weight=sample_weight))
+    assert metrics["roc_auc"] == pytest.approx(roc_auc_score(gt, scores, sample_weight=sample_weight))
+    assert metrics["accuracy"] == pytest.approx(accuracy_score(gt, predicted, sample_weight=sample_weight))
+    assert metrics["precision"] == pytest.approx(precision_score(gt, predicted, sample_weight=sample_weight))
+    assert metrics["recall"] == pytest.approx(recall_score(gt, predicted, sample_weight=sample_weight))
+    assert metrics["f1"] == pytest.approx(f1_score(gt, predicted, sample_weight=sample_weight))
+
+
+def test_multiclass_metrics_match_sklearn():
+    rng = np.random.default_rng(1)
+    gt = rng.integers(0, 3, 600)
+    scores = rng.random((600, 3)) + 0.5 * np.eye(3)[gt]
+
+    metrics = classification_metrics(scores, gt, task="multiclass")
+
+    one_hot = np.eye(3)[gt]
+    assert metrics["average_precision"] == pytest.approx(average_precision_score(one_hot, scores, average="macro"))
+    assert metrics["roc_auc"] == pytest.approx(np.mean([roc_auc_score(one_hot[:, c], scores[:, c]) for c in range(3)]))
+    assert metrics["accuracy"] == pytest.approx(accuracy_score(gt, scores.argmax(axis=1)))
+
+
+def test_single_class_gives_zero():
+    metrics = classification_metrics(np.array([0.2, 0.8]), np.array([1, 1]))
+    assert all(value == 0.0 for value in metrics.values())
+
+
+def test_multi_metric_fitness(binary_data):
+    scores, gt, _ = binary_data
+    fitness = MultiMetricFitness("roc_auc", secondary=("average_precision", "f1"))
+
+    result = fitness(Tree.create_tree_from_root(ValueNode(None, scores, "model")), gt)
+
+    assert isinstance(result, FitnessResult)
+    assert result.metrics is not None
+    assert result.fitness == result.metrics["roc_auc"]
+    assert result.objectives == (result.metrics["average_precision"], result.metrics["f1"])
+    assert split_fitness(result) == (result.fitness, result.objectives)
+    assert split_fitness(0.5) == (0.5, ())
+
+
+def test_unknown_metric():
+    with pytest.raises(ValueError):
+        MultiMetricFitness("logloss")
@@ -89,7 +89,7 @@ def test_append_new_node_mutation_to_operator_node(medium_tree, models, id_value
 
     # Mock random choice to select the operator node
 
-    def mock_get_random_node():
+    def mock_get_random_node(**kwargs):
         return medium_tree.nodes["op_nodes"][0]
 
     monkeypatch.setattr(medium_tree, "get_random_node", mock_get_random_node)
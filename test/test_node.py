@@ -2,7 +2,9 @@ from unittest import mock
 
 import numpy as np
 import pytest
+from loguru import logger
 
+import giraffe.node
 from giraffe.backend.numpy_backend import NumpyBackend as B
 from giraffe.node import (
     MaxNode,
@@ -411,3 +413,63 @@ def test_check_both_value(type_1, type_2, expected):
 )
 def test_check_both_operators(type_1, type_2, expected):
     assert check_if_both_types_operators(type_1, type_2) == expected
+
+
+@pytest.mark.parametrize("node", [MeanNode(None), MaxNode(None), MinNode(None), WeightedMeanNode(None, [0.5, 0.3, 0.2])])
+def test_fused_reduce_matches_stacked_op(node):
+    tensors = [np.random.default_rng(i).random((5, 2)) for i in range(3)]
+    np.testing.assert_allclose(node.reduce(tensors), node.op(np.stack(tensors)))
+
+
+def test_weighted_mean_weights_cached_until_change():
+    node = WeightedMeanNode.create_node([ValueNode(None, np.zeros(2), "a")], rng=np.random.default_rng(0))
+    parent = ValueNode(None, np.zeros(2), "parent")
+    parent.add_child(node)
+
+    weights, array = node.weights, node.weights_array
+    assert node.weights is weights and node.weights_array is array
+    assert not array.flags.writeable
+
+    node.add_child(ValueNode(None, np.zeros(2), "b"), rng=np.random.default_rng(1))
+    assert len(node.weights) == 3 and len(node.weights_array) == 3
+    np.testing.assert_allclose(node.weights_array.sum(), 1)
+
+    node.remove_child(node.children[-1])
+    assert len(node.weights) == 2
+
+
+def test_weighted_mean_weights_follow_backend_switch():
+    import torch
+
+    from giraffe.backend.backend import Backend
+
+    node = WeightedMeanNode(None, [1.0])
+    assert isinstance(node.weights, np.ndarray)
+    try:
+        Backend.set_backend("pytorch")
+        assert isinstance(node.weights, torch.Tensor)
+    finally:
+        Backend.set_backend("numpy")
+    assert isinstance(node.weights, np.ndarray)
+
+
+def test_trace_messages_reach_handlers_added_later():
+    messages = []
+    handler_id = logger.add(messages.append, level="TRACE")
+    try:
+        MeanNode(None).combine([np.zeros(2), np.ones(2)])
+    finally:
+        logger.remove(handler_id)
+    assert any("Post-operation tensor shape: (2,)" in message for message in messages)
+
+
+def test_disabled_trace_messages_are_not_formatted(monkeypatch):
+    def fail(x):
+        raise AssertionError("message was formatted")
+
+    monkeypatch.setattr(giraffe.node.B, "shape", fail)  # only called by the trace message of combine
+    logger.disable("giraffe.node")
+    try:
+        np.testing.assert_allclose(MeanNode(None).combine([np.zeros(2), np.ones(2)]), [0.5, 0.5])
+    finally:
+        logger.enable("giraffe.node")
@@ -0,0 +1,46 @@
+import threading
+
+from giraffe.globals import postprocessing_function as PF
+from giraffe.globals import set_postprocessing_function
+from giraffe.parallel import limit_intra_op_threads, thread_map
+
+
+def test_thread_map_preserves_order():
+    assert thread_map(lambda x: x * 2, list(range(20)), n_jobs=4) == [x * 2 for x in range(20)]
+
+
+def test_thread_map_pins_postprocessing_function():
+    def plus_one(x):
+        return x + 1
+
+    def plus_two(x):
+        return x + 2
+
+    started = threading.Event()
+    switched = threading.Event()
+
+    def work(x):
+        started.set()
+        switched.wait(timeout=5)
+        return PF(x)
+
+    previous = PF.function
+    set_postprocessing_function(plus_one)
+    try:
+        thread = threading.Thread(target=lambda: (started.wait(timeout=5), set_postprocessing_function(plus_two), switched.set()))
+        thread.start()
+        results = thread_map(work, [0, 10], n_jobs=2)
+        thread.join()
+    finally:
+        set_postprocessing_function(previous)
+
+    assert results == [1, 11]
+
+
+def test_limit_intra_op_threads_restores_torch_threads():
+    import torch
+
+    before = torch.get_num_threads()
+    with limit_intra_op_threads(1):
+        assert torch.get_num_threads() == 1
+    assert torch.get_num_threads() == before
@@ -149,3 +149,14 @@ class TestSelectionFunctions:
         # Should include all trees
         assert len(selected_trees) == 5
         assert len(selected_fitnesses) == 5
+
+
+def test_choose_pareto_secondary_objectives():
+    trees = [create_mock_tree(f"tree{i}") for i in range(3)]
+    fitnesses = np.array([0.9, 0.8, 0.7])
+    trees[0].objectives, trees[1].objectives, trees[2].objectives = (0.5,), (0.6,), (0.4,)
+
+    selected_trees, _ = choose_pareto(cast(List[Tree], trees), fitnesses, 3)
+
+    # all trees have a single node, tree1 stays on the front thanks to its secondary objective
+    assert [tree.root.id for tree in selected_trees] == ["tree0", "tree1"]
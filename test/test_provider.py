@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from giraffe.node import MaxNode, MeanNode, ValueNode
+from giraffe.provider import LazyTensorProvider
+from giraffe.store import pack
+from giraffe.tree import Tree
+
+
+@pytest.fixture
+def tensors():
+    rng = np.random.default_rng(0)
+    return {f"model_{i}.npy": rng.random(50) for i in range(5)}
+
+
+@pytest.fixture
+def preds_directory(tmp_path, tensors):
+    directory = tmp_path / "preds"
+    directory.mkdir()
+    for tensor_id, tensor in tensors.items():
+        np.save(directory / tensor_id, tensor)
+    return directory
+
+
+def save_tree(path, tensors, operator, ids):
+    root = ValueNode(None, tensors[ids[0]], ids[0])
+    op = operator(None)
+    root.add_child(op)
+    for tensor_id in ids[1:]:
+        op.add_child(ValueNode(None, tensors[tensor_id], tensor_id))
+    tree = Tree.create_tree_from_root(root)
+    tree.save_tree_architecture(path)
+    return tree
+
+
+def test_loads_on_first_access(preds_directory, tensors):
+    provider = LazyTensorProvider(preds_directory)
+
+    assert provider.loads == 0
+    assert len(provider) == len(tensors)
+    assert "model_1.npy" in provider
+    assert "missing.npy" not in provider
+    np.testing.assert_array_equal(provider["model_1.npy"], tensors["model_1.npy"])
+    provider["model_1.npy"]
+    assert provider.loads == 1
+    with pytest.raises(KeyError):
+        provider["missing.npy"]
+
+
+def test_lru_byte_budget(preds_directory):
+    provider = LazyTensorProvider(preds_directory, max_bytes=2 * 50 * 8)
+
+    for tensor_id in ["model_0.npy", "model_1.npy", "model_0.npy", "model_2.npy"]:
+        provider[tensor_id]
+    assert provider.loads == 3
+    assert provider.cached_bytes <= provider.max_bytes
+
+    provider["model_0.npy"]  # most recently used before model_2, still cached
+    assert provider.loads == 3
+    provider["model_1.npy"]  # evicted
+    assert provider.loads == 4
+
+
+@pytest.mark.parametrize("packed", [False, True])
+def test_shared_between_trees(tmp_path, preds_directory, tensors, packed):
+    source = preds_directory
+    if packed:
+        source = tmp_path / "store.giraffe"
+        pack(source, tensors)
+    trees = [
+        save_tree(tmp_path / "tree_0.pkl", tensors, MeanNode, ["model_0.npy", "model_1.npy", "model_2.npy"]),
+        save_tree(tmp_path / "tree_1.pkl", tensors, MaxNode, ["model_2.npy", "model_0.npy"]),
+    ]
+    provider = LazyTensorProvider(source)
+
+    for i, tree in enumerate(trees):
+        loaded_tree, returned = Tree.load_tree(tmp_path / f"tree_{i}.pkl", tensors=provider)
+        assert returned is provider
+        np.testing.assert_array_almost_equal(loaded_tree.evaluation, tree.evaluation)
+        np.testing.assert_array_almost_equal(tree.do_pred_on_another_tensors(current_tensors=provider), tree.evaluation)
+
+    assert provider.loads == 3
+
+
+def test_load_tree_rejects_provider_with_directory(tmp_path, preds_directory, tensors):
+    save_tree(tmp_path / "tree.pkl", tensors, MeanNode, ["model_0.npy", "model_1.npy"])
+    with pytest.raises(ValueError):
+        Tree.load_tree(tmp_path / "tree.pkl", preds_directory, tensors=LazyTensorProvider(preds_directory))
@@ -0,0 +1,47 @@
+import numpy as np
+import torch
+
+from giraffe.accumulators import AccuracyAccumulator, AveragePrecisionAccumulator
+from giraffe.fitness_context import FitnessContext
+from giraffe.metrics import classification_metrics
+from giraffe.quantization import dequantize, is_quantized, quantize
+
+
+def test_quantize_roundtrip():
+    probabilities = np.array([-0.1, 0.0, 0.2, 0.5, 1.0, 1.3])
+
+    quantized = quantize(probabilities)
+    assert quantized.dtype == np.uint8
+    np.testing.assert_array_equal(quantized, [0, 0, 51, 128, 255, 255])
+    np.testing.assert_allclose(dequantize(quantized), np.clip(probabilities, 0, 1), atol=0.5 / 255)
+
+    tensor = quantize(torch.tensor(probabilities))
+    assert tensor.dtype == torch.uint8
+    np.testing.assert_array_equal(tensor.numpy(), quantized)
+    assert dequantize(tensor).dtype == torch.float32
+    assert not is_quantized(probabilities) and dequantize(probabilities) is probabilities
+
+
+def test_metrics_on_quantized_scores():
+    rng = np.random.default_rng(0)
+    quantized = rng.integers(0, 256, 500).astype(np.uint8)
+    gt = rng.integers(0, 2, 500)
+    probabilities = dequantize(quantized)
+
+    for n_bins in (256, 1024):
+        exact = AveragePrecisionAccumulator(n_bins=n_bins).update(probabilities, gt).compute()
+        assert AveragePrecisionAccumulator(n_bins=n_bins, quantized=True).update(quantized, gt).compute() == exact
+    assert AccuracyAccumulator(quantized=True).update(quantized, gt).compute() == AccuracyAccumulator().update(probabilities, gt).compute()
+    context = FitnessContext.build(gt, quantized=True)
+    assert classification_metrics(quantized, context) == classification_metrics(probabilities, gt)
+
+
+def test_uint8_predictions_are_not_dequantized_without_marker():
+    rng = np.random.default_rng(0)
+    gt = rng.integers(0, 2, 500)
+    hard = np.where(rng.random(500) < 0.8, gt, 1 - gt)  # hard 0/1 predictions, not quantized probabilities
+
+    assert AccuracyAccumulator().update(hard.astype(np.uint8), gt).compute() == AccuracyAccumulator().update(hard, gt).compute()
+    expected = AveragePrecisionAccumulator().update(hard.astype(np.float64), gt).compute()
+    assert AveragePrecisionAccumulator().update(hard.astype(np.uint8), gt).compute() == expected
+    assert classification_metrics(hard.astype(np.uint8), FitnessContext.build(gt)) == classification_metrics(hard.astype(np.float64), gt)
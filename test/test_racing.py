@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from giraffe.giraffe import Giraffe
+from giraffe.racing import RacingEvaluator
+
+
+@pytest.fixture
+def giraffe_params(tmp_path):
+    rng = np.random.default_rng(0)
+    n_samples = 400
+    gt = (rng.random(n_samples) < 0.25).astype(int)
+    preds_dir = tmp_path / "preds"
+    preds_dir.mkdir()
+    for i in range(8):
+        noise = rng.normal(0, 0.5 + 0.2 * i, n_samples)
+        np.save(preds_dir / f"model_{i}.npy", 1 / (1 + np.exp(-(2 * gt - 1 + noise))))
+    np.save(tmp_path / "gt.npy", gt)
+    return dict(preds_source=preds_dir, gt_path=tmp_path / "gt.npy", population_size=6, population_multiplier=2, tournament_size=2)
+
+
+def test_stratified_subsample(giraffe_params):
+    giraffe = Giraffe(**giraffe_params)
+    racing = RacingEvaluator(subsample_size=0.2)
+
+    index = racing._subsample_index(giraffe.gt_tensor)
+
+    assert len(index) == pytest.approx(80, abs=2)
+    assert len(np.unique(index)) == len(index)
+    np.testing.assert_allclose(giraffe.gt_tensor[index].mean(), giraffe.gt_tensor.mean(), atol=0.01)
+    assert racing._subsample_index(giraffe.gt_tensor) is index
+
+
+def test_population_fitnesses_stay_exact(giraffe_params):
+    racing = RacingEvaluator(subsample_size=0.25, margin=0.02)
+    giraffe = Giraffe(**giraffe_params, racing=racing)
+
+    giraffe.train(5)
+
+    np.testing.assert_array_equal(giraffe.fitnesses, giraffe._calculate_fitnesses(giraffe.population))
+    assert racing.candidates > 0
+    assert racing.full_evaluations <= racing.candidates
+    assert 0 <= racing.avoided_fraction <= 1
+
+
+@pytest.mark.parametrize("margin, expected_avoided", [(10.0, 0.0), (-10.0, 1.0)])
+def test_margin_controls_full_evaluations(giraffe_params, margin, expected_avoided):
+    giraffe = Giraffe(**giraffe_params)
+    fitnesses = giraffe._calculate_fitnesses()
+    candidates = [tree.copy() for tree in giraffe.population]
+    racing = RacingEvaluator(margin=margin)
+
+    result = racing.evaluate(giraffe, candidates, giraffe.population, fitnesses)
+
+    assert racing.avoided_fraction == expected_avoided
+    if expected_avoided == 0:
+        np.testing.assert_array_equal(result, fitnesses)
+    else:
+        assert np.all(result == -np.inf)
+
+
+def test_invalid_subsample_fraction():
+    with pytest.raises(ValueError):
+        RacingEvaluator(subsample_size=1.5)
+
+
+def test_subsample_fitness_matches_take_samples(giraffe_params):
+    giraffe = Giraffe(**giraffe_params)
+    racing = RacingEvaluator(subsample_size=0.25)
+    index = racing._subsample_index(giraffe.gt_tensor)
+    gt = giraffe.gt_tensor[index]
+    tensors = {tensor_id: tensor[index] for tensor_id, tensor in giraffe.train_tensors.items()}
+
+    for tree in giraffe.population:
+        expected = giraffe.fitness_function(tree.take_samples(index), gt)
+        assert racing._subsample_fitness(giraffe, tree, tensors, index, gt) == pytest.approx(expected)
+        assert all(node.value is giraffe.train_tensors[node.id] for node in tree.nodes["value_nodes"])
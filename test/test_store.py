@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+import torch
+
+from giraffe.backend.backend import Backend
+from giraffe.giraffe import Giraffe
+from giraffe.node import MeanNode, ValueNode
+from giraffe.store import ALIGNMENT, PackedStore, is_packed_store, main, pack
+from giraffe.tree import Tree
+
+
+@pytest.fixture
+def tensors():
+    rng = np.random.default_rng(0)
+    return {
+        "model_0.npy": rng.random(100),
+        "model_1.npy": rng.random(100).astype(np.float32),
+        "model_2.npy": rng.random(100),
+    }
+
+
+@pytest.fixture
+def gt():
+    return np.random.default_rng(1).integers(0, 2, 100)
+
+
+def test_pack_and_open(tmp_path, tensors, gt):
+    path = tmp_path / "store.giraffe"
+    pack(path, tensors, gt)
+
+    assert is_packed_store(path)
+    assert not is_packed_store(tmp_path)
+    store = PackedStore(path)
+    assert list(store) == list(tensors)
+    for tensor_id, tensor in tensors.items():
+        assert isinstance(store[tensor_id], np.memmap)
+        assert store[tensor_id].dtype == tensor.dtype
+        assert store[tensor_id].ctypes.data % ALIGNMENT == 0
+        np.testing.assert_array_equal(store[tensor_id], tensor)
+    np.testing.assert_array_equal(store.gt, gt)
+
+
+def test_store_maps_file_once(tmp_path, tensors, gt, monkeypatch):
+    pack(tmp_path / "store.giraffe", tensors, gt)
+    mappings = []
+    memmap = np.memmap
+
+    def counting_memmap(*args, **kwargs):
+        mappings.append(args)
+        return memmap(*args, **kwargs)
+
+    monkeypatch.setattr(np, "memmap", counting_memmap)
+    store = PackedStore(tmp_path / "store.giraffe")
+    for tensor_id in store:
+        store[tensor_id]
+    assert len(mappings) == 1
+
+
+def test_pack_without_gt(tmp_path, tensors):
+    pack(tmp_path / "store.giraffe", tensors)
+    assert PackedStore(tmp_path / "store.giraffe").gt is None
+
+
+def test_open_invalid_file(tmp_path):
+    np.save(tmp_path / "array.npy", np.zeros(3))
+    with pytest.raises(ValueError):
+        PackedStore(tmp_path / "array.npy")
+
+
+def test_pytorch_backend(tmp_path, tensors):
+    pack(tmp_path / "store.giraffe", tensors)
+    Backend.set_backend("pytorch")
+    try:
+        store = PackedStore(tmp_path / "store.giraffe")
+        assert isinstance(store["model_0.npy"], torch.Tensor)
+        np.testing.assert_array_equal(store["model_0.npy"].numpy(), tensors["model_0.npy"])
+    finally:
+        Backend.set_backend("numpy")
+
+
+def test_cli_pack_and_unpack(tmp_path, tensors, gt):
+    preds_dir = tmp_path / "preds"
+    preds_dir.mkdir()
+    for tensor_id, tensor in tensors.items():
+        np.save(preds_dir / tensor_id, tensor)
+    np.save(tmp_path / "gt.npy", gt)
+
+    main(["pack", str(tmp_path / "store.giraffe"), str(preds_dir), "--gt", str(tmp_path / "gt.npy")])
+    main(["unpack", str(tmp_path / "store.giraffe"), str(tmp_path / "unpacked")])
+
+    for tensor_id, tensor in tensors.items():
+        np.testing.assert_array_equal(np.load(tmp_path / "unpacked" / "preds" / tensor_id), tensor)
+    np.testing.assert_array_equal(np.load(tmp_path / "unpacked" / "gt.npy"), gt)
+
+
+def test_giraffe_from_store(tmp_path, tensors, gt):
+    pack(tmp_path / "store.giraffe", tensors, gt)
+
+    giraffe = Giraffe(tmp_path / "store.giraffe", None, population_size=3, population_multiplier=1, tournament_size=1)
+
+    assert set(giraffe.ids) == set(tensors)
+    assert all(isinstance(model, np.memmap) for model in giraffe.models)
+    np.testing.assert_array_equal(giraffe.gt_tensor, gt)
+    giraffe.train(2)
+
+
+def test_giraffe_from_store_without_gt(tmp_path, tensors):
+    pack(tmp_path / "store.giraffe", tensors)
+    with pytest.raises(ValueError):
+        Giraffe(tmp_path / "store.giraffe", None, population_size=3, population_multiplier=1, tournament_size=1)
+
+
+def test_load_tree_from_store(tmp_path, tensors):
+    pack(tmp_path / "store.giraffe", tensors)
+    root = ValueNode(None, tensors["model_0.npy"], "model_0.npy")
+    mean = MeanNode(None)
+    root.add_child(mean)
+    mean.add_child(ValueNode(None, tensors["model_2.npy"], "model_2.npy"))
+    tree = Tree.create_tree_from_root(root)
+    tree.save_tree_architecture(tmp_path / "tree.pkl")
+
+    loaded_tree, loaded_tensors = Tree.load_tree(tmp_path / "tree.pkl", tmp_path / "store.giraffe")
+
+    assert set(loaded_tensors) == {"model_0.npy", "model_2.npy"}
+    np.testing.assert_array_almost_equal(loaded_tree.evaluation, tree.evaluation)
+    np.testing.assert_array_almost_equal(tree.do_pred_on_another_tensors(tmp_path / "store.giraffe"), tree.evaluation)
+
+    store = PackedStore(tmp_path / "store.giraffe")
+    shared_tree, _ = Tree.load_tree(tmp_path / "tree.pkl", store)
+    assert all(node.value is store[node.id] for node in shared_tree.nodes["value_nodes"])
+    np.testing.assert_array_almost_equal(tree.do_pred_on_another_tensors(store), tree.evaluation)
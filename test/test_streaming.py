@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+import torch
+
+from giraffe.backend.backend import Backend
+from giraffe.globals import BACKEND as B
+from giraffe.node import MaxNode, MeanNode, MinNode, ValueNode, WeightedMeanNode
+from giraffe.streaming import accumulate_in_chunks, evaluate_in_chunks, iter_chunks
+from giraffe.tree import Tree
+
+
+def build_tree(values):
+    r"""
+    Builds a tree with the following structure:
+         A
+        / \
+      WMN  MAX
+      /      \
+     B        C
+              |
+             MIN
+              |
+              D
+    """
+    a, b, c, d = (ValueNode(None, value, name) for name, value in zip("ABCD", values, strict=True))
+    wmn = WeightedMeanNode([b], [0.3, 0.7])
+    a.add_child(wmn)
+    maximum = MaxNode(None)
+    a.add_child(maximum)
+    maximum.add_child(c)
+    minimum = MinNode(None)
+    c.add_child(minimum)
+    minimum.add_child(d)
+    return Tree.create_tree_from_root(a)
+
+
+@pytest.fixture
+def values():
+    rng = np.random.default_rng(0)
+    return [rng.random((103, 3)) for _ in range(4)]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 10, 103, 500])
+def test_evaluate_in_chunks_matches_full_evaluation(values, chunk_size):
+    tree = build_tree(values)
+    chunked = evaluate_in_chunks(tree, chunk_size)
+    np.testing.assert_allclose(chunked, build_tree(values).evaluation)
+    assert all(node.evaluation is None for node in tree.nodes["value_nodes"])
+
+
+def test_evaluate_in_chunks_into_preallocated_output(values):
+    out = np.full((103, 3), np.nan)
+    result = evaluate_in_chunks(build_tree(values), 16, out=out)
+    assert result is out
+    np.testing.assert_allclose(out, build_tree(values).evaluation)
+
+
+def test_evaluate_in_chunks_pytorch(values):
+    Backend.set_backend("pytorch")
+    try:
+        tensors = [torch.tensor(value) for value in values]
+        chunked = evaluate_in_chunks(build_tree(tensors), 16)
+        assert isinstance(chunked, torch.Tensor)
+        np.testing.assert_allclose(B.to_numpy(chunked), B.to_numpy(build_tree(tensors).evaluation))
+    finally:
+        Backend.set_backend("numpy")
+
+
+def test_single_node_tree_is_not_copied(values):
+    tree = Tree.create_tree_from_root(ValueNode(None, values[0], "A"))
+    assert evaluate_in_chunks(tree, 10) is values[0]
+
+
+def test_accumulate_in_chunks(values):
+    class SumAccumulator:
+        def __init__(self):
+            self.total = 0.0
+            self.samples = 0
+
+        def update(self, pred_chunk, gt_chunk):
+            assert len(pred_chunk) == len(gt_chunk)
+            self.total += pred_chunk.sum()
+            self.samples += len(gt_chunk)
+
+    tree = build_tree(values)
+    accumulator = accumulate_in_chunks(tree, np.zeros(103), SumAccumulator(), 25)
+
+    assert accumulator.samples == 103
+    np.testing.assert_allclose(accumulator.total, tree.evaluation.sum())
+
+
+def test_iter_chunks_rejects_invalid_chunk_size(values):
+    with pytest.raises(ValueError):
+        next(iter_chunks(build_tree(values), 0))
+
+
+def test_mean_node_combine():
+    x, y = np.array([1.0, 2.0]), np.array([3.0, 6.0])
+    np.testing.assert_allclose(MeanNode(None).combine([x, y]), [2.0, 4.0])
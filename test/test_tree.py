@@ -255,3 +255,17 @@ def test_save_and_load_tree_weighted_tree(weighted_mean_tree):
     for tree_node, loaded_tree_node in zip(tree.nodes["value_nodes"], loaded_tree.nodes["value_nodes"], strict=False):
         assert tree_node.id == loaded_tree_node.id
         np.testing.assert_equal(tree_node.value, loaded_tree_node.value)
+
+
+def test_load_tree_mmap(weighted_mean_tree, tmp_path):
+    tree = Tree.create_tree_from_root(weighted_mean_tree["A"])
+    tensors_dir = tmp_path / "tensors"
+    tensors_dir.mkdir()
+    for value_node in tree.nodes["value_nodes"]:
+        np.save(tensors_dir / str(value_node.id), value_node.value)
+    tree.save_tree_architecture(tmp_path / "tree.pkl")
+
+    loaded_tree, tensors = Tree.load_tree(tmp_path / "tree.pkl", tensors_dir, mmap_mode="r")
+
+    assert all(isinstance(tensor, np.memmap) for tensor in tensors.values())
+    np.testing.assert_array_equal(loaded_tree.evaluation, tree.evaluation)